@@ -40,14 +40,8 @@ export default function AdminDashboard() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
-  // API calls for statistics
-  const { call: getBooksCall } = useFrappePostCall("library_app.api.get_books");
-  const { call: getMembersCall } = useFrappePostCall("library_app.api.get_members");
-  const { call: getLoansCall } = useFrappePostCall("library_app.api.get_loans");
-  const { call: getOverdueCall } = useFrappePostCall("library_app.api.get_overdue_books_report");
-  const { call: getReservationsCall } = useFrappePostCall("library_app.api.get_reservations");
-  // If you have a users endpoint, use it; otherwise, use members count for now
-  // const { call: getUsersCall } = useFrappePostCall("library_app.api.get_users");
+  // Counts come pre-aggregated from the server
+  const { call: getDashboardStatsCall } = useFrappePostCall("library_app.api.get_dashboard_stats");
 
   useEffect(() => {
     const fetchDashboardData = async () => {
@@ -55,54 +49,21 @@ export default function AdminDashboard() {
         setLoading(true);
         setError(null);
 
-        // Fetch all data in parallel
-        const [
-          booksResponse,
-          membersResponse,
-          loansResponse,
-          overdueResponse,
-          reservationsResponse
-          // usersResponse
-        ] = await Promise.all([
-          getBooksCall({}),
-          getMembersCall({}),
-          getLoansCall({}),
-          getOverdueCall({}),
-          getReservationsCall({})
-          // getUsersCall({})
-        ]);
-
-        const books = booksResponse?.message || [];
-        const members = membersResponse?.message || [];
-        const loans = loansResponse?.message || [];
-        const overdueBooks = overdueResponse?.message || [];
-        const reservations = reservationsResponse?.message || [];
-        // const users = usersResponse?.message || [];
-
-        // Calculate statistics
-        const totalBooks = books.length;
-        const availableBooks = books.filter((book: any) => book.status === "Available").length;
-        const booksOnLoan = books.filter((book: any) => book.status === "On Loan").length;
-        const reservedBooks = books.filter((book: any) => book.status === "Reserved").length;
-        const totalMembers = members.length;
-        const totalLoans = loans.length;
-        const overdueCount = overdueBooks.length;
-        const reservationsCount = reservations.length;
-        // const usersCount = users.length;
-        const usersCount = members.length; // fallback if no users endpoint
+        const response = await getDashboardStatsCall({});
+        const data = response?.message || {};
+        const byStatus = data.books_by_status || {};
 
         setStats({
-          totalBooks,
-          availableBooks,
-          booksOnLoan,
-          reservedBooks,
-          totalMembers,
-          totalLoans,
-          overdueBooks: overdueCount,
-          reservations: reservationsCount,
-          users: usersCount
+          totalBooks: data.books || 0,
+          availableBooks: byStatus["Available"] || 0,
+          booksOnLoan: byStatus["On Loan"] || 0,
+          reservedBooks: byStatus["Reserved"] || 0,
+          totalMembers: data.members || 0,
+          totalLoans: data.loans || 0,
+          overdueBooks: data.overdue_loans || 0,
+          reservations: data.reservations || 0,
+          users: data.members || 0
         });
-
       } catch (err: any) {
         console.error("Error fetching dashboard data:", err);
         setError(err.message || "Failed to load dashboard data");
@@ -112,7 +73,7 @@ export default function AdminDashboard() {
     };
 
     fetchDashboardData();
-  }, [getBooksCall, getMembersCall, getLoansCall, getOverdueCall, getReservationsCall]);
+  }, [getDashboardStatsCall]);
 
   useEffect(() => {
     if (error) {
@@ -39,12 +39,8 @@ export default function LibrarianDashboard() {
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
 
-  // API calls for statistics
-  const { call: getBooksCall } = useFrappePostCall("library_app.api.get_books");
-  const { call: getMembersCall } = useFrappePostCall("library_app.api.get_members");
-  const { call: getLoansCall } = useFrappePostCall("library_app.api.get_loans");
-  const { call: getOverdueCall } = useFrappePostCall("library_app.api.get_overdue_books_report");
-  const { call: getReservationsCall } = useFrappePostCall("library_app.api.get_reservations");
+  // Counts come pre-aggregated from the server
+  const { call: getDashboardStatsCall } = useFrappePostCall("library_app.api.get_dashboard_stats");
 
   useEffect(() => {
     const fetchDashboardData = async () => {
@@ -52,48 +48,20 @@ export default function LibrarianDashboard() {
         setLoading(true);
         setError(null);
 
-        // Fetch all data in parallel
-        const [
-          booksResponse,
-          membersResponse,
-          loansResponse,
-          overdueResponse,
-          reservationsResponse
-        ] = await Promise.all([
-          getBooksCall({}),
-          getMembersCall({}),
-          getLoansCall({}),
-          getOverdueCall({}),
-          getReservationsCall({})
-        ]);
-
-        const books = booksResponse?.message || [];
-        const members = membersResponse?.message || [];
-        const loans = loansResponse?.message || [];
-        const overdueBooks = overdueResponse?.message || [];
-        const reservations = reservationsResponse?.message || [];
-
-        // Calculate statistics
-        const totalBooks = books.length;
-        const availableBooks = books.filter((book: any) => book.status === "Available").length;
-        const booksOnLoan = books.filter((book: any) => book.status === "On Loan").length;
-        const reservedBooks = books.filter((book: any) => book.status === "Reserved").length;
-        const totalMembers = members.length;
-        const totalLoans = loans.length;
-        const overdueCount = overdueBooks.length;
-        const reservationsCount = reservations.length;
-        const usersCount = members.length;
+        const response = await getDashboardStatsCall({});
+        const data = response?.message || {};
+        const byStatus = data.books_by_status || {};
 
         setStats({
-          totalBooks,
-          availableBooks,
-          booksOnLoan,
-          reservedBooks,
-          totalMembers,
-          totalLoans,
-          overdueBooks: overdueCount,
-          reservations: reservationsCount,
-          users: usersCount
+          totalBooks: data.books || 0,
+          availableBooks: byStatus["Available"] || 0,
+          booksOnLoan: byStatus["On Loan"] || 0,
+          reservedBooks: byStatus["Reserved"] || 0,
+          totalMembers: data.members || 0,
+          totalLoans: data.loans || 0,
+          overdueBooks: data.overdue_loans || 0,
+          reservations: data.reservations || 0,
+          users: data.members || 0
         });
       } catch (err: any) {
         console.error("Error fetching dashboard data:", err);
@@ -104,7 +72,7 @@ export default function LibrarianDashboard() {
     };
 
     fetchDashboardData();
-  }, [getBooksCall, getMembersCall, getLoansCall, getOverdueCall, getReservationsCall]);
+  }, [getDashboardStatsCall]);
 
   useEffect(() => {
     if (error) {
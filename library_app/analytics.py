@@ -0,0 +1,473 @@
+# library_app/library_app/analytics.py
+import hashlib
+from collections import defaultdict
+
+import frappe
+from frappe.utils import add_days, add_months, cint, date_diff, get_first_day, getdate, now_datetime, nowdate
+
+# --- Circulation rollups ---
+#
+# Circulation Rollup keeps pre-aggregated loan activity per
+#
+#     granularity  Day | Month | Total       (period: the day, first of month, or TOTAL_PERIOD)
+#     dimension    All | Book | Member       (subject: "" / book / member)
+#
+# with loans (counted on loan_date), returns, loan_days and overdue_returns
+# (counted on returned_on) and, on Total rows, last_loan_on. Trend, top-title
+# and dormancy questions then read a bounded number of rows through an index
+# instead of scanning Loan.
+#
+# Every Member has a Total row from the day it is created (seed_members), and
+# idle_since on Total rows is the last loan date, or the day the member
+# joined while they have never borrowed, so dormant_members() is one index
+# range read on (granularity, dimension, idle_since).
+#
+# Loan doc_events apply the difference between a loan's contribution before
+# and after each change (as library_app.stats does for the counters); the
+# set-based circulation paths call record_loans/record_returns. rebuild()
+# recomputes everything with grouped INSERT ... SELECT statements, one
+# loan_date month at a time.
+#
+# Book and Member rows are updated in the loan's own transaction. Every
+# checkout and return would also lock the same few All rows (today, this
+# month, total) until it commits, so those deltas are added to a Redis hash
+# once the transaction commits instead, and flush_pending() (scheduled every
+# minute) folds them into the rollups. Library-wide figures lag by up to a
+# minute.
+
+GRANULARITIES = ("Day", "Month", "Total")
+DIMENSIONS = ("All", "Book", "Member")
+METRICS = ("loans", "returns", "loan_days", "overdue_returns")
+TOTAL_PERIOD = "1900-01-01"
+MAX_TREND_DAYS = 366
+MAX_TREND_MONTHS = 120
+MAX_RESULTS = 500
+PENDING_KEY = "library_app:rollup_pending"
+
+
+def period_of(granularity, date):
+    if granularity == "Day":
+        return str(getdate(date))
+    if granularity == "Month":
+        return str(get_first_day(date))
+    return TOTAL_PERIOD
+
+
+def subject_of(dimension, loan):
+    return {"All": "", "Book": loan.book or "", "Member": loan.member or ""}[dimension]
+
+
+def rollup_name(granularity, period, dimension, subject):
+    return hashlib.md5(f"{granularity}:{period}:{dimension}:{subject}".encode()).hexdigest()
+
+
+def contributions(loan):
+    """{(granularity, period, dimension, subject): {metric: value}} for one loan."""
+    rows = defaultdict(lambda: defaultdict(int))
+    if not loan or not loan.loan_date:
+        return rows
+
+    returned = cint(loan.returned) and loan.get("returned_on")
+    for granularity in GRANULARITIES:
+        for dimension in DIMENSIONS:
+            subject = subject_of(dimension, loan)
+            rows[(granularity, period_of(granularity, loan.loan_date), dimension, subject)]["loans"] += 1
+            if returned:
+                row = rows[(granularity, period_of(granularity, loan.returned_on), dimension, subject)]
+                row["returns"] += 1
+                row["loan_days"] += max(date_diff(loan.returned_on, loan.loan_date), 0)
+                row["overdue_returns"] += int(getdate(loan.returned_on) > getdate(loan.return_date))
+    return rows
+
+
+def apply(deltas, last_loan_on=None):
+    """
+    Adds `deltas` ({row key: {metric: delta}}) to the Book and Member rollups
+    with one upsert; the All deltas are buffered until the transaction commits.
+    """
+    deltas = {
+        key: metrics for key, metrics in deltas.items()
+        if any(metrics.get(metric) for metric in METRICS)
+    }
+    shared = {key: deltas.pop(key) for key in list(deltas) if key[2] == "All"}
+    if shared:
+        # dropped with the transaction's other after_commit callbacks on rollback
+        frappe.db.after_commit.add(lambda: buffer(shared))
+    upsert(deltas, last_loan_on)
+
+
+def upsert(deltas, last_loan_on=None):
+    if not deltas:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    rows, params = [], []
+    # sorted so concurrent transactions lock rollup rows in the same order
+    for key in sorted(deltas):
+        granularity, period, dimension, subject = key
+        metrics = deltas[key]
+        rows.append("(%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)")
+        params.extend([
+            rollup_name(*key), granularity, period, dimension, subject,
+            *(metrics.get(metric, 0) for metric in METRICS),
+            *[last_loan_on if granularity == "Total" and metrics.get("loans", 0) > 0 else None] * 2,
+            now, now, user, user,
+        ])
+
+    frappe.db.sql(
+        f"""
+        INSERT INTO `tabCirculation Rollup`
+            (name, granularity, period, dimension, subject, loans, returns, loan_days, overdue_returns,
+             last_loan_on, idle_since, creation, modified, owner, modified_by)
+        VALUES {", ".join(rows)}
+        ON DUPLICATE KEY UPDATE
+            loans = loans + VALUES(loans),
+            returns = returns + VALUES(returns),
+            loan_days = loan_days + VALUES(loan_days),
+            overdue_returns = overdue_returns + VALUES(overdue_returns),
+            last_loan_on = IF(VALUES(last_loan_on) IS NULL, last_loan_on,
+                GREATEST(COALESCE(last_loan_on, VALUES(last_loan_on)), VALUES(last_loan_on))),
+            idle_since = IF(VALUES(idle_since) IS NULL, idle_since,
+                GREATEST(COALESCE(idle_since, VALUES(idle_since)), VALUES(idle_since))),
+            modified = VALUES(modified)
+        """,
+        params,
+    )
+
+
+def pending_key():
+    return frappe.cache.make_key(PENDING_KEY)
+
+
+def buffer(deltas):
+    """Adds All deltas to the Redis buffer, one "granularity|period|metric" field per value."""
+    pipe = frappe.cache.pipeline()
+    for (granularity, period, _dimension, _subject), metrics in deltas.items():
+        for metric, value in metrics.items():
+            if value:
+                pipe.hincrby(pending_key(), f"{granularity}|{period}|{metric}", value)
+    pipe.execute()
+
+
+def flush_pending(commit=True):
+    """
+    Scheduled: applies the buffered All deltas. The Total row's last_loan_on
+    is the latest day with new loans among them.
+    """
+    pipe = frappe.cache.pipeline()
+    pipe.hgetall(pending_key())
+    pipe.delete(pending_key())
+    raw = pipe.execute()[0]
+    if not raw:
+        return
+
+    deltas = defaultdict(lambda: defaultdict(int))
+    for field, value in raw.items():
+        granularity, period, metric = field.decode().split("|")
+        deltas[(granularity, period, "All", "")][metric] += cint(value)
+    new_loans = [key[1] for key, metrics in deltas.items() if key[0] == "Day" and metrics.get("loans", 0) > 0]
+    try:
+        upsert(
+            {key: metrics for key, metrics in deltas.items() if any(metrics.values())},
+            last_loan_on=max(new_loans, default=None),
+        )
+        if commit:
+            frappe.db.commit()
+    except Exception:
+        # put them back for the next run
+        buffer(deltas)
+        raise
+
+
+def difference(after, before):
+    deltas = defaultdict(lambda: defaultdict(int))
+    for rows, sign in ((after, 1), (before, -1)):
+        for key, metrics in rows.items():
+            for metric, value in metrics.items():
+                deltas[key][metric] += sign * value
+    return deltas
+
+
+def record_loans(loans):
+    """Counts newly inserted loans (dicts with book, member, loan_date) written with set-based SQL."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for loan in loans:
+        for key, metrics in contributions(frappe._dict(loan, returned=0)).items():
+            for metric, value in metrics.items():
+                deltas[key][metric] += value
+    latest = max((getdate(loan["loan_date"]) for loan in loans), default=None)
+    apply(deltas, last_loan_on=latest)
+
+
+def record_returns(loans, returned_on):
+    """Counts loans (dicts with book, member, loan_date, return_date) just returned with set-based SQL."""
+    deltas = defaultdict(lambda: defaultdict(int))
+    for loan in loans:
+        before = contributions(frappe._dict(loan, returned=0))
+        after = contributions(frappe._dict(loan, returned=1, returned_on=returned_on))
+        for key, metrics in difference(after, before).items():
+            for metric, value in metrics.items():
+                deltas[key][metric] += value
+    apply(deltas)
+
+
+def move_subjects(dimension, subjects, into):
+    """Folds the rollups of `subjects` into those of `into` (when titles or members are merged)."""
+    subjects = tuple(subject for subject in subjects if subject != into)
+    if not subjects:
+        return
+    frappe.db.sql(
+        """
+        INSERT INTO `tabCirculation Rollup`
+            (name, granularity, period, dimension, subject, loans, returns, loan_days, overdue_returns,
+             last_loan_on, idle_since, creation, modified, owner, modified_by)
+        SELECT MD5(CONCAT_WS(':', granularity, period, dimension, %(into)s)),
+            granularity, period, dimension, %(into)s, SUM(loans), SUM(returns), SUM(loan_days),
+            SUM(overdue_returns), MAX(last_loan_on), MAX(idle_since), %(now)s, %(now)s, %(user)s, %(user)s
+        FROM `tabCirculation Rollup`
+        WHERE dimension = %(dimension)s AND subject IN %(subjects)s
+        GROUP BY granularity, period, dimension
+        ON DUPLICATE KEY UPDATE
+            loans = `tabCirculation Rollup`.loans + VALUES(loans),
+            returns = `tabCirculation Rollup`.returns + VALUES(returns),
+            loan_days = `tabCirculation Rollup`.loan_days + VALUES(loan_days),
+            overdue_returns = `tabCirculation Rollup`.overdue_returns + VALUES(overdue_returns),
+            last_loan_on = IF(VALUES(last_loan_on) IS NULL, `tabCirculation Rollup`.last_loan_on,
+                GREATEST(COALESCE(`tabCirculation Rollup`.last_loan_on, VALUES(last_loan_on)), VALUES(last_loan_on))),
+            idle_since = IF(VALUES(idle_since) IS NULL, `tabCirculation Rollup`.idle_since,
+                GREATEST(COALESCE(`tabCirculation Rollup`.idle_since, VALUES(idle_since)), VALUES(idle_since)))
+        """,
+        {"into": into, "dimension": dimension, "subjects": subjects, "now": now_datetime(), "user": frappe.session.user},
+    )
+    frappe.db.sql(
+        "DELETE FROM `tabCirculation Rollup` WHERE dimension = %s AND subject IN %s", (dimension, subjects)
+    )
+
+
+def seed_members(members=None):
+    """
+    Gives `members` (default: every Member) a Total row if they have none,
+    idle since the day they joined.
+    """
+    if members is not None and not members:
+        return
+    condition = "WHERE member.name IN %(members)s" if members is not None else ""
+    frappe.db.sql(
+        f"""
+        INSERT INTO `tabCirculation Rollup`
+            (name, granularity, period, dimension, subject, loans, returns, loan_days, overdue_returns,
+             last_loan_on, idle_since, creation, modified, owner, modified_by)
+        SELECT MD5(CONCAT_WS(':', 'Total', '{TOTAL_PERIOD}', 'Member', member.name)),
+            'Total', '{TOTAL_PERIOD}', 'Member', member.name, 0, 0, 0, 0,
+            NULL, DATE(member.creation), %(now)s, %(now)s, %(user)s, %(user)s
+        FROM `tabMember` member
+        {condition}
+        ON DUPLICATE KEY UPDATE
+            idle_since = COALESCE(`tabCirculation Rollup`.idle_since, VALUES(idle_since))
+        """,
+        {"members": tuple(members or ()), "now": now_datetime(), "user": frappe.session.user},
+    )
+
+
+# --- Document event handlers (wired in hooks.py) ---
+
+def on_member_insert(doc, method=None):
+    seed_members([doc.name])
+
+
+def on_member_trash(doc, method=None):
+    # a Member can only be deleted once it has no loans; drop its (empty) rows
+    frappe.db.delete("Circulation Rollup", {"dimension": "Member", "subject": doc.name})
+
+
+def on_loan_insert(doc, method=None):
+    apply(contributions(doc), last_loan_on=getdate(doc.loan_date) if doc.loan_date else None)
+
+
+def on_loan_update(doc, method=None):
+    before = doc.get_doc_before_save()
+    if not before:
+        # on_update also runs right after insert; after_insert counted it
+        return
+    apply(difference(contributions(doc), contributions(before)), last_loan_on=getdate(doc.loan_date))
+
+
+def on_loan_trash(doc, method=None):
+    apply(difference({}, contributions(doc)))
+
+
+# --- Backfill ---
+
+PERIOD_SQL = {
+    "Day": "{date}",
+    "Month": "DATE_FORMAT({date}, '%%Y-%%m-01')",
+    "Total": f"'{TOTAL_PERIOD}'",
+}
+SUBJECT_SQL = {"All": "''", "Book": "COALESCE(loan.book, '')", "Member": "COALESCE(loan.member, '')"}
+
+
+def backfill_statement(granularity, dimension, returns):
+    """Grouped upsert of one granularity/dimension for the loans (or returns) in a date range."""
+    date = "loan.returned_on" if returns else "loan.loan_date"
+    period = PERIOD_SQL[granularity].format(date=date)
+    subject = SUBJECT_SQL[dimension]
+    if returns:
+        metrics = (
+            "0 AS loans, COUNT(*) AS returns, "
+            "SUM(GREATEST(DATEDIFF(loan.returned_on, loan.loan_date), 0)) AS loan_days, "
+            "SUM(loan.returned_on > loan.return_date) AS overdue_returns, NULL AS last_loan_on"
+        )
+        where = "loan.returned = 1 AND loan.returned_on >= %(start)s AND loan.returned_on < %(end)s"
+    else:
+        metrics = (
+            "COUNT(*) AS loans, 0 AS returns, 0 AS loan_days, 0 AS overdue_returns, "
+            + ("MAX(loan.loan_date)" if granularity == "Total" else "NULL") + " AS last_loan_on"
+        )
+        where = "loan.loan_date >= %(start)s AND loan.loan_date < %(end)s"
+
+    return f"""
+        INSERT INTO `tabCirculation Rollup`
+            (name, granularity, period, dimension, subject, loans, returns, loan_days, overdue_returns,
+             last_loan_on, idle_since, creation, modified, owner, modified_by)
+        SELECT MD5(CONCAT_WS(':', '{granularity}', period, '{dimension}', subject)),
+            '{granularity}', period, '{dimension}', subject, loans, returns, loan_days, overdue_returns,
+            last_loan_on, last_loan_on, %(now)s, %(now)s, %(user)s, %(user)s
+        FROM (
+            SELECT {period} AS period, {subject} AS subject, {metrics}
+            FROM `tabLoan` loan
+            WHERE {where}
+            GROUP BY 1, 2
+        ) grouped
+        ON DUPLICATE KEY UPDATE
+            loans = `tabCirculation Rollup`.loans + VALUES(loans),
+            returns = `tabCirculation Rollup`.returns + VALUES(returns),
+            loan_days = `tabCirculation Rollup`.loan_days + VALUES(loan_days),
+            overdue_returns = `tabCirculation Rollup`.overdue_returns + VALUES(overdue_returns),
+            last_loan_on = IF(VALUES(last_loan_on) IS NULL, `tabCirculation Rollup`.last_loan_on,
+                GREATEST(COALESCE(`tabCirculation Rollup`.last_loan_on, VALUES(last_loan_on)), VALUES(last_loan_on))),
+            idle_since = IF(VALUES(idle_since) IS NULL, `tabCirculation Rollup`.idle_since,
+                GREATEST(COALESCE(`tabCirculation Rollup`.idle_since, VALUES(idle_since)), VALUES(idle_since)))
+    """
+
+
+def rebuild(commit=True):
+    """
+    Recomputes every rollup from Loan with grouped set-based statements, one
+    month of loan_date / returned_on at a time (committing after each month).
+    Returns {"months": n, "loans": n, "seconds": s}.
+    """
+    start_time = now_datetime()
+    # the rebuild counts every committed loan, including those still buffered
+    frappe.cache.delete(pending_key())
+    frappe.db.sql("DELETE FROM `tabCirculation Rollup`")
+    bounds = frappe.db.sql(
+        "SELECT MIN(loan_date), MAX(GREATEST(loan_date, COALESCE(returned_on, loan_date))) FROM `tabLoan`"
+    )[0]
+    months = 0
+    if bounds[0]:
+        month, last = get_first_day(bounds[0]), getdate(bounds[1])
+        statements = [
+            backfill_statement(granularity, dimension, returns)
+            for returns in (False, True)
+            for granularity in GRANULARITIES
+            for dimension in DIMENSIONS
+        ]
+        while month <= last:
+            values = {"start": month, "end": add_months(month, 1), "now": now_datetime(), "user": frappe.session.user}
+            for statement in statements:
+                frappe.db.sql(statement, values)
+            if commit:
+                frappe.db.commit()
+            month = add_months(month, 1)
+            months += 1
+    seed_members()
+    if commit:
+        frappe.db.commit()
+
+    return {
+        "months": months,
+        "loans": frappe.db.count("Loan"),
+        "seconds": round((now_datetime() - start_time).total_seconds(), 2),
+    }
+
+
+# --- Reads ---
+
+def trend(granularity="Month", from_date=None, to_date=None, dimension="All", subject=""):
+    """
+    Loans, returns, average loan days and overdue-return rate per period
+    between the dates (inclusive). At most MAX_TREND_DAYS days or
+    MAX_TREND_MONTHS months are read.
+    """
+    if granularity not in ("Day", "Month"):
+        frappe.throw("Granularity must be Day or Month.")
+    to_date = getdate(to_date or nowdate())
+    if granularity == "Day":
+        from_date = getdate(from_date or add_days(to_date, -29))
+        if date_diff(to_date, from_date) >= MAX_TREND_DAYS:
+            frappe.throw(f"Daily trends cover at most {MAX_TREND_DAYS} days.")
+    else:
+        from_date = get_first_day(from_date or add_months(to_date, -11))
+        if date_diff(to_date, from_date) > MAX_TREND_MONTHS * 31:
+            frappe.throw(f"Monthly trends cover at most {MAX_TREND_MONTHS} months.")
+
+    rows = frappe.get_all(
+        "Circulation Rollup",
+        filters={
+            "granularity": granularity,
+            "dimension": dimension,
+            "subject": subject or "",
+            "period": ["between", [from_date, to_date]],
+        },
+        fields=["period", *METRICS],
+        order_by="period asc",
+    )
+    return [{"period": row.period, **summarize(row)} for row in rows]
+
+
+def summarize(row):
+    returns = cint(row.returns)
+    return {
+        "loans": cint(row.loans),
+        "returns": returns,
+        "average_loan_days": round(cint(row.loan_days) / returns, 2) if returns else None,
+        "overdue_rate": round(cint(row.overdue_returns) / returns, 4) if returns else None,
+    }
+
+
+def top(dimension="Book", month=None, limit=10):
+    """Most active books or members in a month (first day of it given) or of all time."""
+    granularity, period = ("Month", str(get_first_day(month))) if month else ("Total", TOTAL_PERIOD)
+    return frappe.get_all(
+        "Circulation Rollup",
+        filters={"granularity": granularity, "dimension": dimension, "period": period},
+        fields=["subject", "loans", "returns", "loan_days", "overdue_returns", "last_loan_on"],
+        order_by="loans desc",
+        limit=min(cint(limit) or 10, MAX_RESULTS),
+    )
+
+
+def totals(dimension="All", subject=""):
+    row = frappe.db.get_value(
+        "Circulation Rollup",
+        rollup_name("Total", TOTAL_PERIOD, dimension, subject or ""),
+        [*METRICS, "last_loan_on"],
+        as_dict=True,
+    ) or frappe._dict({metric: 0 for metric in METRICS})
+    return {**summarize(row), "last_loan_on": row.get("last_loan_on")}
+
+
+def dormant_members(days=180, limit=50):
+    """
+    Members with no loan in the last `days` days, longest idle first.
+    Members who never borrowed count as idle since they joined.
+    """
+    cutoff = add_days(nowdate(), -cint(days))
+    return frappe.get_all(
+        "Circulation Rollup",
+        filters={"granularity": "Total", "dimension": "Member", "idle_since": ["<", cutoff]},
+        fields=["subject as member", "last_loan_on", "loans"],
+        order_by="idle_since asc",
+        limit=min(cint(limit) or 50, MAX_RESULTS),
+    )
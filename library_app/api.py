@@ -1,18 +1,72 @@
 # library_app/library_app/api.py
 import frappe
-from frappe.utils import nowdate
+from frappe.core.doctype.user.user import STANDARD_USERS
+from frappe.permissions import AUTOMATIC_ROLES
+from frappe.query_builder import Order
+from frappe.utils import cint, nowdate
+
+from library_app import analytics, cache
+from library_app.circulation import checkout, checkout_many, lock_book, return_many
+from library_app.conditional import not_modified
+from library_app.exports import enqueue_export, get_export, iter_csv, stream_export
+from library_app.instrumentation import get_profile, logger, metrics_response
+from library_app.inventory import add_copies, get_availability
+from library_app.notifications import enqueue_reservation_notice, send_overdue_digests
+from library_app.overdue import mark_overdue_loans
+from library_app.pagination import (
+    DEFAULT_PAGE_LENGTH,
+    MAX_PAGE_LENGTH,
+    decode_cursor,
+    encode_cursor,
+    get_page,
+    wants_page,
+)
+from library_app.queries import (
+    get_loan_rows,
+    get_member_account_rows,
+    get_member_loan_rows,
+    get_member_reservation_rows,
+    get_reservation_rows,
+    loan_report_source,
+    permitted,
+    select_columns,
+    user_source,
+    users_with_role,
+)
+from library_app.reservation_queue import queue_position
+from library_app.search import search_books as search_catalog
+from library_app.stats import get_dashboard_stats as read_dashboard_stats
 
 # --- Book Management API (CRUD) ---
 
 @frappe.whitelist(allow_guest=True) # allow_guest=True is primarily for development testing or public-facing read. For production, consider user roles.
-def get_books():
-    """Fetches all books with specified fields."""
-    books = frappe.get_list("Book", fields=["name", "title", "author", "publish_date", "isbn", "status"])
+def get_books(after=None, page_length=None, order_by=None, fields=None):
+    """
+    Fetches books with specified fields.
+    Without paging arguments the full list is returned, as before; with any of
+    them a keyset-paginated page is returned (see library_app.pagination).
+    """
+    unchanged = not_modified("Book", after=after, page_length=page_length, order_by=order_by, fields=fields)
+    if unchanged is not None:
+        return unchanged
+
+    if wants_page(after, page_length, order_by, fields):
+        return get_cached_page("Book", after, page_length, order_by, fields)
+
+    books = cache.get_list_page("Book", {}, lambda: frappe.get_list(
+        "Book", fields=["name", "title", "author", "publish_date", "isbn", "status", "total_copies", "available_copies"]
+    ))
     return books
 
+@frappe.whitelist(allow_guest=True)
+def search_books(query, limit=20):
+    """Ranked catalog search over title, author and ISBN (prefix matches the last word)."""
+    frappe.has_permission("Book", "read", throw=True)
+    return search_catalog(query, limit=min(cint(limit) or 20, 100))
+
 @frappe.whitelist() # Requires authentication
-def create_book(title, author, publish_date, isbn):
-    """Creates a new book record."""
+def create_book(title, author, publish_date, isbn, copies=1):
+    """Creates a new book record (a title) with `copies` copies on the shelf."""
     try:
         # Validate ISBN uniqueness before creating (Frappe's unique constraint handles this too, but explicit check can give better error message)
         if frappe.db.exists("Book", {"isbn": isbn}):
@@ -26,6 +80,7 @@ def create_book(title, author, publish_date, isbn):
             "isbn": isbn,
             "status": "Available" # Default status for a new book
         })
+        book.flags.copies = cint(copies)
         book.insert()
         frappe.db.commit() # Ensure the transaction is committed
         return {"message": "Book created successfully", "book_name": book.name}
@@ -35,18 +90,57 @@ def create_book(title, author, publish_date, isbn):
         frappe.log_error(frappe.gettraceback(), "Error in create_book API")
         frappe.throw(f"Failed to create book: {e}")
 
+@frappe.whitelist()
+def import_books(file_url, format=None):
+    """
+    Bulk imports books from an uploaded CSV/JSON/JSONL File in a background job.
+    The report (inserted, duplicates, per-row errors) is sent via the 'library_book_import_done' realtime event.
+    """
+    check_librarian_permission()
+    if not frappe.db.exists("File", {"file_url": file_url}):
+        frappe.throw(f"File '{file_url}' not found.")
+    job = frappe.enqueue(
+        "library_app.book_import.import_books_job",
+        queue="long",
+        timeout=4 * 60 * 60,
+        file_url=file_url,
+        fmt=format,
+        user=frappe.session.user,
+    )
+    return {"message": "Import started. You will be notified when it finishes.", "job_id": job.id if job else None}
+
 @frappe.whitelist()
 def get_book(name):
     """Fetches a single book by its name (Frappe's internal ID)."""
     try:
-        book = frappe.get_doc("Book", name)
-        return book.as_dict() # Convert Doc object to dictionary for easier consumption
+        return cache.get_doc_dict("Book", name)
     except frappe.DoesNotExistError:
         frappe.throw(f"Book with ID '{name}' not found.")
     except Exception as e:
         frappe.log_error(frappe.gettraceback(), "Error in get_book API")
         frappe.throw(f"Failed to retrieve book: {e}")
 
+@frappe.whitelist(allow_guest=True)
+def get_book_availability(name):
+    """Copies on the shelf, total copies, reservation queue length and status of a title (one row read)."""
+    try:
+        return get_availability(name)
+    except frappe.DoesNotExistError:
+        frappe.throw(f"Book with ID '{name}' not found.")
+
+@frappe.whitelist()
+def add_book_copies(name, count=1, barcodes=None):
+    """Adds copies of an existing title to the shelf."""
+    check_librarian_permission()
+    if not frappe.db.exists("Book", name):
+        frappe.throw(f"Book with ID '{name}' not found.")
+    barcodes = frappe.parse_json(barcodes) if isinstance(barcodes, str) else barcodes
+    # held under the Book row lock like every other copy change
+    lock_book(name)
+    copies = add_copies(name, cint(count), barcodes)
+    frappe.db.commit()
+    return {"message": f"Added {len(copies)} copies", "book_name": name, "copies": copies}
+
 @frappe.whitelist()
 def update_book(name, title=None, author=None, publish_date=None, isbn=None, status=None):
     """Updates an existing book record."""
@@ -99,10 +193,19 @@ def delete_book(name):
 # --- Member Management API (CRUD) ---
 
 @frappe.whitelist()
-def get_members():
-    """Fetches all library members."""
+def get_members(after=None, page_length=None, order_by=None, fields=None):
+    """Fetches library members (all of them, or one page when paging arguments are given)."""
+    unchanged = not_modified("Member", after=after, page_length=page_length, order_by=order_by, fields=fields)
+    if unchanged is not None:
+        return unchanged
+
+    if wants_page(after, page_length, order_by, fields):
+        return get_cached_page("Member", after, page_length, order_by, fields)
+
     try:
-        members = frappe.get_list("Member", fields=["name", "member_name", "membership_id", "email", "phone", "frappe_user"])
+        members = cache.get_list_page("Member", {}, lambda: frappe.get_list(
+            "Member", fields=["name", "member_name", "membership_id", "email", "phone", "frappe_user"]
+        ))
         return members or []  # Return empty array if no members
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "API Error: get_members")
@@ -138,8 +241,7 @@ def create_member(member_name, membership_id, email, phone, frappe_user=None):
 def get_member(name):
     """Fetches a single member by its name (Frappe's internal ID)."""
     try:
-        member = frappe.get_doc("Member", name)
-        return member.as_dict()
+        return cache.get_doc_dict("Member", name)
     except frappe.DoesNotExistError:
         frappe.throw(f"Member with ID '{name}' not found.")
     except Exception as e:
@@ -150,8 +252,6 @@ def get_member(name):
 def get_member_by_user(user):
     """Get member information for a specific user."""
     try:
-        print(f"Looking for member with user: {user}")  # Debug log
-        
         member = frappe.get_list(
             "Member",
             filters={"user": user},
@@ -159,8 +259,8 @@ def get_member_by_user(user):
             limit=1
         )
         
-        print(f"Found member: {member}")  # Debug log
-        
+        logger().debug({"event": "get_member_by_user", "user": user, "found": bool(member)})
+
         if member:
             return member[0]
         else:
@@ -266,43 +366,21 @@ def delete_member(name):
 def create_loan(book_name, member_name, loan_date, return_date):
     """
     Creates a new library loan.
-    Includes availability check to prevent loaning an already loaned book.
+    The book row is locked for the check-and-lend, so concurrent checkouts of
+    the same book cannot both succeed (see library_app.circulation).
     """
     try:
-        book = frappe.get_doc("Book", book_name)
-
-        # --- Availability Check (MUST-HAVE) ---
-        if book.status == "On Loan":
-            frappe.throw(f"Book '{book.title}' (ISBN: {book.isbn}) is already on loan.")
-
-        # Additional check: Does this member already have this specific book on loan?
-        # This handles cases where a book might be returned and re-loaned, but prevents
-        # a single member from having the same book multiple times (if that's a rule).
-        if frappe.db.exists("Loan", {"book": book_name, "member": member_name, "returned": 0}):
-            frappe.throw(f"Member '{member_name}' already has '{book.title}' on loan.")
-
-        # Create the Loan document
-        loan = frappe.get_doc({
-            "doctype": "Loan",
-            "book": book_name,
-            "member": member_name,
-            "loan_date": loan_date,
-            "return_date": return_date,
-            "returned": 0, # Not returned yet
-            "overdue": 0  # Not overdue initially
-        })
-        loan.insert()
-
-        # Update book status to "On Loan"
-        book.status = "On Loan"
-        book.save() # Saves the changes to the Book DocType
-
+        loan = checkout(book_name, member_name, loan_date, return_date)
         frappe.db.commit()
         return {"message": "Loan created successfully", "loan_name": loan.name}
     except frappe.DoesNotExistError:
         frappe.throw("Invalid Book ID or Member ID provided for loan.")
+    except frappe.ValidationError:
+        frappe.db.rollback()
+        raise
     except Exception as e:
-        frappe.log_error(frappe.gettraceback(), "Error in create_loan API")
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Error in create_loan API")
         frappe.throw(f"Failed to create loan: {e}")
 
 @frappe.whitelist()
@@ -317,35 +395,18 @@ def return_book(loan_name):
         if loan.returned:
             frappe.throw(f"Loan '{loan_name}' has already been marked as returned.")
 
-        # Mark loan as returned
+        # Mark loan as returned; the Loan controller puts the copy back on the
+        # shelf or holds it for the head of the reservation queue
         loan.returned = 1
         loan.save()
 
-        # Update associated Book's status
-        book = frappe.get_doc("Book", loan.book)
-        
-        # Check if there are pending reservations for this book
-        pending_reservations = frappe.get_list(
-            "Reservation", 
-            filters={"book": loan.book, "status": "Pending"},
-            order_by="reserve_date asc",
-            limit=1
-        )
-        
-        if pending_reservations:
-            # Update book status to "Reserved" and mark the reservation as completed
-            book.status = "Reserved"
-            reservation = frappe.get_doc("Reservation", pending_reservations[0].name)
-            reservation.status = "Completed"
-            reservation.save()
-            
+        reservation = loan.flags.held_for
+        if reservation:
             # Send notification to the member who reserved the book
-            send_reservation_notification(reservation.member, book.title)
-        else:
-            # No reservations, make book available
-            book.status = "Available"
-        
-        book.save()
+            send_reservation_notification(
+                reservation.member, frappe.db.get_value("Book", loan.book, "title"), reservation.name
+            )
+
         frappe.db.commit()
         return {"message": "Book returned successfully", "loan_name": loan.name}
     except frappe.DoesNotExistError:
@@ -355,21 +416,60 @@ def return_book(loan_name):
         frappe.throw(f"Failed to return book: {e}")
 
 @frappe.whitelist()
-def get_loans():
-    """Fetches all library loans with book title and member name."""
+def create_loans_bulk(member_name, book_names, loan_date, return_date):
+    """
+    Lends a basket of books to one member in a single transaction.
+    Returns {"results": [...]} with one entry per book; unavailable books are
+    reported there and do not stop the others.
+    """
+    check_librarian_permission()
+    try:
+        results = checkout_many(member_name, book_names, loan_date, return_date)
+        frappe.db.commit()
+    except frappe.ValidationError:
+        frappe.db.rollback()
+        raise
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Error in create_loans_bulk API")
+        frappe.throw(f"Failed to create loans: {e}")
+    return {"results": results, "lent": sum(1 for r in results if r["ok"])}
+
+@frappe.whitelist()
+def return_books_bulk(loan_names):
+    """
+    Returns a basket of loans in a single transaction and hands each released
+    book to its next pending reservation. Returns {"results": [...]} per loan.
+    """
+    check_librarian_permission()
     try:
-        loans = frappe.get_list(
-            "Loan",
-            fields=["name", "book", "member", "loan_date", "return_date", "returned", "overdue"]
-        )
-        # Add book_title and member_name for display
-        for loan in loans:
-            # Get book title
-            book_doc = frappe.get_doc("Book", loan.book)
-            loan["book_title"] = book_doc.title
-            # Get member name
-            member_doc = frappe.get_doc("Member", loan.member)
-            loan["member_name"] = member_doc.member_name
+        results = return_many(loan_names)
+        for result in results:
+            if result.get("reserved_for"):
+                send_reservation_notification(result["reserved_for"], result["book_title"], result["reservation"])
+        frappe.db.commit()
+    except frappe.ValidationError:
+        frappe.db.rollback()
+        raise
+    except Exception as e:
+        frappe.db.rollback()
+        frappe.log_error(frappe.get_traceback(), "Error in return_books_bulk API")
+        frappe.throw(f"Failed to return books: {e}")
+    return {"results": results, "returned": sum(1 for r in results if r["ok"])}
+
+@frappe.whitelist()
+def get_loans(after=None, page_length=None, order_by=None, fields=None):
+    """Fetches library loans with book title and member name (all, or one page when paging arguments are given)."""
+    unchanged = not_modified("Loan", after=after, page_length=page_length, order_by=order_by, fields=fields)
+    if unchanged is not None:
+        return unchanged
+
+    if wants_page(after, page_length, order_by, fields):
+        return get_cached_page("Loan", after, page_length, order_by, fields)
+
+    try:
+        # book_title and member_name come from a single joined query
+        loans = cache.get_list_page("Loan", {}, get_loan_rows)
         return loans or []  # Return as dict for consistency
     except Exception as e:
         frappe.log_error(frappe.get_traceback(), "API Error: get_loans")
@@ -379,8 +479,7 @@ def get_loans():
 def get_loan(name):
     """Fetches a single loan by its name (Frappe's internal ID)."""
     try:
-        loan = frappe.get_doc("Loan", name)
-        return loan.as_dict()
+        return cache.get_doc_dict("Loan", name)
     except frappe.DoesNotExistError:
         frappe.throw(f"Loan with ID '{name}' not found.")
     except Exception as e:
@@ -390,60 +489,67 @@ def get_loan(name):
 # --- Reports (Initial) ---
 
 @frappe.whitelist()
-def get_books_on_loan_report():
-    """Returns a list of books currently on loan."""
-    books_on_loan = frappe.get_list(
-        "Loan",
-        filters={"returned": 0}, # Not yet returned
-        fields=["name", "book", "member", "loan_date", "return_date"],
-        order_by="loan_date desc"
-    )
+def get_dashboard_stats(days=30):
+    """Dashboard counts (books per status, loans, overdue, reservations, loans per day) from maintained counters."""
+    check_librarian_permission()
+    return read_dashboard_stats(days=min(cint(days) or 30, 366))
+
+REPORT_COLUMNS = {
+    "loan_id": "name",
+    "book_title": "book_title",
+    "book_id": "book",
+    "member_name": "member_name",
+    "member_id": "member",
+    "member_email": "member_email",
+    "loan_date": "loan_date",
+    "return_date": "return_date",
+}
+
+
+def loan_report(after, page_length, order_by, default_order, fields, overdue=False):
+    """
+    Reads the materialized open-loan report (see library_app.loan_report):
+    one page with a cursor when paging arguments are given, else every row
+    in one query. Rows use the report's field names (loan_id, book_id, ...).
+    """
+    conditions = [lambda columns: columns["return_date"] < nowdate()] if overdue else []
+
+    if wants_page(after, page_length, order_by):
+        page = get_page(
+            "Loan Report Row",
+            after=after,
+            page_length=page_length,
+            order_by=order_by or default_order,
+            fields=[REPORT_COLUMNS[field] for field in fields],
+            conditions=conditions,
+        )
+        page["data"] = [{field: row[REPORT_COLUMNS[field]] for field in fields} for row in page["data"]]
+        return page
+
+    query, columns = loan_report_source()
+    query = permitted(query, "Loan Report Row")
+    query = query.select(*[columns[REPORT_COLUMNS[field]].as_(field) for field in fields])
+    for condition in conditions:
+        query = query.where(condition(columns))
+    sort_field, order = default_order.split()
+    return query.orderby(columns[sort_field], order=Order.desc if order == "desc" else Order.asc).run(as_dict=True)
 
-    # To make the report more user-friendly, fetch book titles and member names
-    detailed_report = []
-    for loan in books_on_loan:
-        book_title = frappe.db.get_value("Book", loan.book, "title")
-        member_name = frappe.db.get_value("Member", loan.member, "member_name")
-        detailed_report.append({
-            "loan_id": loan.name,
-            "book_title": book_title,
-            "book_id": loan.book,
-            "member_name": member_name,
-            "member_id": loan.member,
-            "loan_date": loan.loan_date,
-            "return_date": loan.return_date
-        })
-    return detailed_report
 
 @frappe.whitelist()
-def get_overdue_books_report():
-    """Returns a list of books that are currently overdue."""
-    import datetime
-    today = frappe.utils.nowdate() # Get today's date in Frappe's format
-
-    overdue_loans = frappe.get_list(
-        "Loan",
-        filters={"returned": 0, "return_date": ["<", today]}, # Not returned AND return_date is in the past
-        fields=["name", "book", "member", "loan_date", "return_date"],
-        order_by="return_date asc"
-    )
+def get_books_on_loan_report(after=None, page_length=None, order_by=None):
+    """
+    Returns the books currently on loan, newest loans first (all of them, or
+    one page when paging arguments are given; sortable by loan_date,
+    return_date, book_title or member_name).
+    """
+    fields = ["loan_id", "book_title", "book_id", "member_name", "member_id", "loan_date", "return_date"]
+    return loan_report(after, page_length, order_by, "loan_date desc", fields)
 
-    detailed_report = []
-    for loan in overdue_loans:
-        book_title = frappe.db.get_value("Book", loan.book, "title")
-        member_name = frappe.db.get_value("Member", loan.member, "member_name")
-        member_email = frappe.db.get_value("Member", loan.member, "email")
-        detailed_report.append({
-            "loan_id": loan.name,
-            "book_title": book_title,
-            "book_id": loan.book,
-            "member_name": member_name,
-            "member_id": loan.member,
-            "member_email": member_email, # Include email for notifications later
-            "loan_date": loan.loan_date,
-            "return_date": loan.return_date
-        })
-    return detailed_report
+@frappe.whitelist()
+def get_overdue_books_report(after=None, page_length=None, order_by=None):
+    """Returns the books that are currently overdue, longest overdue first (paged like get_books_on_loan_report)."""
+    fields = ["loan_id", "book_title", "book_id", "member_name", "member_id", "member_email", "loan_date", "return_date"]
+    return loan_report(after, page_length, order_by, "return_date asc", fields, overdue=True)
 
 @frappe.whitelist(allow_guest=True)
 def register_user(full_name, email, password, phone=None):
@@ -571,14 +677,77 @@ def create_manager_user(full_name, email, password, phone=None):
 
 # --- Reservation Management API ---
 
+@frappe.whitelist()
+def get_circulation_trend(granularity="Month", from_date=None, to_date=None, book=None, member=None):
+    """
+    Loans, returns, average loan length and overdue-return rate per day or
+    month, for the whole library or one book or member, read from the
+    circulation rollups (see library_app.analytics).
+    """
+    check_librarian_permission()
+    if book and member:
+        frappe.throw("Filter by a book or a member, not both.")
+    dimension, subject = ("Book", book) if book else ("Member", member) if member else ("All", "")
+    return {
+        "periods": analytics.trend(granularity, from_date, to_date, dimension, subject),
+        "totals": analytics.totals(dimension, subject),
+    }
+
+@frappe.whitelist()
+def get_top_titles(month=None, limit=10):
+    """The most borrowed titles of a month (any date in it) or of all time."""
+    check_librarian_permission()
+    rows = analytics.top("Book", month, limit)
+    titles = dict(frappe.get_all(
+        "Book", filters={"name": ["in", [row.subject for row in rows]]}, fields=["name", "title"], as_list=True
+    )) if rows else {}
+    return [
+        {"book_id": row.subject, "book_title": titles.get(row.subject), **analytics.summarize(row)}
+        for row in rows
+    ]
+
+@frappe.whitelist()
+def get_dormant_members(days=180, limit=50):
+    """Members with no loan in the last `days` days (never-borrowers since joining), longest idle first."""
+    check_librarian_permission()
+    rows = analytics.dormant_members(days, limit)
+    names = dict(frappe.get_all(
+        "Member", filters={"name": ["in", [row.member for row in rows]]}, fields=["name", "member_name"], as_list=True
+    )) if rows else {}
+    return [{**row, "member_name": names.get(row.member)} for row in rows]
+
+@frappe.whitelist()
+def import_members(file_url, format=None, default_role="Library Member", resume=False):
+    """
+    Onboards a roster of patrons (CSV/JSON/JSONL File: email, full_name,
+    phone, membership_id, role, password) as Users with Members, in a
+    background job. The report is sent via the 'library_member_import_done'
+    realtime event. Pass resume=1 to continue an import that failed midway.
+    """
+    frappe.only_for("System Manager")
+    if not frappe.db.exists("File", {"file_url": file_url}):
+        frappe.throw(f"File '{file_url}' not found.")
+    job = frappe.enqueue(
+        "library_app.onboarding.onboard_members_job",
+        queue="long",
+        timeout=4 * 60 * 60,
+        file_url=file_url,
+        fmt=format,
+        default_role=default_role,
+        resume=cint(resume),
+        user=frappe.session.user,
+    )
+    return {"message": "Import started. You will be notified when it finishes.", "job_id": job.id if job else None}
+
 @frappe.whitelist()
 def create_reservation(book_name, member_name):
     """Creates a new book reservation."""
     try:
-        book = frappe.get_doc("Book", book_name)
+        # joining the queue locks the book row; take the lock before the checks
+        book = lock_book(book_name)
         
         # Check if book is available for reservation
-        if book.status == "Available":
+        if book.available_copies > 0:
             frappe.throw(f"Book '{book.title}' is available. You can loan it directly instead of reserving.")
         
         # Check if member already has a pending reservation for this book
@@ -593,18 +762,18 @@ def create_reservation(book_name, member_name):
             "doctype": "Reservation",
             "book": book_name,
             "member": member_name,
-            "reservation_date": frappe.utils.nowdate(),
+            "reserve_date": frappe.utils.nowdate(),
             "status": "Pending"
         })
+        # joins the queue and marks the book "Reserved" (see the Reservation controller)
         reservation.insert()
         
-        # Update book status to "Reserved" if it's not already
-        if book.status != "Reserved":
-            book.status = "Reserved"
-            book.save()
-        
         frappe.db.commit()
-        return {"message": "Reservation created successfully", "reservation_name": reservation.name}
+        return {
+            "message": "Reservation created successfully",
+            "reservation_name": reservation.name,
+            "queue_position": queue_position(reservation),
+        }
     except frappe.DoesNotExistError:
         frappe.throw("Invalid Book ID or Member ID provided for reservation.")
     except Exception as e:
@@ -612,39 +781,20 @@ def create_reservation(book_name, member_name):
         frappe.throw(f"Failed to create reservation: {e}")
 
 @frappe.whitelist()
-def get_reservations():
-    """Fetches all reservations with book and member details."""
+def get_reservations(after=None, page_length=None, order_by=None, fields=None):
+    """Fetches reservations with book and member details (all, or one page when paging arguments are given)."""
+    unchanged = not_modified("Reservation", after=after, page_length=page_length, order_by=order_by, fields=fields)
+    if unchanged is not None:
+        return unchanged
+
+    if wants_page(after, page_length, order_by, fields):
+        return get_cached_page("Reservation", after, page_length, order_by, fields)
+
     try:
-        print("get_reservations API called")  # Debug log
-        
-        reservations = frappe.get_list(
-            "Reservation", 
-            fields=["name", "book", "member", "reserve_date", "status"],
-            order_by="reserve_date asc"
-        )
-        
-        print(f"Found {len(reservations)} reservations")  # Debug log
-        
-        # Add book_title and member_name for display
-        for reservation in reservations:
-            try:
-                # Get book title
-                book_doc = frappe.get_doc("Book", reservation.book)
-                reservation["book_title"] = book_doc.title
-                
-                # Get member name
-                member_doc = frappe.get_doc("Member", reservation.member)
-                reservation["member_name"] = member_doc.member_name
-            except Exception as e:
-                print(f"Error processing reservation {reservation.name}: {e}")
-                reservation["book_title"] = "Unknown Book"
-                reservation["member_name"] = "Unknown Member"
-        
-        result = reservations or []
-        print(f"Returning result: {result}")  # Debug log
-        return result
+        # book_title and member_name come from a single joined query
+        reservations = cache.get_list_page("Reservation", {}, get_reservation_rows)
+        return reservations or []
     except Exception as e:
-        print(f"Error in get_reservations: {e}")  # Debug log
         frappe.log_error(frappe.get_traceback(), "API Error: get_reservations")
         return []
 
@@ -657,23 +807,10 @@ def cancel_reservation(reservation_name):
         if reservation.status != "Pending":
             frappe.throw(f"Reservation '{reservation_name}' cannot be cancelled. Status: {reservation.status}")
         
+        # leaves the queue; the book's status follows its copies and queue length
         reservation.status = "Cancelled"
         reservation.save()
         
-        # Check if there are other pending reservations for this book
-        pending_reservations = frappe.get_list(
-            "Reservation", 
-            filters={"book": reservation.book, "status": "Pending"},
-            order_by="reserve_date asc"
-        )
-        
-        if not pending_reservations:
-            # No more pending reservations, make book available if not on loan
-            book = frappe.get_doc("Book", reservation.book)
-            if not frappe.db.exists("Loan", {"book": reservation.book, "returned": 0}):
-                book.status = "Available"
-                book.save()
-        
         frappe.db.commit()
         return {"message": "Reservation cancelled successfully", "reservation_name": reservation.name}
     except frappe.DoesNotExistError:
@@ -687,147 +824,50 @@ def cancel_reservation(reservation_name):
 
 
 def send_overdue_notifications():
-    """Send email notifications to members with overdue loans."""
-    # Find all loans that are overdue and not yet returned
-    overdue_loans = frappe.get_all(
-        "Loan",
-        filters={
-            "overdue": 1,
-            "returned": 0
-        },
-        fields=["name", "book", "member", "loan_date", "return_date"]
-    )
-
-    for loan in overdue_loans:
-        try:
-            member = frappe.get_doc("Member", loan["member"])
-            book = frappe.get_doc("Book", loan["book"])
-            # Compose email
-            subject = f"Overdue Notice: {book.title}"
-            message = f"""
-Dear {member.member_name},
-
-This is a reminder that your loan for the book '{book.title}' was due on {loan['return_date']} and is now overdue.
-
-Please return the book as soon as possible to avoid penalties.
-
-Thank you,
-Library Team
-"""
-            # Send email
-            frappe.sendmail(
-                recipients=[member.email],
-                subject=subject,
-                message=message
-            )
-            # Optionally, log that notification was sent (custom DocType or Notification Log)
-            print(f"Sent overdue notice to {member.email} for loan {loan['name']}")
-        except Exception as e:
-            frappe.log_error(frappe.get_traceback(), "Error sending overdue notification")
+    """
+    Send email notifications to members with overdue loans.
+    Each member gets one digest covering all of their overdue loans that were
+    not notified before; see library_app.notifications.
+    """
+    return send_overdue_digests()
 
-def send_reservation_notification(member_name, book_title):
-    """Sends notification when a reserved book becomes available."""
-    try:
-        member = frappe.get_doc("Member", member_name)
-        subject = f"Book Available: {book_title}"
-        message = f"""
-        Dear {member.member_name},
-        
-        The book "{book_title}" that you reserved is now available for loan.
-        Please visit the library to collect your book within 48 hours.
-        
-        Thank you,
-        Library Management System
-        """
-        
-        frappe.sendmail(
-            recipients=[member.email],
-            subject=subject,
-            message=message,
-            now=True
-        )
-        return True
-    except Exception as e:
-        frappe.log_error(f"Failed to send reservation notification: {e}")
-        return False
+def send_reservation_notification(member_name, book_title, reservation=None):
+    """
+    Queues the notification that a reserved book is available. The email is
+    rendered and sent by a background job once the caller commits, with retries
+    (see library_app.notifications).
+    """
+    enqueue_reservation_notice(member_name, book_title, reservation)
 
 # --- Overdue Check and Notification System ---
 
 @frappe.whitelist()
-def check_and_notify_overdue_books():
+def check_and_notify_overdue_books(batch_size=None):
     """Checks for overdue books and sends notifications. Should be run as a scheduled task."""
-    import datetime
-    today = frappe.utils.nowdate()
-    
-    overdue_loans = frappe.get_list(
-        "Loan",
-        filters={"returned": 0, "return_date": ["<", today], "overdue": 0},  # Not returned, overdue, not yet marked as overdue
-        fields=["name", "book", "member", "return_date"]
-    )
-    
-    notifications_sent = 0
-    for loan in overdue_loans:
-        # Mark loan as overdue
-        loan_doc = frappe.get_doc("Loan", loan.name)
-        loan_doc.overdue = 1
-        loan_doc.save()
-        
-        # Send notification
-        book_title = frappe.db.get_value("Book", loan.book, "title")
-        member_name = frappe.db.get_value("Member", loan.member, "member_name")
-        member_email = frappe.db.get_value("Member", loan.member, "email")
-        
-        if send_overdue_notifications():
-            notifications_sent += 1
-    
+    # Set-based: flags loans in chunks and returns only the loans that changed
+    overdue_loans = mark_overdue_loans(batch_size=batch_size)
+
+    # Digests cover loans not notified yet, i.e. the ones just marked plus
+    # any left over from an interrupted run
+    digests = send_overdue_notifications()
+
     frappe.db.commit()
-    return {"message": f"Processed {len(overdue_loans)} overdue loans, sent {notifications_sent} notifications"}
+    return {"message": f"Processed {len(overdue_loans)} overdue loans, sent {digests['members_notified']} notifications"}
 
 # --- Export Functionality ---
 
 @frappe.whitelist()
 def export_member_loan_history(member_name, format="csv"):
-    """Exports a member's loan history as CSV."""
+    """
+    Exports a member's loan history as CSV in a JSON field.
+    Kept for existing callers; download_export streams the same file (and XLSX) instead.
+    """
     try:
-        # Get all loans for the member
-        loans = frappe.get_list(
-            "Loan",
-            filters={"member": member_name},
-            fields=["name", "book", "loan_date", "return_date", "returned", "overdue"],
-            order_by="loan_date desc"
-        )
-        
         if format.lower() == "csv":
-            import csv
-            import io
-            
-            output = io.StringIO()
-            writer = csv.writer(output)
-            
-            # Write header
-            writer.writerow(["Loan ID", "Book Title", "ISBN", "Loan Date", "Return Date", "Status", "Overdue"])
-            
-            # Write data
-            for loan in loans:
-                book_title = frappe.db.get_value("Book", loan.book, "title")
-                book_isbn = frappe.db.get_value("Book", loan.book, "isbn")
-                
-                status = "Returned" if loan.returned else "On Loan"
-                overdue = "Yes" if loan.overdue else "No"
-                
-                writer.writerow([
-                    loan.name,
-                    book_title,
-                    book_isbn,
-                    loan.loan_date,
-                    loan.return_date,
-                    status,
-                    overdue
-                ])
-            
-            csv_content = output.getvalue()
-            output.close()
-            
+            spec = get_export("member_loan_history", member_name, "csv")
+            # One joined query for all rows instead of two lookups per loan
+            csv_content = "".join(iter_csv(spec, member_name))
+
             return {
                 "content": csv_content,
                 "filename": f"loan_history_{member_name}_{frappe.utils.nowdate()}.csv",
@@ -840,6 +880,19 @@ def export_member_loan_history(member_name, format="csv"):
         frappe.log_error(frappe.gettraceback(), "Error in export_member_loan_history API")
         frappe.throw(f"Failed to export loan history: {e}")
 
+@frappe.whitelist()
+def download_export(export, format="csv", member=None):
+    """
+    Streams an export straight to the HTTP response.
+    export: member_loan_history (needs member), loans, overdue or catalog; format: csv or xlsx.
+    """
+    return stream_export(export, (format or "csv").lower(), member)
+
+@frappe.whitelist()
+def start_export(export, format="csv", member=None):
+    """Builds an export in a background job; the file URL is sent via the 'library_export_ready' realtime event."""
+    return enqueue_export(export, (format or "csv").lower(), member)
+
 # --- Role-based Permission Checks ---
 
 def check_librarian_permission():
@@ -900,36 +953,19 @@ def return_book_with_permission(loan_name):
 def get_my_loans():
     """Return loans for the currently logged-in user (member)."""
     user = frappe.session.user
-    print(f"Current session user: {user}")
-    member_list = frappe.get_list(
-        "Member",
-        filters={"user": user},
-        fields=["name"]
-    )
-    print(f"Found member_list: {member_list}")
-    if not member_list:
+    member_name = cache.get_member_for_user(user)
+    if not member_name:
+        logger().debug({"event": "get_my_loans", "user": user, "member": None})
         return []
-    member_name = member_list[0].name
-
-    loans = frappe.get_list(
-        "Loan",
-        filters={"member": member_name},
-        fields=["name", "book", "loan_date", "return_date", "returned", "overdue"],
-        order_by="loan_date desc"
-    )
-    print(f"Found loans: {loans}")
 
+    # book_title and book_author come from the same joined query
+    loans = get_member_loan_rows(member_name)
     for loan in loans:
-        try:
-            book_doc = frappe.get_doc("Book", loan.book)
-            loan["book_title"] = book_doc.title
-            loan["book_author"] = book_doc.author
-        except Exception:
-            loan["book_title"] = "Unknown"
-            loan["book_author"] = "Unknown"
+        loan["book_title"] = loan.book_title or "Unknown"
+        loan["book_author"] = loan.book_author or "Unknown"
 
-    print(f"Returning loans: {loans}")
-    return loans or [] 
+    logger().debug({"event": "get_my_loans", "user": user, "member": member_name, "loans": len(loans)})
+    return loans or []
 
 
 
@@ -938,43 +974,61 @@ def get_my_reservations():
     """Return reservations for the currently logged-in user (member)."""
     try:
         user = frappe.session.user
-        print(f"Current session user: {user}")
-        member_list = frappe.get_list(
-            "Member",
-            filters={"user": user},
-            fields=["name"]
-        )
-        print(f"Found member_list: {member_list}")
-        if not member_list:
+        member_name = cache.get_member_for_user(user)
+        if not member_name:
+            logger().debug({"event": "get_my_reservations", "user": user, "member": None})
             return {"message": []}
-        member_name = member_list[0].name
 
-        reservations = frappe.get_list(
-            "Reservation",
-            filters={"member": member_name},
-            fields=["name", "book", "reserve_date", "status"],
-            order_by="reserve_date desc"
-        )
-        print(f"Found reservations: {reservations}")
-
-        for reservation in reservations:
-            try:
-                book_doc = frappe.get_doc("Book", reservation.book)
-                reservation["book_title"] = book_doc.title
-                reservation["book_author"] = book_doc.author
-            except Exception as e:
-                print(f"Error processing reservation {reservation.name}: {e}")
-                reservation["book_title"] = "Unknown"
-                reservation["book_author"] = "Unknown"
-
-        print(f"Returning reservations: {reservations}")
+        # queue_position is the member's place in line while the reservation is Pending
+        reservations = get_member_reservation_rows(member_name)
         return reservations or []
     except Exception as e:
-        print(f"Error in get_my_reservations: {e}")
         frappe.log_error(frappe.get_traceback(), "API Error: get_my_reservations")
         return []
 
 
+@frappe.whitelist()
+def get_my_account(history_after=None, history_length=None):
+    """
+    Everything the member app shows for the logged-in member in one call:
+    profile, active loans with overdue flags, one page of loan history
+    (pass `next_cursor` back as `history_after`) and reservations with their
+    place in the queue. The user -> member lookup is cached.
+    """
+    user = frappe.session.user
+    member_name = cache.get_member_for_user(user)
+    if not member_name:
+        frappe.throw(f"No member found for user '{user}'", frappe.DoesNotExistError)
+
+    history_length = min(cint(history_length) or DEFAULT_PAGE_LENGTH, MAX_PAGE_LENGTH)
+    after = decode_cursor(history_after, "loan_date", "desc") if history_after else None
+    rows = get_member_account_rows(member_name, history_length, after)
+
+    sections = {"active": [], "history": [], "reservation": []}
+    for row in rows:
+        section = sections[row.pop("section")]
+        if row.overdue is not None:
+            row.overdue = cint(row.overdue)
+        section.append(row)
+
+    history = sections["history"]
+    has_more = len(history) > history_length
+    history = history[:history_length]
+    next_cursor = (
+        encode_cursor("loan_date", "desc", {"loan_date": history[-1].date, "name": history[-1].name}) if has_more else None
+    )
+
+    profile = cache.get_doc_dict("Member", member_name)
+    active = sorted(sections["active"], key=lambda loan: loan.due_date)
+    return {
+        "member": {field: profile.get(field) for field in ("name", "member_name", "membership_id", "email", "phone")},
+        "active_loans": active,
+        "overdue_count": sum(1 for loan in active if loan.overdue),
+        "history": {"data": history, "next_cursor": next_cursor, "has_more": has_more},
+        "reservations": sorted(sections["reservation"], key=lambda r: (r.status != "Completed", r.queue_position or 0)),
+    }
+
+
 @frappe.whitelist()
 def get_current_user_roles():
     """Gets the roles of the currently logged-in user."""
@@ -993,17 +1047,48 @@ def get_current_user_roles():
         return {"roles": [], "user": None, "error": str(e)}
 
 
+USER_LIST_FIELDS = ["name", "email", "first_name", "last_name", "full_name", "enabled", "user_type", "last_login", "roles"]
+
+
+def user_conditions(search=None, role=None, include_website_users=False):
+    """list_all_users criteria, as callables taking user_source() columns."""
+    conditions = [lambda columns: columns["enabled"] == 1]
+    if not cint(include_website_users):
+        conditions.append(lambda columns: columns["user_type"] != "Website User")
+    if search:
+        pattern = f"%{search.strip()}%"
+        conditions.append(lambda columns: columns["name"].like(pattern) | columns["full_name"].like(pattern))
+    if role:
+        conditions.append(lambda columns: columns["name"].isin(users_with_role(role)))
+    return conditions
+
+
 @frappe.whitelist()
-def list_all_users():
-    """List all Frappe users with their roles and status."""
-    users = frappe.get_all(
-        "User",
-        filters={"enabled": 1, "user_type": ["!=", "Website User"]},  # Exclude system/website users if needed
-        fields=["name", "email", "first_name", "last_name", "enabled", "last_login"]
-    )
+def list_all_users(after=None, page_length=None, order_by=None, search=None, role=None, include_website_users=0):
+    """
+    Enabled users with their roles, each list of roles aggregated in the same
+    query. Filter by `role` or a `search` on email/full name; website users are
+    left out unless include_website_users=1. Returns every user, or one page
+    (sortable by name, creation or modified) when paging arguments are given.
+    System Manager only.
+    """
+    frappe.only_for("System Manager")
+    conditions = user_conditions(search, role, include_website_users)
+
+    if wants_page(after, page_length, order_by):
+        page = get_page("User", after=after, page_length=page_length, order_by=order_by or "name asc", conditions=conditions)
+        users = page["data"]
+    else:
+        query, columns = user_source()
+        query = select_columns(query, columns, USER_LIST_FIELDS)
+        for condition in conditions:
+            query = query.where(condition(columns))
+        page = None
+        users = query.orderby(columns["name"]).run(as_dict=True)
+
     for user in users:
-        user["roles"] = [r.role for r in frappe.get_all("Has Role", filters={"parent": user["name"]}, fields=["role"])]
-    return users
+        user["roles"] = sorted(user.roles.split(",")) if user.get("roles") else []
+    return page or users
 
 @frappe.whitelist()
 def set_user_roles(user_email, roles):
@@ -1017,6 +1102,95 @@ def set_user_roles(user_email, roles):
     return {"message": f"Roles updated for {user_email}"}
 
 
+@frappe.whitelist()
+def set_user_roles_bulk(users, add_roles=None, remove_roles=None):
+    """
+    Adds and/or removes roles for many users in one transaction, with
+    set-based writes. System Manager only.
+    Returns {"users": n, "added": n, "removed": n}.
+    """
+    frappe.only_for("System Manager")
+    users = sorted(set(frappe.parse_json(users) if isinstance(users, str) else users or []))
+    add_roles = set(frappe.parse_json(add_roles) if isinstance(add_roles, str) else add_roles or [])
+    remove_roles = set(frappe.parse_json(remove_roles) if isinstance(remove_roles, str) else remove_roles or [])
+    if not users or not (add_roles or remove_roles):
+        frappe.throw("Pass users and the roles to add or remove.")
+    if add_roles & remove_roles:
+        frappe.throw(f"Cannot both add and remove: {', '.join(sorted(add_roles & remove_roles))}")
+    return change_user_roles(users, add_roles, remove_roles)
+
+
+def change_user_roles(users, add_roles, remove_roles):
+    protected = set(users) & set(STANDARD_USERS)
+    if protected:
+        frappe.throw(f"Roles of {', '.join(sorted(protected))} cannot be changed here.")
+    roles = add_roles | remove_roles
+    automatic = roles & set(AUTOMATIC_ROLES)
+    if automatic:
+        frappe.throw(f"{', '.join(sorted(automatic))} cannot be assigned.")
+    missing_roles = roles - set(frappe.get_all("Role", filters={"name": ["in", list(roles)]}, pluck="name"))
+    if missing_roles:
+        frappe.throw(f"Unknown role(s): {', '.join(sorted(missing_roles))}")
+    found = frappe.db.sql_list("SELECT name FROM `tabUser` WHERE name IN %s ORDER BY name FOR UPDATE", (tuple(users),))
+    missing_users = set(users) - set(found)
+    if missing_users:
+        frappe.throw(f"Unknown user(s): {', '.join(sorted(missing_users))}")
+
+    now = frappe.utils.now_datetime()
+    session_user = frappe.session.user
+    have = set(frappe.db.sql(
+        "SELECT parent, role FROM `tabHas Role` WHERE parenttype = 'User' AND parent IN %s AND role IN %s",
+        (tuple(users), tuple(roles)),
+    ))
+    removed = sum(1 for _, role in have if role in remove_roles)
+    if removed:
+        frappe.db.sql(
+            "DELETE FROM `tabHas Role` WHERE parenttype = 'User' AND parent IN %s AND role IN %s",
+            (tuple(users), tuple(remove_roles)),
+        )
+
+    added = []
+    if add_roles:
+        next_idx = dict(frappe.db.sql(
+            "SELECT parent, MAX(idx) FROM `tabHas Role` WHERE parenttype = 'User' AND parent IN %s GROUP BY parent",
+            (tuple(users),),
+        ))
+        for user in users:
+            for role in sorted(add_roles):
+                if (user, role) not in have:
+                    next_idx[user] = (next_idx.get(user) or 0) + 1
+                    added.append((
+                        frappe.generate_hash(length=10), user, "User", "roles", next_idx[user], role,
+                        now, now, session_user, session_user,
+                    ))
+        if added:
+            frappe.db.bulk_insert(
+                "Has Role",
+                ["name", "parent", "parenttype", "parentfield", "idx", "role", "creation", "modified", "owner", "modified_by"],
+                added,
+            )
+
+    # desk access follows the roles, as User.set_system_user does on save
+    frappe.db.sql(
+        """
+        UPDATE `tabUser` user
+        SET user.user_type = IF(EXISTS(
+                SELECT 1 FROM `tabHas Role` has_role
+                JOIN `tabRole` role ON role.name = has_role.role
+                WHERE has_role.parenttype = 'User' AND has_role.parent = user.name AND role.desk_access = 1
+            ), 'System User', 'Website User'),
+            user.modified = %s, user.modified_by = %s
+        WHERE user.name IN %s AND user.user_type IN ('System User', 'Website User')
+        """,
+        (now, session_user, tuple(users)),
+    )
+    cache.forget_boot(users)
+    frappe.db.commit()
+    for user in users:
+        frappe.clear_cache(user=user)
+    return {"users": len(users), "added": len(added), "removed": removed}
+
+
 @frappe.whitelist()
 def reset_user_password(user_email, new_password):
     """Reset a user's password. Only admin can call this."""
@@ -1031,43 +1205,55 @@ def reset_user_password(user_email, new_password):
 @frappe.whitelist()
 def get_loan_details(loan_name):
     """Get full details for a specific loan, including book and member info."""
-    loan = frappe.get_doc("Loan", loan_name)
-    book = frappe.get_doc("Book", loan.book)
-    member = frappe.get_doc("Member", loan.member)
+    loan = cache.get_doc_dict("Loan", loan_name)
     return {
-        "loan": loan.as_dict(),
-        "book": book.as_dict(),
-        "member": member.as_dict()
+        "loan": loan,
+        "book": cache.get_doc_dict("Book", loan.book),
+        "member": cache.get_doc_dict("Member", loan.member)
     }
 
 
 @frappe.whitelist()
 def get_reservation_details(reservation_name):
     """Get full details for a specific reservation, including book and member info."""
-    reservation = frappe.get_doc("Reservation", reservation_name)
-    book = frappe.get_doc("Book", reservation.book)
-    member = frappe.get_doc("Member", reservation.member)
+    reservation = cache.get_doc_dict("Reservation", reservation_name)
     return {
-        "reservation": reservation.as_dict(),
-        "book": book.as_dict(),
-        "member": member.as_dict()
+        "reservation": reservation,
+        "book": cache.get_doc_dict("Book", reservation.book),
+        "member": cache.get_doc_dict("Member", reservation.member)
     }
 
 
-def update_overdue_loans():
-    """Mark loans as overdue if past return date and not returned."""
-    today = nowdate()
-    loans = frappe.get_all(
-        "Loan",
-        filters={
-            "returned": 0,
-            "overdue": 0
-        },
-        fields=["name", "return_date"]
+def get_cached_page(doctype, after, page_length, order_by, fields):
+    """One keyset page of a list endpoint, served from the read-through cache."""
+    args = {"after": after, "page_length": page_length, "order_by": order_by, "fields": fields}
+    return cache.get_list_page(
+        doctype, args,
+        lambda: get_page(doctype, after=after, page_length=page_length, order_by=order_by, fields=fields),
     )
-    for loan in loans:
-        if loan["return_date"] and loan["return_date"] < today:
-            loan_doc = frappe.get_doc("Loan", loan["name"])
-            loan_doc.overdue = 1
-            loan_doc.save()
-    frappe.db.commit()
\ No newline at end of file
+
+
+@frappe.whitelist()
+def get_cache_stats(reset=False):
+    """Hit/miss counters of the library read cache. System Manager only."""
+    frappe.only_for("System Manager")
+    return cache.get_stats(reset=cint(reset))
+
+
+@frappe.whitelist()
+def get_api_metrics(reset=False):
+    """Per-endpoint request, SQL, row and byte metrics in the Prometheus text format. System Manager only."""
+    frappe.only_for("System Manager")
+    return metrics_response(reset=cint(reset))
+
+
+@frappe.whitelist()
+def get_api_profile(profile_id):
+    """cProfile stats of a request made with the X-Library-Profile header. System Manager only."""
+    frappe.only_for("System Manager")
+    return get_profile(profile_id)
+
+
+def update_overdue_loans(batch_size=None):
+    """Mark loans as overdue if past return date and not returned. Returns the names that changed."""
+    return [loan.name for loan in mark_overdue_loans(batch_size=batch_size)]
@@ -0,0 +1,62 @@
+# library_app/library_app/benchmarks/circulation.py
+"""
+Compares a desk basket handled item by item with the bulk endpoints.
+
+    bench --site your-site.com execute library_app.benchmarks.circulation.run
+
+Commits inside the endpoints are disabled so everything can be rolled back;
+the per-item loop would pay one more commit per book on a real desk.
+"""
+
+import frappe
+from frappe.utils import add_days, nowdate
+
+from library_app import api
+from library_app.benchmarks.utils import measure, no_commit, print_table, seed_loans
+
+DEFAULT_BASKETS = (10, 20)
+
+
+def seed_basket(size):
+    """Seeds `size` open loans for one member plus `size` free books. Returns (member, loans, free_books)."""
+    loans = seed_loans(size, books=size * 2, members=1)
+    first = frappe.db.get_value("Loan", loans[0], ["book", "member"], as_dict=True)
+    prefix = first.book.rsplit("-B", 1)[0]
+    lent = tuple(f"{prefix}-B{i}" for i in range(size))
+
+    # the seeded loans hold the only copy of their book
+    frappe.db.sql("UPDATE `tabLoan` SET book_copy = CONCAT(book, '-C1') WHERE name IN %s", (tuple(loans),))
+    frappe.db.sql("UPDATE `tabBook Copy` SET status = 'On Loan' WHERE book IN %s", (lent,))
+    frappe.db.sql("UPDATE `tabBook` SET status = 'On Loan', available_copies = 0 WHERE name IN %s", (lent,))
+    return first.member, loans, [f"{prefix}-B{i}" for i in range(size, size * 2)]
+
+
+def checkout_loop(member, books):
+    today, due = nowdate(), add_days(nowdate(), 14)
+    return [api.create_loan(book, member, today, due) for book in books]
+
+
+def return_loop(loans):
+    return [api.return_book(loan) for loan in loans]
+
+
+def run(baskets=DEFAULT_BASKETS):
+    rows = []
+    for size in baskets:
+        implementations = [
+            ("checkout", "per item", lambda member, loans, free: checkout_loop(member, free)),
+            ("checkout", "bulk", lambda member, loans, free: api.create_loans_bulk(member, free, nowdate(), add_days(nowdate(), 14))),
+            ("return", "per item", lambda member, loans, free: return_loop(loans)),
+            ("return", "bulk", lambda member, loans, free: api.return_books_bulk(loans)),
+        ]
+        for action, label, fn in implementations:
+            try:
+                with no_commit():
+                    member, loans, free = seed_basket(size)
+                    _, elapsed, queries, sql_time = measure(fn, member, loans, free)
+                rows.append((size, action, label, queries, f"{elapsed * 1000:.1f}", f"{sql_time * 1000:.1f}"))
+            finally:
+                frappe.db.rollback()
+
+    print_table("circulation baskets", ["items", "action", "impl", "queries", "wall_ms", "sql_ms"], rows)
+    return rows
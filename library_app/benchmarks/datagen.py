@@ -0,0 +1,223 @@
+# library_app/library_app/benchmarks/datagen.py
+"""
+Generates a synthetic library with bulk inserts, for load tests and the
+benchmark suite.
+
+    bench --site your-site.com generate-library-data --scale medium
+    bench --site your-site.com generate-library-data --books 5000 --loans 20000 --seed 7
+    bench --site your-site.com purge-library-data GEN-ab12
+
+Unlike the other benchmark seeds this data is committed (one commit per
+chunk), since the larger scales don't fit in one transaction. Every row is
+named `GEN-<tag>-...` so a dataset can be removed with purge(). The same
+seed always produces the same library.
+
+The data is consistent with the invariants the app maintains: copy
+statuses match open loans, only titles with every copy out have Pending
+reservations, and queue, copy and dashboard counters are recomputed at the end.
+"""
+
+import random
+import time
+from itertools import islice
+
+import frappe
+from frappe.utils import add_days, getdate, now_datetime, nowdate
+
+from library_app import analytics, cache
+from library_app.inventory import recount_copies
+from library_app.loan_report import rebuild as rebuild_loan_report
+from library_app.stats import reconcile_counters
+
+# books, members, loans, reservations
+SCALES = {
+    "tiny": (1_000, 200, 5_000, 500),
+    "small": (10_000, 2_000, 50_000, 5_000),
+    "medium": (100_000, 20_000, 500_000, 50_000),
+    "large": (1_000_000, 200_000, 5_000_000, 500_000),
+}
+DEFAULT_CHUNK_SIZE = 10_000
+OPEN_LOAN_RATIO = 0.1
+PENDING_RESERVATION_RATIO = 0.2
+MULTI_COPY_EVERY = 10
+
+
+def insert_chunks(doctype, fields, rows, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Bulk inserts `rows` (any iterable) in chunks, committing each one. Returns the row count."""
+    rows = iter(rows)
+    inserted = 0
+    while chunk := list(islice(rows, chunk_size)):
+        frappe.db.bulk_insert(doctype, fields, chunk)
+        frappe.db.commit()
+        inserted += len(chunk)
+    return inserted
+
+
+def generate(books, members, loans, reservations, seed=0, tag=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    """
+    Inserts a synthetic library and returns a summary with its name prefix,
+    row counts and seconds taken.
+    """
+    rng = random.Random(seed)
+    tag = tag or frappe.generate_hash(length=6)
+    prefix = f"GEN-{tag}"
+    now = now_datetime()
+    owner = frappe.session.user
+    today = getdate(nowdate())
+    start = time.perf_counter()
+    meta = (now, now, owner, owner)
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+
+    book_names = [f"{prefix}-B{i:07d}" for i in range(books)]
+    copies_of = [2 if i % MULTI_COPY_EVERY == 0 else 1 for i in range(books)]
+    insert_chunks(
+        "Book",
+        ["name", "title", "author", "publish_date", "isbn", "isbn_compact", "status", "total_copies",
+         "available_copies", "creation", "modified", "owner", "modified_by"],
+        (
+            (name, f"Synthetic Title {i}", f"Author {i % 5000}", add_days("1950-01-01", rng.randrange(27000)),
+             f"{prefix}-{i:010d}", f"{prefix}{i:010d}".upper().replace("-", ""), "Available",
+             copies_of[i], copies_of[i], *meta)
+            for i, name in enumerate(book_names)
+        ),
+        chunk_size,
+    )
+
+    member_names = [f"{prefix}-M{i:07d}" for i in range(members)]
+    insert_chunks(
+        "Member",
+        ["name", "member_name", "membership_id", "email", "phone", "creation", "modified", "owner", "modified_by"],
+        (
+            (name, f"Synthetic Member {i}", name, f"{prefix.lower()}-{i}@example.com", f"+1555{i:07d}", *meta)
+            for i, name in enumerate(member_names)
+        ),
+        chunk_size,
+    )
+
+    # open loans take every copy of the first titles in a shuffled order, so
+    # those titles are fully lent and can have a waiting list
+    order = list(range(books))
+    rng.shuffle(order)
+    open_count = min(int(loans * OPEN_LOAN_RATIO), sum(copies_of))
+    lent_copies, fully_lent = [], []
+    for i in order:
+        if len(lent_copies) + copies_of[i] > open_count:
+            break
+        lent_copies.extend(f"{book_names[i]}-C{n + 1}" for n in range(copies_of[i]))
+        fully_lent.append(book_names[i])
+    lent = set(lent_copies)
+
+    insert_chunks(
+        "Book Copy",
+        ["name", "book", "status", "creation", "modified", "owner", "modified_by"],
+        (
+            (copy, name, "On Loan" if copy in lent else "Available", *meta)
+            for i, name in enumerate(book_names)
+            for copy in (f"{name}-C{n + 1}" for n in range(copies_of[i]))
+        ),
+        chunk_size,
+    )
+
+    def loan_rows():
+        for j, copy in enumerate(lent_copies):
+            loan_date = add_days(today, -rng.randrange(30))
+            return_date = add_days(loan_date, 14)
+            yield (f"{prefix}-L{j:08d}", copy.rsplit("-C", 1)[0], copy, rng.choice(member_names),
+                   loan_date, return_date, 0, None, int(return_date < today), *meta)
+        for j in range(len(lent_copies), loans):
+            i = rng.randrange(books)
+            loan_date = add_days(today, -30 - rng.randrange(700))
+            yield (f"{prefix}-L{j:08d}", book_names[i], f"{book_names[i]}-C1", rng.choice(member_names),
+                   loan_date, add_days(loan_date, 14), 1, add_days(loan_date, rng.randrange(1, 29)), 0, *meta)
+
+    insert_chunks(
+        "Loan",
+        ["name", "book", "book_copy", "member", "loan_date", "return_date", "returned", "returned_on", "overdue",
+         "creation", "modified", "owner", "modified_by"],
+        loan_rows() if members and books else (),
+        chunk_size,
+    )
+
+    pending_count = int(reservations * PENDING_RESERVATION_RATIO) if fully_lent else 0
+
+    def reservation_rows():
+        slots = {}
+        for j in range(reservations):
+            if j < pending_count:
+                book = rng.choice(fully_lent)
+                slots[book] = slots.get(book, 0) + 1
+                status, slot, reserve_date = "Pending", slots[book], add_days(today, -rng.randrange(30))
+            else:
+                book = book_names[rng.randrange(books)]
+                status, slot, reserve_date = rng.choice(("Completed", "Cancelled")), 0, add_days(today, -30 - rng.randrange(700))
+            yield (f"{prefix}-R{j:08d}", book, rng.choice(member_names), reserve_date, status, slot, *meta)
+
+    insert_chunks(
+        "Reservation",
+        ["name", "book", "member", "reserve_date", "status", "queue_slot", "creation", "modified", "owner", "modified_by"],
+        reservation_rows() if members and books else (),
+        chunk_size,
+    )
+
+    finish(prefix)
+    return {
+        "prefix": prefix,
+        "seed": seed,
+        "books": books,
+        "members": members,
+        "loans": loans,
+        "reservations": reservations,
+        "seconds": round(time.perf_counter() - start, 2),
+    }
+
+
+def generate_scale(scale, seed=0, tag=None, chunk_size=DEFAULT_CHUNK_SIZE):
+    if scale not in SCALES:
+        frappe.throw(f"Unknown scale '{scale}'. Use one of: {', '.join(SCALES)}")
+    books, members, loans, reservations = SCALES[scale]
+    return generate(books, members, loans, reservations, seed=seed, tag=tag or f"{scale}-{frappe.generate_hash(length=4)}", chunk_size=chunk_size)
+
+
+def finish(prefix):
+    """Recomputes queue, copy and dashboard counters and the report tables after a bulk load or purge and drops cached lists."""
+    frappe.db.sql(
+        """
+        UPDATE `tabBook` book
+        JOIN (
+            SELECT book, COUNT(*) AS waiting
+            FROM `tabReservation`
+            WHERE status = 'Pending' AND name LIKE %(prefix)s
+            GROUP BY book
+        ) queued ON queued.book = book.name
+        SET book.reservation_queue_length = queued.waiting, book.reservation_queue_offset = 0
+        """,
+        {"prefix": f"{prefix}-%"},
+    )
+    recount_copies()
+    frappe.db.commit()
+    rebuild_loan_report()
+    frappe.db.commit()
+    analytics.rebuild()
+    reconcile_counters(fix=True)
+    for doctype in cache.CACHED_DOCTYPES:
+        cache.invalidate(doctype)
+    frappe.db.commit()
+
+
+def purge(prefix, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Deletes every row of a generated dataset, in chunks. Returns rows deleted per doctype."""
+    if not prefix.startswith("GEN-"):
+        frappe.throw("Only generated datasets (GEN-...) can be purged.")
+
+    deleted = {}
+    for doctype in ("Reservation", "Loan", "Book Copy", "Member", "Book"):
+        deleted[doctype] = 0
+        while names := frappe.db.sql_list(
+            f"SELECT name FROM `tab{doctype}` WHERE name LIKE %s LIMIT %s", (f"{prefix}-%", chunk_size)
+        ):
+            frappe.db.sql(f"DELETE FROM `tab{doctype}` WHERE name IN %s", (tuple(names),))
+            frappe.db.commit()
+            deleted[doctype] += len(names)
+
+    finish(prefix)
+    return deleted
@@ -0,0 +1,101 @@
+# library_app/library_app/benchmarks/explain.py
+"""
+Runs EXPLAIN on the SQL issued by the library_app.api endpoints and flags full scans.
+
+    bench --site your-site.com explain-library-queries
+
+Each endpoint is called once as Administrator with its queries captured; every
+captured statement that touches a library table is then EXPLAINed. Rows with
+access type ALL (full table scan) or index (full index scan) are flagged.
+Everything is rolled back afterwards.
+"""
+
+import re
+
+import frappe
+
+from library_app import api
+from library_app.benchmarks.utils import capture_queries
+from library_app.notifications import next_member_batch, pending_loans_for
+from library_app.overdue import mark_overdue_loans
+
+LIBRARY_TABLES = re.compile(r"`tab(Book|Member|Loan|Reservation|Library Counter)`")
+EXPLAINABLE = re.compile(r"^\s*(SELECT|UPDATE|DELETE)\b", re.IGNORECASE)
+FULL_SCAN_TYPES = ("ALL", "index")
+
+
+def get_calls():
+    """(label, callable) for every read path worth checking, using sample rows from the site."""
+    book = frappe.db.get_value("Book", {}, "name")
+    member = frappe.db.get_value("Member", {}, "name")
+    member_user = frappe.db.get_value("Member", {"user": ["is", "set"]}, "user")
+
+    calls = [
+        ("get_books", api.get_books),
+        ("get_books (page)", lambda: api.get_books(page_length=20, order_by="title asc")),
+        ("get_members", api.get_members),
+        ("get_members (page)", lambda: api.get_members(page_length=20)),
+        ("get_loans", api.get_loans),
+        ("get_loans (page)", lambda: api.get_loans(page_length=20, order_by="return_date asc")),
+        ("get_reservations", api.get_reservations),
+        ("get_reservations (page)", lambda: api.get_reservations(page_length=20)),
+        ("get_books_on_loan_report", api.get_books_on_loan_report),
+        ("get_overdue_books_report", api.get_overdue_books_report),
+        ("get_dashboard_stats", api.get_dashboard_stats),
+        ("mark_overdue_loans", lambda: mark_overdue_loans(commit=False)),
+        ("overdue digest batch", lambda: pending_loans_for(next_member_batch("", 500) or [""])),
+    ]
+    if book:
+        calls.append(("get_book", lambda: api.get_book(book)))
+    if member:
+        calls.append(("get_member", lambda: api.get_member(member)))
+        calls.append(("export_member_loan_history", lambda: api.export_member_loan_history(member)))
+    if member_user:
+        calls.append(("get_member_by_user", lambda: api.get_member_by_user(member_user)))
+    return calls
+
+
+def explain(query, values):
+    """EXPLAIN rows for one captured statement."""
+    return frappe.db.sql(f"EXPLAIN {query}", values or (), as_dict=True)
+
+
+def run(verbose=False):
+    """Returns one entry per EXPLAINed statement; prints the flagged ones (or all with `verbose`)."""
+    report = []
+    try:
+        for label, call in get_calls():
+            with capture_queries() as log:
+                try:
+                    call()
+                except Exception as e:
+                    report.append({"endpoint": label, "error": str(e)})
+                    continue
+
+            for query, values, _ in log:
+                query = str(query)
+                if not EXPLAINABLE.match(query) or not LIBRARY_TABLES.search(query):
+                    continue
+                plan = explain(query, values)
+                full_scans = [row for row in plan if row.get("type") in FULL_SCAN_TYPES]
+                report.append({
+                    "endpoint": label,
+                    "query": " ".join(query.split()),
+                    "plan": plan,
+                    "full_scan": bool(full_scans),
+                    "full_scan_tables": [row.get("table") for row in full_scans],
+                })
+    finally:
+        frappe.db.rollback()
+
+    for entry in report:
+        if entry.get("error"):
+            print(f"[ERROR] {entry['endpoint']}: {entry['error']}")
+        elif entry["full_scan"] or verbose:
+            flag = "FULL SCAN" if entry["full_scan"] else "ok"
+            tables = ", ".join(str(t) for t in entry["full_scan_tables"])
+            print(f"[{flag}] {entry['endpoint']}{f' ({tables})' if tables else ''}\n    {entry['query']}")
+
+    flagged = sum(1 for entry in report if entry.get("full_scan"))
+    print(f"\n{len(report)} statements checked, {flagged} full scan(s)")
+    return report
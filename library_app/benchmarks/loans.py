@@ -0,0 +1,53 @@
+# library_app/library_app/benchmarks/loans.py
+"""
+Compares the legacy per-row get_loans implementation with the joined query.
+
+    bench --site your-site.com execute library_app.benchmarks.loans.run
+    bench --site your-site.com execute library_app.benchmarks.loans.run --kwargs "{'sizes': [1000]}"
+
+All seeded rows are rolled back at the end of each size.
+"""
+
+import frappe
+
+from library_app.benchmarks.utils import measure, print_table, seed_loans
+from library_app.queries import get_loan_rows
+
+DEFAULT_SIZES = (1_000, 10_000, 100_000)
+
+
+def legacy_get_loans():
+    """The original implementation: one get_list plus two get_doc calls per row."""
+    loans = frappe.get_list(
+        "Loan",
+        fields=["name", "book", "member", "loan_date", "return_date", "returned", "overdue"],
+        limit_page_length=0,
+    )
+    for loan in loans:
+        loan["book_title"] = frappe.get_doc("Book", loan.book).title
+        loan["member_name"] = frappe.get_doc("Member", loan.member).member_name
+    return loans
+
+
+def run(sizes=DEFAULT_SIZES, legacy_limit=10_000):
+    """Seeds each size, times both implementations and prints the results.
+
+    The legacy path is skipped above `legacy_limit` rows because it takes
+    minutes at that scale.
+    """
+    rows = []
+    for size in sizes:
+        try:
+            seed_loans(size)
+            implementations = [("joined", get_loan_rows)]
+            if size <= legacy_limit:
+                implementations.append(("legacy", legacy_get_loans))
+
+            for label, fn in implementations:
+                result, elapsed, queries, sql_time = measure(fn)
+                rows.append((size, label, len(result), queries, f"{elapsed * 1000:.1f}", f"{sql_time * 1000:.1f}"))
+        finally:
+            frappe.db.rollback()
+
+    print_table("get_loans", ["loans", "impl", "rows", "queries", "wall_ms", "sql_ms"], rows)
+    return rows
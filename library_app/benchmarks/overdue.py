@@ -0,0 +1,50 @@
+# library_app/library_app/benchmarks/overdue.py
+"""
+Compares per-document overdue marking with the chunked set-based UPDATE.
+
+    bench --site your-site.com execute library_app.benchmarks.overdue.run
+
+Every seeded loan is already past its return date. All changes are rolled back.
+"""
+
+import frappe
+from frappe.utils import nowdate
+
+from library_app.benchmarks.utils import measure, print_table, seed_loans
+from library_app.overdue import mark_overdue_loans
+
+DEFAULT_SIZES = (10_000, 100_000)
+
+
+def legacy_mark_overdue():
+    """The original update_overdue_loans: every candidate loaded and saved one by one."""
+    today = nowdate()
+    loans = frappe.get_all("Loan", filters={"returned": 0, "overdue": 0}, fields=["name", "return_date"])
+    changed = []
+    for loan in loans:
+        if loan["return_date"] and str(loan["return_date"]) < today:
+            loan_doc = frappe.get_doc("Loan", loan["name"])
+            loan_doc.overdue = 1
+            loan_doc.save()
+            changed.append(loan["name"])
+    return changed
+
+
+def run(sizes=DEFAULT_SIZES, batch_size=None, legacy_limit=10_000):
+    """Seeds each size and times both implementations (legacy only up to `legacy_limit`)."""
+    rows = []
+    for size in sizes:
+        implementations = [("set-based", lambda: mark_overdue_loans(batch_size=batch_size, commit=False))]
+        if size <= legacy_limit:
+            implementations.append(("legacy", legacy_mark_overdue))
+
+        for label, fn in implementations:
+            try:
+                seed_loans(size, overdue_ratio=1.0)
+                result, elapsed, queries, sql_time = measure(fn)
+                rows.append((size, label, len(result), queries, f"{elapsed * 1000:.1f}", f"{sql_time * 1000:.1f}"))
+            finally:
+                frappe.db.rollback()
+
+    print_table("overdue marking", ["loans", "impl", "changed", "queries", "wall_ms", "sql_ms"], rows)
+    return rows
@@ -0,0 +1,105 @@
+# library_app/library_app/benchmarks/reservations.py
+"""
+Times reservation queue operations on one book with a long waiting list.
+
+    bench --site your-site.com execute library_app.benchmarks.reservations.run
+
+"legacy" rows are the queries the endpoints used before the stored queue
+(sorted Pending list per book); "queue" rows use library_app.reservation_queue.
+All changes are rolled back.
+"""
+
+import frappe
+from frappe.utils import add_days, now_datetime, nowdate
+
+from library_app.benchmarks.utils import measure, print_table
+from library_app.reservation_queue import next_in_line, queue_length, queue_position
+
+DEFAULT_SIZES = (1_000, 10_000)
+
+
+def seed_queue(size):
+    """One book (on loan) with `size` Pending reservations from as many members. Returns (book, reservations)."""
+    now = now_datetime()
+    owner = frappe.session.user
+    run = frappe.generate_hash(length=6)
+    book = f"BENCH-{run}-B"
+
+    frappe.db.bulk_insert(
+        "Book",
+        ["name", "title", "author", "publish_date", "isbn", "status", "total_copies", "available_copies",
+         "reservation_queue_length", "reservation_queue_offset", "creation", "modified", "owner", "modified_by"],
+        [(book, "Benchmark Title", "Author", "2000-01-01", f"BENCH{run}", "Reserved", 1, 0, size, 0, now, now, owner, owner)],
+    )
+    frappe.db.bulk_insert(
+        "Book Copy",
+        ["name", "book", "status", "creation", "modified", "owner", "modified_by"],
+        [(f"{book}-C1", book, "On Loan", now, now, owner, owner)],
+    )
+    members = [f"BENCH-{run}-M{i}" for i in range(size)]
+    frappe.db.bulk_insert(
+        "Member",
+        ["name", "member_name", "membership_id", "email", "phone", "creation", "modified", "owner", "modified_by"],
+        [
+            (name, f"Benchmark Member {i}", f"BENCH-{run}-{i}", f"bench-{run}-{i}@example.com", "0", now, now, owner, owner)
+            for i, name in enumerate(members)
+        ],
+    )
+    reservations = [f"BENCH-{run}-R{i}" for i in range(size)]
+    start = add_days(nowdate(), -size // 100 - 1)
+    frappe.db.bulk_insert(
+        "Reservation",
+        ["name", "book", "member", "reserve_date", "status", "queue_slot", "creation", "modified", "owner", "modified_by"],
+        [
+            (name, book, members[i], add_days(start, i // 100), "Pending", i + 1, now, now, owner, owner)
+            for i, name in enumerate(reservations)
+        ],
+    )
+    return book, reservations
+
+
+def legacy_next_in_line(book):
+    return frappe.get_list(
+        "Reservation", filters={"book": book, "status": "Pending"}, order_by="reserve_date asc", limit=1
+    )
+
+
+def legacy_queue_length(book):
+    return len(frappe.get_list("Reservation", filters={"book": book, "status": "Pending"}, order_by="reserve_date asc"))
+
+
+def legacy_position(book, reservation):
+    pending = frappe.get_list("Reservation", filters={"book": book, "status": "Pending"}, order_by="reserve_date asc, creation asc")
+    return [row.name for row in pending].index(reservation) + 1
+
+
+def cancel(reservation):
+    doc = frappe.get_doc("Reservation", reservation)
+    doc.status = "Cancelled"
+    doc.save()
+
+
+def run(sizes=DEFAULT_SIZES):
+    rows = []
+    for size in sizes:
+        try:
+            book, reservations = seed_queue(size)
+            middle = reservations[size // 2]
+            operations = [
+                ("next in line", "legacy", lambda: legacy_next_in_line(book)),
+                ("next in line", "queue", lambda: next_in_line(book)),
+                ("queue depth", "legacy", lambda: legacy_queue_length(book)),
+                ("queue depth", "queue", lambda: queue_length(book)),
+                ("my position", "legacy", lambda: legacy_position(book, middle)),
+                ("my position", "queue", lambda: queue_position(frappe.get_doc("Reservation", middle))),
+                ("serve head", "queue", lambda: cancel(reservations[0])),
+                ("cancel middle", "queue", lambda: cancel(middle)),
+            ]
+            for operation, label, fn in operations:
+                _, elapsed, queries, sql_time = measure(fn)
+                rows.append((size, operation, label, queries, f"{elapsed * 1000:.2f}", f"{sql_time * 1000:.2f}"))
+        finally:
+            frappe.db.rollback()
+
+    print_table("reservation queue", ["waiting", "operation", "impl", "queries", "wall_ms", "sql_ms"], rows)
+    return rows
@@ -0,0 +1,308 @@
+# library_app/library_app/benchmarks/suite.py
+"""
+Times every endpoint in library_app.api against generated libraries of
+increasing size and compares the results with a stored baseline.
+
+    bench --site your-site.com run-library-benchmarks --scale tiny --scale small
+    bench --site your-site.com run-library-benchmarks --scale small --baseline path/to/baseline.json
+
+For each scale a dataset is generated (see benchmarks.datagen), every
+endpoint is called `repeat` times as Administrator with the read cache
+bypassed, and the median/p95 wall time, query count and SQL time are
+recorded. Endpoints that write run inside no_commit() and are rolled back
+after each call. The dataset is purged afterwards unless `keep_data` is set.
+
+Results are written as JSON. Given a baseline, an endpoint regresses when
+its median is more than `tolerance` slower (and at least MIN_REGRESSION_MS
+slower) or when it issues more queries. run() raises BenchmarkRegression and
+the bench command exits non-zero.
+"""
+
+import json
+import os
+import statistics
+import time
+from functools import partial
+
+import frappe
+from frappe.utils import add_days, now_datetime, nowdate
+
+from library_app import api
+from library_app.benchmarks import datagen
+from library_app.benchmarks.utils import measure, no_cache, no_commit, print_table
+
+DEFAULT_SCALES = ("tiny",)
+DEFAULT_REPEAT = 5
+DEFAULT_TOLERANCE = 0.25
+MIN_REGRESSION_MS = 5.0
+# endpoints returning whole tables are skipped once a table is bigger than this
+DEFAULT_FULL_LIST_LIMIT = 100_000
+
+
+class BenchmarkRegression(Exception):
+    def __init__(self, regressions, output):
+        self.regressions, self.output = regressions, output
+        super().__init__(f"{len(regressions)} endpoint(s) regressed; results in {output}")
+
+
+# --- Sample data for the calls ---
+
+def sample_context(prefix):
+    """Names from the generated dataset the endpoint calls operate on."""
+    like = f"{prefix}-%"
+
+    def pick(query, count=1):
+        names = frappe.db.sql_list(query + " LIMIT %s", (like, count))
+        return names if count > 1 else (names[0] if names else None)
+
+    return frappe._dict(
+        prefix=prefix,
+        book=pick("SELECT name FROM `tabBook` WHERE name LIKE %s AND available_copies > 0 ORDER BY name"),
+        free_books=pick("SELECT name FROM `tabBook` WHERE name LIKE %s AND available_copies > 0 ORDER BY name DESC", 5),
+        lent_book=pick("SELECT name FROM `tabBook` WHERE name LIKE %s AND available_copies = 0 ORDER BY name"),
+        member=pick("SELECT name FROM `tabMember` WHERE name LIKE %s ORDER BY name"),
+        open_loan=pick("SELECT name FROM `tabLoan` WHERE name LIKE %s AND returned = 0 ORDER BY name"),
+        open_loans=pick("SELECT name FROM `tabLoan` WHERE name LIKE %s AND returned = 0 ORDER BY name DESC", 5),
+        reservation=pick("SELECT name FROM `tabReservation` WHERE name LIKE %s AND status = 'Pending' ORDER BY name"),
+        member_user=frappe.db.get_value("Member", {"user": ["is", "set"]}, "user"),
+    )
+
+
+def unique(label):
+    return f"{label}-{frappe.generate_hash(length=8)}"
+
+
+def new_book():
+    return api.create_book(unique("Bench Title"), "Bench Author", "2000-01-01", unique("BENCH"))["book_name"]
+
+
+def new_member():
+    email = f"{unique('bench')}@example.com"
+    return api.create_member("Bench Member", unique("BENCH"), email, "0")["member_name"]
+
+
+def new_user():
+    email = f"{unique('bench')}@example.com"
+    api.register_user("Bench User", email, frappe.generate_hash(length=16))
+    return email
+
+
+def due_date():
+    return add_days(nowdate(), 14)
+
+
+# --- Endpoints ---
+#
+# (endpoint, kind, prepare): prepare(ctx) does any setup and returns the
+# zero-argument call to time, or a string saying why the endpoint is skipped.
+# kind: "read", "write" (rolled back) or "full" (a read returning a whole table).
+
+ENDPOINTS = [
+    ("get_books", "read", lambda c: partial(api.get_books, page_length=20)),
+    ("get_books (all)", "full", lambda c: api.get_books),
+    ("search_books", "read", lambda c: partial(api.search_books, "Synthetic Title 1")),
+    ("get_book", "read", lambda c: partial(api.get_book, c.book)),
+    ("get_book_availability", "read", lambda c: partial(api.get_book_availability, c.book)),
+    ("create_book", "write", lambda c: partial(api.create_book, "Bench Title", "Bench Author", "2000-01-01", unique("BENCH"))),
+    ("add_book_copies", "write", lambda c: partial(api.add_book_copies, c.book, 3)),
+    ("update_book", "write", lambda c: partial(api.update_book, c.book, title="Bench Retitled")),
+    ("delete_book", "write", lambda c: partial(api.delete_book, new_book())),
+    ("import_books", "write", lambda c: "needs an uploaded file; see `bench import-books`"),
+    ("get_members", "read", lambda c: partial(api.get_members, page_length=20)),
+    ("get_members (all)", "full", lambda c: api.get_members),
+    ("get_member", "read", lambda c: partial(api.get_member, c.member)),
+    ("get_member_by_user", "read", lambda c: partial(api.get_member_by_user, c.member_user) if c.member_user else "no member is linked to a user"),
+    ("create_member", "write", lambda c: partial(api.create_member, "Bench Member", unique("BENCH"), f"{unique('bench')}@example.com", "0")),
+    ("update_member", "write", lambda c: partial(api.update_member, c.member, member_name="Bench Renamed")),
+    ("create_member_for_user", "write", lambda c: partial(api.create_member_for_user, new_user())),
+    ("delete_member", "write", lambda c: partial(api.delete_member, new_member())),
+    ("create_loan", "write", lambda c: partial(api.create_loan, c.book, c.member, nowdate(), due_date())),
+    ("return_book", "write", lambda c: partial(api.return_book, c.open_loan)),
+    ("create_loans_bulk", "write", lambda c: partial(api.create_loans_bulk, c.member, c.free_books, nowdate(), due_date())),
+    ("return_books_bulk", "write", lambda c: partial(api.return_books_bulk, c.open_loans)),
+    ("get_loans", "read", lambda c: partial(api.get_loans, page_length=20)),
+    ("get_loans (all)", "full", lambda c: api.get_loans),
+    ("get_loan", "read", lambda c: partial(api.get_loan, c.open_loan)),
+    ("get_dashboard_stats", "read", lambda c: api.get_dashboard_stats),
+    ("get_books_on_loan_report", "full", lambda c: api.get_books_on_loan_report),
+    ("get_overdue_books_report", "full", lambda c: api.get_overdue_books_report),
+    ("get_circulation_trend", "read", lambda c: api.get_circulation_trend),
+    ("get_circulation_trend (book)", "read", lambda c: partial(api.get_circulation_trend, "Day", book=c.book)),
+    ("get_top_titles", "read", lambda c: api.get_top_titles),
+    ("get_dormant_members", "read", lambda c: api.get_dormant_members),
+    ("import_members", "write", lambda c: "needs an uploaded file; see `bench import-members`"),
+    ("register_user", "write", lambda c: partial(api.register_user, "Bench User", f"{unique('bench')}@example.com", frappe.generate_hash(length=16))),
+    ("create_librarian_user", "write", lambda c: partial(api.create_librarian_user, "Bench Librarian", f"{unique('bench')}@example.com", frappe.generate_hash(length=16))),
+    ("create_manager_user", "write", lambda c: partial(api.create_manager_user, "Bench Manager", f"{unique('bench')}@example.com", frappe.generate_hash(length=16))),
+    ("create_reservation", "write", lambda c: partial(api.create_reservation, c.lent_book, new_member()) if c.lent_book else "every title has a copy on the shelf"),
+    ("get_reservations", "read", lambda c: partial(api.get_reservations, page_length=20)),
+    ("get_reservations (all)", "full", lambda c: api.get_reservations),
+    ("cancel_reservation", "write", lambda c: partial(api.cancel_reservation, c.reservation) if c.reservation else "no pending reservations"),
+    ("check_and_notify_overdue_books", "write", lambda c: api.check_and_notify_overdue_books),
+    ("export_member_loan_history", "read", lambda c: partial(api.export_member_loan_history, c.member)),
+    ("download_export", "read", lambda c: "streams through a second connection; timed as export_member_loan_history"),
+    ("start_export", "write", lambda c: partial(api.start_export, "overdue")),
+    ("create_book_with_permission", "write", lambda c: partial(api.create_book_with_permission, "Bench Title", "Bench Author", "2000-01-01", unique("BENCH"))),
+    ("update_book_with_permission", "write", lambda c: partial(api.update_book_with_permission, c.book, title="Bench Retitled")),
+    ("delete_book_with_permission", "write", lambda c: partial(api.delete_book_with_permission, new_book())),
+    ("create_loan_with_permission", "write", lambda c: partial(api.create_loan_with_permission, c.book, c.member, nowdate(), due_date())),
+    ("return_book_with_permission", "write", lambda c: partial(api.return_book_with_permission, c.open_loan)),
+    ("get_my_loans", "read", lambda c: api.get_my_loans),
+    ("get_my_reservations", "read", lambda c: api.get_my_reservations),
+    ("get_current_user_roles", "read", lambda c: api.get_current_user_roles),
+    ("list_all_users", "read", lambda c: partial(api.list_all_users, page_length=50)),
+    ("list_all_users (all)", "full", lambda c: api.list_all_users),
+    ("set_user_roles", "write", lambda c: partial(api.set_user_roles, new_user(), ["Library Member"])),
+    ("set_user_roles_bulk", "write", lambda c: partial(api.set_user_roles_bulk, [new_user() for _ in range(20)], add_roles=["Librarian"])),
+    ("reset_user_password", "write", lambda c: partial(api.reset_user_password, new_user(), frappe.generate_hash(length=16))),
+    ("get_loan_details", "read", lambda c: partial(api.get_loan_details, c.open_loan)),
+    ("get_reservation_details", "read", lambda c: partial(api.get_reservation_details, c.reservation) if c.reservation else "no pending reservations"),
+    ("get_cache_stats", "read", lambda c: api.get_cache_stats),
+    ("get_api_metrics", "read", lambda c: api.get_api_metrics),
+    ("get_api_profile", "read", lambda c: "needs a request profiled with X-Library-Profile"),
+]
+
+
+def uncovered_endpoints():
+    """Whitelisted functions of library_app.api with no entry in ENDPOINTS."""
+    covered = {name.split(" ")[0] for name, _, _ in ENDPOINTS}
+    return sorted(
+        name for name, fn in vars(api).items()
+        if callable(fn) and getattr(fn, "__module__", None) == api.__name__
+        and fn in frappe.whitelisted and name not in covered
+    )
+
+
+# --- Timing ---
+
+def time_endpoint(kind, prepare, ctx, repeat):
+    walls, sql_times, queries = [], [], 0
+    for _ in range(repeat):
+        try:
+            with no_commit(), no_cache():
+                call = prepare(ctx)
+                if isinstance(call, str):
+                    return {"skipped": call}
+                _, elapsed, queries, sql_time = measure(call)
+        finally:
+            if kind == "write":
+                frappe.db.rollback()
+        walls.append(elapsed * 1000)
+        sql_times.append(sql_time * 1000)
+
+    walls.sort()
+    return {
+        "median_ms": round(statistics.median(walls), 3),
+        "p95_ms": round(walls[min(len(walls) - 1, int(len(walls) * 0.95))], 3),
+        "queries": queries,
+        "sql_ms": round(statistics.median(sql_times), 3),
+    }
+
+
+def run_scale(scale, repeat=DEFAULT_REPEAT, seed=0, keep_data=False, full_list_limit=DEFAULT_FULL_LIST_LIMIT):
+    """Generates the dataset for `scale`, times every endpoint and returns the results."""
+    dataset = datagen.generate_scale(scale, seed=seed)
+    try:
+        ctx = sample_context(dataset["prefix"])
+        too_big = max(frappe.db.count(doctype) for doctype in ("Book", "Member", "Loan", "Reservation")) > full_list_limit
+        endpoints = {}
+        for name, kind, prepare in ENDPOINTS:
+            if kind == "full" and too_big:
+                endpoints[name] = {"skipped": f"returns whole tables; over {full_list_limit} rows"}
+                continue
+            try:
+                endpoints[name] = time_endpoint(kind, prepare, ctx, repeat)
+            except Exception as e:
+                frappe.db.rollback()
+                endpoints[name] = {"error": repr(e)}
+        return {"dataset": dataset, "endpoints": endpoints}
+    finally:
+        if not keep_data:
+            datagen.purge(dataset["prefix"])
+
+
+# --- Baselines ---
+
+def compare(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    """[(scale, endpoint, reason)] for every endpoint slower or chattier than in `baseline`."""
+    regressions = []
+    for scale, current in results["scales"].items():
+        previous = baseline.get("scales", {}).get(scale)
+        if not previous:
+            continue
+        for endpoint, now in current["endpoints"].items():
+            before = previous["endpoints"].get(endpoint) or {}
+            if "median_ms" not in now or "median_ms" not in before:
+                continue
+            slower = now["median_ms"] - before["median_ms"]
+            if slower > MIN_REGRESSION_MS and now["median_ms"] > before["median_ms"] * (1 + tolerance):
+                regressions.append((scale, endpoint, f"median {before['median_ms']} -> {now['median_ms']} ms"))
+            if now["queries"] > before["queries"]:
+                regressions.append((scale, endpoint, f"queries {before['queries']} -> {now['queries']}"))
+    return regressions
+
+
+def default_output(scales):
+    directory = frappe.get_site_path("private", "library_benchmarks")
+    os.makedirs(directory, exist_ok=True)
+    stamp = now_datetime().strftime("%Y%m%d-%H%M%S")
+    return os.path.join(directory, f"{'-'.join(scales)}-{stamp}.json")
+
+
+def run(
+    scales=DEFAULT_SCALES,
+    repeat=DEFAULT_REPEAT,
+    baseline=None,
+    output=None,
+    tolerance=DEFAULT_TOLERANCE,
+    seed=0,
+    keep_data=False,
+    full_list_limit=DEFAULT_FULL_LIST_LIMIT,
+):
+    """
+    Runs the suite for each scale, writes the JSON results to `output` and,
+    with a `baseline` file, raises BenchmarkRegression on regressions.
+    Returns (results, output path).
+    """
+    frappe.set_user("Administrator")
+    scales = list(scales)
+    results = {
+        "site": frappe.local.site,
+        "created": str(now_datetime()),
+        "repeat": repeat,
+        "seed": seed,
+        "uncovered": uncovered_endpoints(),
+        "scales": {},
+    }
+    for scale in scales:
+        start = time.perf_counter()
+        results["scales"][scale] = run_scale(scale, repeat, seed, keep_data, full_list_limit)
+        results["scales"][scale]["seconds"] = round(time.perf_counter() - start, 2)
+        print_scale(scale, results["scales"][scale])
+
+    output = output or default_output(scales)
+    with open(output, "w") as f:
+        json.dump(results, f, indent=1, sort_keys=True)
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare(results, json.load(f), tolerance)
+        if regressions:
+            raise BenchmarkRegression(regressions, output)
+    return results, output
+
+
+def print_scale(scale, result):
+    rows = []
+    for endpoint, values in result["endpoints"].items():
+        if "median_ms" in values:
+            rows.append((endpoint, values["median_ms"], values["p95_ms"], values["queries"], values["sql_ms"], ""))
+        else:
+            rows.append((endpoint, "", "", "", "", values.get("skipped") or values.get("error")))
+    dataset = result["dataset"]
+    print_table(
+        f"{scale}: {dataset['books']} books, {dataset['members']} members, {dataset['loans']} loans, "
+        f"{dataset['reservations']} reservations",
+        ["endpoint", "median_ms", "p95_ms", "queries", "sql_ms", "note"],
+        rows,
+    )
@@ -0,0 +1,135 @@
+# library_app/library_app/benchmarks/utils.py
+import time
+from contextlib import contextmanager
+
+import frappe
+from frappe.utils import add_days, now_datetime, nowdate
+
+# --- Shared helpers for the benchmark scripts ---
+
+
+@contextmanager
+def capture_queries():
+    """Records every frappe.db.sql call made inside the block as (query, values, seconds)."""
+    log = []
+    original_sql = frappe.db.sql
+
+    def sql(query, *args, **kwargs):
+        values = args[0] if args else kwargs.get("values")
+        start = time.perf_counter()
+        try:
+            return original_sql(query, *args, **kwargs)
+        finally:
+            log.append((query, values, time.perf_counter() - start))
+
+    frappe.db.sql = sql
+    try:
+        yield log
+    finally:
+        frappe.db.sql = original_sql
+
+
+@contextmanager
+def no_commit():
+    """Turns frappe.db.commit into a no-op so endpoints that commit can be rolled back."""
+    original_commit = frappe.db.commit
+    frappe.db.commit = lambda: None
+    try:
+        yield
+    finally:
+        frappe.db.commit = original_commit
+
+
+@contextmanager
+def no_cache():
+    """Makes every library_app.cache lookup miss, so calls are timed against the database."""
+    from library_app import cache
+
+    original_load = cache.load
+    cache.load = lambda key: cache.MISSING
+    try:
+        yield
+    finally:
+        cache.load = original_load
+
+
+def measure(fn, *args, **kwargs):
+    """Runs `fn` once and returns (result, wall seconds, query count, sql seconds)."""
+    with capture_queries() as log:
+        start = time.perf_counter()
+        result = fn(*args, **kwargs)
+        elapsed = time.perf_counter() - start
+    return result, elapsed, len(log), sum(seconds for _, _, seconds in log)
+
+
+def seed_loans(count, books=None, members=None, overdue_ratio=0.0):
+    """Bulk inserts `count` loans (plus the books and members they point at).
+
+    Nothing is committed; callers roll back when they are done so the site is
+    left untouched.
+    """
+    books = books or max(1, count // 2)
+    members = members or max(1, count // 10)
+    now = now_datetime()
+    owner = frappe.session.user
+    run = frappe.generate_hash(length=6)
+
+    book_names = [f"BENCH-{run}-B{i}" for i in range(books)]
+    frappe.db.bulk_insert(
+        "Book",
+        ["name", "title", "author", "publish_date", "isbn", "status", "total_copies", "available_copies",
+         "creation", "modified", "owner", "modified_by"],
+        [
+            (name, f"Benchmark Title {i}", f"Author {i % 500}", "2000-01-01", f"BENCH{run}{i:09d}", "Available", 1, 1, now, now, owner, owner)
+            for i, name in enumerate(book_names)
+        ],
+    )
+    frappe.db.bulk_insert(
+        "Book Copy",
+        ["name", "book", "status", "creation", "modified", "owner", "modified_by"],
+        [(f"{name}-C1", name, "Available", now, now, owner, owner) for name in book_names],
+    )
+
+    member_names = [f"BENCH-{run}-M{i}" for i in range(members)]
+    frappe.db.bulk_insert(
+        "Member",
+        ["name", "member_name", "membership_id", "email", "phone", "creation", "modified", "owner", "modified_by"],
+        [
+            (name, f"Benchmark Member {i}", f"BENCH-{run}-{i}", f"bench-{run}-{i}@example.com", "0", now, now, owner, owner)
+            for i, name in enumerate(member_names)
+        ],
+    )
+
+    today = nowdate()
+    overdue_every = int(1 / overdue_ratio) if overdue_ratio else 0
+    loan_names = [f"BENCH-{run}-L{i}" for i in range(count)]
+    frappe.db.bulk_insert(
+        "Loan",
+        ["name", "book", "member", "loan_date", "return_date", "returned", "overdue", "creation", "modified", "owner", "modified_by"],
+        [
+            (
+                name,
+                book_names[i % books],
+                member_names[i % members],
+                add_days(today, -30),
+                add_days(today, -1) if overdue_every and i % overdue_every == 0 else add_days(today, 14),
+                0,
+                0,
+                now,
+                now,
+                owner,
+                owner,
+            )
+            for i, name in enumerate(loan_names)
+        ],
+    )
+    return loan_names
+
+
+def print_table(title, headers, rows):
+    """Prints benchmark rows as a plain aligned table."""
+    widths = [max(len(str(value)) for value in column) for column in zip(headers, *rows, strict=True)]
+    print(f"\n{title}")
+    print("  ".join(str(h).ljust(w) for h, w in zip(headers, widths, strict=True)))
+    for row in rows:
+        print("  ".join(str(value).ljust(w) for value, w in zip(row, widths, strict=True)))
@@ -0,0 +1,267 @@
+# library_app/library_app/book_import.py
+import csv
+import json
+import os
+import re
+import time
+
+import frappe
+from frappe.utils import cint, getdate, now_datetime
+
+from library_app.cache import invalidate
+from library_app.stats import bump
+
+# --- Bulk book import ---
+#
+# Streams a CSV or JSON feed, validates and normalizes each row, and inserts
+# books in large batches: one ISBN lookup per chunk for dedupe, one block of
+# naming-series numbers per chunk, one multi-row INSERT per chunk and one
+# commit per chunk. Bad rows are reported and skipped; they never abort the
+# chunk they are in.
+
+DEFAULT_CHUNK_SIZE = 5000
+MAX_REPORTED_ERRORS = 1000
+NAMING_SERIES = "BOOK-"
+# Imports smaller than this update the search index directly; larger ones
+# schedule a full rebuild, which is much faster than adding books one by one.
+DIRECT_INDEX_LIMIT = 1000
+
+BOOK_FIELDS = [
+    "name", "naming_series", "title", "author", "publish_date", "isbn", "isbn_compact", "status",
+    "creation", "modified", "owner", "modified_by", "total_copies", "available_copies",
+]
+COPY_FIELDS = ["name", "book", "status", "creation", "modified", "owner", "modified_by"]
+
+
+class InvalidRow(Exception):
+    pass
+
+
+# --- ISBN ---
+
+def normalize_isbn(value):
+    """
+    Returns the compact ISBN-10/13 (no spaces or hyphens, upper-case X).
+    Raises InvalidRow when the length or check digit is wrong.
+    """
+    isbn = re.sub(r"[\s-]", "", str(value or "")).upper()
+    if len(isbn) == 10 and re.fullmatch(r"\d{9}[\dX]", isbn):
+        total = sum((10 - i) * (10 if ch == "X" else int(ch)) for i, ch in enumerate(isbn))
+        if total % 11 == 0:
+            return isbn
+    elif len(isbn) == 13 and isbn.isdigit():
+        total = sum(int(ch) * (1 if i % 2 == 0 else 3) for i, ch in enumerate(isbn))
+        if total % 10 == 0:
+            return isbn
+    else:
+        raise InvalidRow(f"'{value}' is not a 10 or 13 digit ISBN")
+    raise InvalidRow(f"ISBN '{value}' has an invalid check digit")
+
+
+# --- Reading ---
+
+def iter_json_array(f, read_size=1 << 16):
+    """Yields the objects of a top-level JSON array without loading the whole file."""
+    decoder = json.JSONDecoder()
+    buffer = ""
+    started = False
+    while True:
+        chunk = f.read(read_size)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip()
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != "[":
+                    raise ValueError("JSON import must be an array of objects")
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer.startswith(","):
+                buffer = buffer[1:]
+                continue
+            if buffer.startswith("]") or not buffer:
+                break
+            try:
+                obj, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                break  # need more data
+            yield obj
+            buffer = buffer[end:]
+        if not chunk:
+            return
+
+
+def iter_records(path, fmt=None):
+    """Yields dict rows from a .csv, .json (array) or .jsonl file."""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        if fmt == "csv":
+            yield from csv.DictReader(f)
+        elif fmt == "jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        elif fmt == "json":
+            yield from iter_json_array(f)
+        else:
+            frappe.throw(f"Unsupported import format '{fmt}'. Use csv, json or jsonl.")
+
+
+def clean_row(record):
+    """Validates one input record and returns (title, author, publish_date, isbn)."""
+    record = {str(key).strip().lower().replace(" ", "_"): value for key, value in record.items() if key}
+    title = (record.get("title") or "").strip()
+    author = (record.get("author") or "").strip()
+    if not title:
+        raise InvalidRow("title is required")
+    if not author:
+        raise InvalidRow("author is required")
+    if not record.get("publish_date"):
+        raise InvalidRow("publish_date is required")
+    try:
+        publish_date = getdate(record["publish_date"])
+    except Exception:
+        raise InvalidRow(f"invalid publish_date '{record['publish_date']}'")
+    return title, author, publish_date, normalize_isbn(record.get("isbn"))
+
+
+# --- Writing ---
+
+def reserve_names(count):
+    """Takes `count` consecutive numbers from the Book naming series in one statement."""
+    current = frappe.db.sql("SELECT `current` FROM `tabSeries` WHERE `name` = %s FOR UPDATE", (NAMING_SERIES,))
+    if current:
+        start = cint(current[0][0])
+        frappe.db.sql("UPDATE `tabSeries` SET `current` = %s WHERE `name` = %s", (start + count, NAMING_SERIES))
+    else:
+        start = 0
+        frappe.db.sql("INSERT INTO `tabSeries` (`name`, `current`) VALUES (%s, %s)", (NAMING_SERIES, count))
+    return [f"{NAMING_SERIES}{number:05d}" for number in range(start + 1, start + count + 1)]
+
+
+def existing_isbns(isbns):
+    """The compact `isbns` already in the catalog, however they were typed there."""
+    if not isbns:
+        return set()
+    return set(frappe.db.sql_list(
+        "SELECT isbn_compact FROM `tabBook` WHERE isbn_compact IN %s", (tuple(isbns),)
+    ))
+
+
+def insert_chunk(rows):
+    """Dedupes a chunk of (row_number, cleaned) against the database and inserts the rest. Returns (inserted, duplicates)."""
+    in_db = existing_isbns([cleaned[3] for _, cleaned in rows])
+    fresh = [(row_number, cleaned) for row_number, cleaned in rows if cleaned[3] not in in_db]
+    duplicates = [row_number for row_number, cleaned in rows if cleaned[3] in in_db]
+    if not fresh:
+        return [], duplicates
+
+    now = now_datetime()
+    user = frappe.session.user
+    names = reserve_names(len(fresh))
+    values = [
+        (name, NAMING_SERIES, title, author, publish_date, isbn, isbn, "Available", now, now, user, user, 1, 1)
+        for name, (_, (title, author, publish_date, isbn)) in zip(names, fresh, strict=True)
+    ]
+    frappe.db.bulk_insert("Book", BOOK_FIELDS, values, chunk_size=len(values))
+    # every imported title starts with one copy on the shelf
+    frappe.db.bulk_insert(
+        "Book Copy",
+        COPY_FIELDS,
+        [(frappe.generate_hash(length=10), v[0], "Available", now, now, user, user) for v in values],
+        chunk_size=len(values),
+    )
+    bump({"books": len(values), "book_status:Available": len(values)})
+    invalidate("Book")
+    return values, duplicates
+
+
+def import_books(path, fmt=None, chunk_size=None):
+    """
+    Imports books from a CSV/JSON/JSONL file at `path`.
+    Returns a report with counts, throughput and per-row errors (first MAX_REPORTED_ERRORS).
+    """
+    chunk_size = cint(chunk_size) or DEFAULT_CHUNK_SIZE
+    report = {"rows": 0, "inserted": 0, "duplicates": 0, "invalid": 0, "errors": []}
+    started = time.perf_counter()
+    indexed_directly = []
+
+    def note(row_number, message):
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+
+    def error(row_number, message):
+        report["invalid"] += 1
+        note(row_number, message)
+
+    def flush(rows):
+        try:
+            values, duplicates = insert_chunk(rows)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            if len(rows) > 1:
+                # e.g. an ISBN inserted concurrently: retry the chunk row by
+                # row so only the offending rows are rejected
+                for row in rows:
+                    flush([row])
+            else:
+                error(rows[0][0], str(e))
+            return
+        report["inserted"] += len(values)
+        report["duplicates"] += len(duplicates)
+        for row_number in duplicates:
+            note(row_number, "ISBN already in the catalog")
+        if len(indexed_directly) < DIRECT_INDEX_LIMIT:
+            indexed_directly.extend(values)
+
+    pending = []
+    seen = set()
+    for row_number, record in enumerate(iter_records(path, fmt), start=1):
+        report["rows"] += 1
+        try:
+            cleaned = clean_row(record)
+        except InvalidRow as e:
+            error(row_number, str(e))
+            continue
+        if cleaned[3] in seen:
+            report["duplicates"] += 1
+            note(row_number, "duplicate ISBN in file")
+            continue
+        seen.add(cleaned[3])
+        pending.append((row_number, cleaned))
+        if len(pending) >= chunk_size:
+            flush(pending)
+            pending = []
+    if pending:
+        flush(pending)
+
+    update_search_index(indexed_directly, report["inserted"])
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 2)
+    report["rows_per_second"] = round(report["rows"] / elapsed) if elapsed else report["rows"]
+    return report
+
+
+def update_search_index(values, inserted):
+    if not inserted:
+        return
+    if inserted <= DIRECT_INDEX_LIMIT:
+        from library_app.search import BookSearch
+
+        BookSearch().add_documents(
+            frappe._dict(name=v[0], title=v[2], author=v[3], isbn=v[5], status=v[7]) for v in values
+        )
+    else:
+        frappe.enqueue("library_app.search.build_book_index", queue="long", timeout=4 * 60 * 60)
+
+
+def import_books_job(file_url, fmt=None, user=None):
+    """Background job for the import_books endpoint; publishes the report to the user."""
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    report = import_books(file_doc.get_full_path(), fmt or os.path.splitext(file_doc.file_name)[1].lstrip("."))
+    frappe.publish_realtime("library_book_import_done", report, user=user)
+    return report
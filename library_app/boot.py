@@ -0,0 +1,89 @@
+# library_app/library_app/boot.py
+import gzip
+import hashlib
+import json
+
+import frappe
+from frappe.utils import get_system_timezone
+from werkzeug.wrappers import Response
+
+import library_app
+from library_app.cache import boot_key, count, get_member_for_user, ttl
+from library_app.install import ROLES
+
+# --- SPA boot payload ---
+#
+# The /library shell (www/library.py) holds no user data, so Frappe can cache
+# it like any static page. The page loads this payload with
+#
+#     <script src="/api/method/library_app.boot.get_boot_script"></script>
+#
+# which sets window.csrf_token and frappe.boot before the React bundle runs.
+# The payload holds only what the app reads (site name, versions, language,
+# time zone and the user's library roles and member), not the full desk boot
+# from frappe.sessions.get(). It is cached per user (see
+# library_app.cache.boot_key); the session's CSRF token is added per request.
+# Responses carry an ETag, so a reload costs a 304, and are gzipped for
+# clients that accept it once they pass GZIP_MIN_BYTES.
+
+GZIP_MIN_BYTES = 1024
+# roles the React app checks, besides the library's own
+EXTRA_ROLES = ("System Manager",)
+
+
+def build_boot(user):
+    roles = set(frappe.get_roles(user))
+    return {
+        "sitename": frappe.local.site,
+        "versions": {"frappe": frappe.__version__, "library_app": library_app.__version__},
+        "lang": frappe.local.lang,
+        "time_zone": get_system_timezone(),
+        "user": {
+            "name": user,
+            "full_name": frappe.utils.get_fullname(user),
+            "roles": sorted(roles & {*ROLES, *EXTRA_ROLES}),
+            "member": get_member_for_user(user) if user != "Guest" else None,
+        },
+    }
+
+
+def get_boot_json(user):
+    """The user's boot payload as compact JSON, from the cache when possible."""
+    key = boot_key(user)
+    cached = frappe.cache.get(key)
+    if cached is not None:
+        count("boot", "hit")
+        return cached.decode()
+
+    count("boot", "miss")
+    payload = frappe.as_json(build_boot(user), indent=None, separators=(",", ":"))
+    frappe.cache.set(key, payload.encode(), ex=ttl())
+    return payload
+
+
+def render_boot_script(user, csrf_token):
+    # "</" can't end a script element if the payload is ever inlined
+    boot = get_boot_json(user).replace("</", "<\\/")
+    return f"window.csrf_token={json.dumps(csrf_token or '')};window.frappe=window.frappe||{{}};frappe.boot={boot};"
+
+
+@frappe.whitelist(allow_guest=True, methods=["GET"])
+def get_boot_script():
+    """The boot payload as a script, with ETag revalidation and gzip."""
+    user = frappe.session.user
+    csrf_token = frappe.sessions.get_csrf_token() if user != "Guest" else None
+    body = render_boot_script(user, csrf_token).encode()
+    etag = f'"{hashlib.md5(body).hexdigest()}"'
+    headers = {
+        "ETag": etag,
+        # per session, and revalidated on every load
+        "Cache-Control": "private, no-cache",
+        "Vary": "Cookie, Accept-Encoding",
+    }
+    if etag in frappe.request.headers.get("If-None-Match", ""):
+        return Response(status=304, headers=headers)
+
+    if len(body) >= GZIP_MIN_BYTES and "gzip" in frappe.request.headers.get("Accept-Encoding", ""):
+        body = gzip.compress(body, compresslevel=6)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, content_type="application/javascript; charset=utf-8", headers=headers)
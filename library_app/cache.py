@@ -0,0 +1,256 @@
+# library_app/library_app/cache.py
+import hashlib
+import pickle
+
+import frappe
+from frappe.utils import cint
+
+from library_app.queries import match_conditions
+
+# --- Read-through Redis cache for library documents and list pages ---
+#
+# Entries live in Frappe's Redis cache under versioned keys:
+#
+#     doc:  library_app:doc:<doctype>:<name>:v<doc version>
+#     list: library_app:list:<doctype>:<hash of args>:v<versions of the doctypes it reads>
+#
+# A write never deletes entries; it increments the version counters, so the
+# next read misses and reloads. Because a reader looks the version up before
+# it touches the database, a reader racing with a writer can at worst store
+# an old value under a version nobody asks for any more. Versions are bumped
+# when the document changes and again after the transaction commits, so a
+# reader can't cache pre-commit data under the new version either.
+#
+# Set-based SQL writes bypass doc_events and must call invalidate() themselves.
+
+PREFIX = "library_app"
+DEFAULT_TTL = 300
+DEFAULT_MAX_ENTRY_BYTES = 512 * 1024
+STATS_KEY = f"{PREFIX}:cache_stats"
+
+CACHED_DOCTYPES = ("Book", "Member", "Loan", "Reservation")
+# Lists that join other doctypes must be invalidated when those change too
+LIST_DEPENDENCIES = {
+    "Book": ("Book",),
+    "Member": ("Member",),
+    "Loan": ("Loan", "Book", "Member"),
+    "Reservation": ("Reservation", "Book", "Member"),
+}
+
+MISSING = object()
+
+
+def ttl():
+    return cint(frappe.conf.get("library_cache_ttl")) or DEFAULT_TTL
+
+
+def max_entry_bytes():
+    return cint(frappe.conf.get("library_cache_max_entry_bytes")) or DEFAULT_MAX_ENTRY_BYTES
+
+
+def redis_key(key):
+    return frappe.cache.make_key(f"{PREFIX}:{key}")
+
+
+def doc_version_key(doctype, name):
+    return redis_key(f"ver:doc:{doctype}:{name}")
+
+
+def list_versions_key():
+    """One hash: a counter per doctype and the epoch (see list_tag)."""
+    return redis_key("ver:lists")
+
+
+def count(kind, outcome):
+    frappe.cache.hincrby(frappe.cache.make_key(STATS_KEY), f"{kind}:{outcome}", 1)
+
+
+def load(key):
+    value = frappe.cache.get(key)
+    return MISSING if value is None else pickle.loads(value)
+
+
+def store(key, value):
+    """Stores `value` with the configured TTL unless it is over the size limit."""
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) > max_entry_bytes():
+        return False
+    frappe.cache.set(key, data, ex=ttl())
+    return True
+
+
+# --- Reads ---
+
+def get_doc_dict(doctype, name):
+    """`frappe.get_doc(doctype, name).as_dict()`, served from Redis when possible."""
+    version = cint(frappe.cache.get(doc_version_key(doctype, name)))
+    key = redis_key(f"doc:{doctype}:{name}:v{version}")
+
+    value = load(key)
+    if value is not MISSING:
+        count("doc", "hit")
+        return value
+
+    count("doc", "miss")
+    value = frappe.get_doc(doctype, name).as_dict()
+    store(key, value)
+    return value
+
+
+def get_list_page(doctype, args, generator):
+    """
+    Result of `generator()` for a list endpoint call, cached per argument set
+    and per set of row-level conditions (see queries.match_conditions): users
+    whose User Permissions differ don't share entries. Read permission on
+    `doctype` is checked first.
+    """
+    frappe.has_permission(doctype, "read", throw=True)
+    version = list_version(doctype)
+    scope = match_conditions(doctype)
+    digest = hashlib.sha1(frappe.as_json([args, scope], indent=None).encode()).hexdigest()
+    key = redis_key(f"list:{doctype}:{digest}:v{version}")
+
+    value = load(key)
+    if value is not MISSING:
+        count("list", "hit")
+        return value
+
+    count("list", "miss")
+    value = generator()
+    store(key, value)
+    return value
+
+
+def list_version(doctype):
+    """Version of `doctype`'s lists: the counters of every doctype they read, e.g. "12-3-40"."""
+    versions = frappe.cache.hmget(list_versions_key(), LIST_DEPENDENCIES[doctype])
+    return "-".join(str(cint(v)) for v in versions)
+
+
+def list_tag(doctype):
+    """
+    list_version() qualified by the cache epoch, a random value kept in the
+    same hash as the counters. The counters restart from zero when Redis is
+    flushed or evicts the hash; the epoch goes with them and is replaced by
+    a new one, so a tag is never reused for different data.
+    """
+    key = list_versions_key()
+    fields = ["epoch", *LIST_DEPENDENCIES[doctype]]
+    epoch, *versions = frappe.cache.hmget(key, fields)
+    if epoch is None:
+        frappe.cache.hsetnx(key, "epoch", frappe.generate_hash(length=8))
+        epoch, *versions = frappe.cache.hmget(key, fields)
+    return f"{epoch.decode()}:" + "-".join(str(cint(v)) for v in versions)
+
+
+# --- Invalidation ---
+
+def bump_versions(doctype, names):
+    pipe = frappe.cache.pipeline()
+    for name in names:
+        pipe.incr(doc_version_key(doctype, name))
+    pipe.hincrby(list_versions_key(), doctype, 1)
+    pipe.execute()
+
+
+def invalidate(doctype, names=()):
+    """Invalidates cached documents `names` and every cached list that reads `doctype`."""
+    names = list(names)
+    bump_versions(doctype, names)
+    # again once the data is committed, so nothing read before the commit survives
+    frappe.db.after_commit.add(lambda: bump_versions(doctype, names))
+
+
+def on_doc_change(doc, method=None, *args):
+    """doc_events handler for on_change / on_trash / after_rename (which also passes the old name)."""
+    names = [doc.name]
+    if method == "after_rename" and args:
+        names.append(args[0])
+    invalidate(doc.doctype, names)
+
+
+# --- User -> Member ---
+#
+# The member self-service endpoints resolve the session user's Member on
+# every call. The mapping is cached per user (so for all of their sessions)
+# and dropped whenever a Member's `user` changes or the Member goes away.
+
+def user_member_key(user):
+    return redis_key(f"user_member:{user}")
+
+
+def get_member_for_user(user):
+    """Name of the Member linked to `user`, or None."""
+    key = user_member_key(user)
+    value = frappe.cache.get(key)
+    if value is not None:
+        count("user_member", "hit")
+        return value.decode() or None
+
+    count("user_member", "miss")
+    member = frappe.db.get_value("Member", {"user": user}, "name")
+    frappe.cache.set(key, (member or "").encode(), ex=ttl())
+    return member
+
+
+def forget_member_users(users):
+    # the boot payload carries the user's member too
+    keys = [key for user in users if user for key in (user_member_key(user), boot_key(user))]
+    if keys:
+        frappe.cache.delete(*keys)
+        # again after commit, in case a reader cached the old link meanwhile
+        frappe.db.after_commit.add(lambda: frappe.cache.delete(*keys))
+
+
+def on_member_user_change(doc, method=None, *args):
+    """doc_events handler for Member on_change / on_trash / after_rename."""
+    users = {doc.get("user")}
+    if method == "on_change":
+        previous = doc.get_doc_before_save()
+        if previous and previous.get("user") == doc.get("user"):
+            return
+        if previous:
+            users.add(previous.get("user"))
+    forget_member_users(users)
+
+
+# --- SPA boot payload ---
+#
+# library_app.boot caches each user's boot payload (roles, member, versions)
+# here. It is dropped when the user is saved (roles are a child table of
+# User) or their Member link changes; bulk role changes call forget_boot().
+
+def boot_key(user):
+    return redis_key(f"boot:{user}")
+
+
+def forget_boot(users):
+    keys = [boot_key(user) for user in users if user]
+    if keys:
+        frappe.cache.delete(*keys)
+        frappe.db.after_commit.add(lambda: frappe.cache.delete(*keys))
+
+
+def on_user_change(doc, method=None, *args):
+    """doc_events handler for User on_update / on_trash / after_rename (which also passes the old name)."""
+    forget_boot([doc.name, *args[:1]] if method == "after_rename" else [doc.name])
+
+
+# --- Stats ---
+
+def get_stats(reset=False):
+    """Hit/miss counters per cache kind, with hit ratios."""
+    key = frappe.cache.make_key(STATS_KEY)
+    # through a pipeline: RedisWrapper.hgetall would prefix the key again and unpickle
+    pipe = frappe.cache.pipeline()
+    pipe.hgetall(key)
+    if reset:
+        pipe.delete(key)
+    raw = {k.decode(): cint(v) for k, v in pipe.execute()[0].items()}
+
+    stats = {}
+    for kind in ("doc", "list", "user_member", "boot"):
+        hits, misses = raw.get(f"{kind}:hit", 0), raw.get(f"{kind}:miss", 0)
+        total = hits + misses
+        stats[kind] = {"hits": hits, "misses": misses, "hit_ratio": round(hits / total, 4) if total else None}
+    return stats
@@ -0,0 +1,394 @@
+# library_app/library_app/circulation.py
+from collections import Counter, defaultdict
+
+import frappe
+from frappe.utils import now_datetime, nowdate
+
+from library_app.analytics import record_loans, record_returns
+from library_app.cache import invalidate
+from library_app.inventory import BookUnavailable, held_copies, set_copy_status, title_status
+from library_app.loan_report import refresh_loans
+from library_app.search import enqueue_index_books
+from library_app.stats import bump, loans_on_key
+
+# --- Checkout ---
+#
+# A checkout locks the Book row with SELECT ... FOR UPDATE before it looks
+# for a free copy, so two checkouts of the same title serialize on that row
+# lock: the second one waits for the first to commit, then sees the updated
+# available_copies. Checkouts of different titles never wait on each other,
+# so throughput scales with the number of workers. The copy itself is picked
+# by the Loan controller (see library_app.inventory.allocate_copy).
+
+
+def lock_book(book_name):
+    """Loads the Book with its row locked until the transaction ends."""
+    try:
+        return frappe.get_doc("Book", book_name, for_update=True)
+    except (frappe.QueryTimeoutError, frappe.QueryDeadlockError):
+        frappe.throw(
+            f"Book '{book_name}' is being updated by another request. Please try again.",
+            BookUnavailable,
+        )
+
+
+def checkout(book_name, member_name, loan_date, return_date):
+    """Lends a copy of `book_name` to `member_name`. Returns the new Loan; the caller commits."""
+    book = lock_book(book_name)
+
+    if frappe.db.exists("Loan", {"book": book_name, "member": member_name, "returned": 0}):
+        frappe.throw(f"Member '{member_name}' already has '{book.title}' on loan.", BookUnavailable)
+
+    loan = frappe.get_doc({
+        "doctype": "Loan",
+        "book": book_name,
+        "member": member_name,
+        "loan_date": loan_date,
+        "return_date": return_date,
+        "returned": 0,
+        "overdue": 0,
+    })
+    # raises BookUnavailable when no copy is free
+    loan.insert()
+    return loan
+
+
+# --- Baskets ---
+#
+# A circulation desk checks out or returns a whole basket at once. Every
+# book in the basket is locked with one SELECT ... FOR UPDATE (in name
+# order, so two baskets sharing books can't deadlock), the whole basket is
+# validated from a couple of IN queries, and the writes are one multi-row
+# INSERT plus one UPDATE per target status. These paths bypass doc_events,
+# so counters, the read cache and the search index are updated explicitly.
+# Items that fail validation are reported and skipped; the rest commit
+# together.
+
+MAX_BASKET_SIZE = 100
+
+LOAN_FIELDS = [
+    "name", "book", "book_copy", "member", "loan_date", "return_date", "returned", "overdue",
+    "creation", "modified", "owner", "modified_by",
+]
+
+
+def parse_basket(items):
+    """Names from a JSON list, a comma-separated string or a list."""
+    if isinstance(items, str):
+        items = frappe.parse_json(items) if items.strip().startswith("[") else items.split(",")
+    items = [str(item).strip() for item in items or [] if item and str(item).strip()]
+    if not items:
+        frappe.throw("The basket is empty.")
+    if len(items) > MAX_BASKET_SIZE:
+        frappe.throw(f"A basket can hold at most {MAX_BASKET_SIZE} items.")
+    return items
+
+
+def lock_books(book_names):
+    """{name: row} for the existing books among `book_names`, locked in name order."""
+    if not book_names:
+        return {}
+    rows = frappe.db.sql(
+        """
+        SELECT name, title, isbn, status, available_copies, reservation_queue_length,
+            reservation_queue_offset
+        FROM `tabBook`
+        WHERE name IN %s
+        ORDER BY name
+        FOR UPDATE
+        """,
+        (tuple(book_names),),
+        as_dict=True,
+    )
+    return {row.name: row for row in rows}
+
+
+def add_to_books(column, amounts):
+    """Adds {book: amount} to a Book counter column with one UPDATE per distinct amount."""
+    by_amount = defaultdict(list)
+    for book, amount in amounts.items():
+        if amount:
+            by_amount[amount].append(book)
+    for amount, books in by_amount.items():
+        frappe.db.sql(
+            f"UPDATE `tabBook` SET `{column}` = `{column}` + %s WHERE name IN %s",
+            (amount, tuple(books)),
+        )
+
+
+def update_statuses(books, available_delta=None, queue_delta=None):
+    """
+    Writes the derived status of each book after the given counter changes and
+    copy status updates, and returns the book_status counter deltas. One
+    UPDATE per new status.
+    """
+    available_delta = available_delta or {}
+    queue_delta = queue_delta or {}
+    held = held_copies([book.name for book in books])
+    changes = defaultdict(list)
+    deltas = Counter()
+    for book in books:
+        status = title_status(
+            book.available_copies + available_delta.get(book.name, 0),
+            book.reservation_queue_length + queue_delta.get(book.name, 0),
+            held.get(book.name),
+        )
+        if status != book.status:
+            changes[status].append(book.name)
+            deltas[f"book_status:{book.status}"] -= 1
+            deltas[f"book_status:{status}"] += 1
+
+    now = now_datetime()
+    for status, names in changes.items():
+        frappe.db.sql(
+            "UPDATE `tabBook` SET status = %s, modified = %s, modified_by = %s WHERE name IN %s",
+            (status, now, frappe.session.user, tuple(names)),
+        )
+    return deltas
+
+
+def checkout_many(member_name, book_names, loan_date, return_date):
+    """
+    Lends a copy of every available book in `book_names` to `member_name` in one transaction.
+    Returns one result per requested book: {"book", "ok", "loan"} or {"book", "ok", "error"}.
+    The caller commits.
+    """
+    book_names = parse_basket(book_names)
+    if not frappe.db.exists("Member", member_name):
+        frappe.throw(f"Member '{member_name}' not found.", frappe.DoesNotExistError)
+
+    books = lock_books(book_names)
+    titles = tuple(books) or ("",)
+    already_has = set(frappe.get_all(
+        "Loan",
+        filters={"member": member_name, "book": ["in", list(titles)], "returned": 0},
+        pluck="book",
+    ))
+    # copies held on the shelf for this member's completed reservations
+    held = dict(frappe.db.sql(
+        """
+        SELECT reservation.book, copy.name
+        FROM `tabReservation` reservation
+        JOIN `tabBook Copy` copy ON copy.name = reservation.book_copy
+        WHERE reservation.member = %s AND reservation.book IN %s
+            AND reservation.status = 'Completed' AND copy.status = 'Reserved'
+        FOR UPDATE
+        """,
+        (member_name, titles),
+    ))
+    free = {}
+    for copy, book in frappe.db.sql(
+        """
+        SELECT name, book
+        FROM `tabBook Copy`
+        WHERE book IN %s AND status = 'Available'
+        ORDER BY book, name
+        FOR UPDATE
+        """,
+        (titles,),
+    ):
+        free.setdefault(book, copy)
+
+    results, lend, seen = [], [], set()
+    for name in book_names:
+        book = books.get(name)
+        copy = held.get(name) or free.get(name)
+        if name in seen:
+            error = "Listed more than once in this basket."
+        elif not book:
+            error = f"Book '{name}' not found."
+        elif name in already_has:
+            error = f"Member '{member_name}' already has '{book.title}' on loan."
+        elif not copy:
+            error = f"Book '{book.title}' (ISBN: {book.isbn}) is already on loan."
+        else:
+            error = None
+        seen.add(name)
+
+        if error:
+            results.append({"book": name, "ok": False, "error": error})
+            continue
+        loan_name = frappe.generate_hash(length=10)
+        lend.append((loan_name, book, copy))
+        results.append({"book": name, "ok": True, "loan": loan_name, "book_copy": copy})
+
+    if not lend:
+        return results
+
+    now = now_datetime()
+    user = frappe.session.user
+    frappe.db.bulk_insert("Loan", LOAN_FIELDS, [
+        (loan_name, book.name, copy, member_name, loan_date, return_date, 0, 0, now, now, user, user)
+        for loan_name, book, copy in lend
+    ])
+    set_copy_status([copy for _, _, copy in lend], "On Loan")
+    from_shelf = {book.name: -1 for _, book, copy in lend if held.get(book.name) != copy}
+    add_to_books("available_copies", from_shelf)
+
+    deltas = update_statuses([book for _, book, _ in lend], available_delta=from_shelf)
+    deltas.update({"loans": len(lend), "active_loans": len(lend), loans_on_key(loan_date): len(lend)})
+    bump(deltas)
+    lent_books = [book.name for _, book, _ in lend]
+    refresh_loans([loan_name for loan_name, _, _ in lend])
+    record_loans([
+        {"book": book.name, "member": member_name, "loan_date": loan_date, "return_date": return_date}
+        for _, book, _ in lend
+    ])
+    invalidate("Loan")
+    invalidate("Book", lent_books)
+    enqueue_index_books(lent_books)
+    return results
+
+
+def return_many(loan_names):
+    """
+    Returns every open loan in `loan_names` in one transaction. Each returned
+    copy is held for the next member in its title's reservation queue (whose
+    reservation becomes "Completed") or goes back on the shelf. The queue heads
+    for the whole basket are read with one query.
+    Returns one result per loan: {"loan", "ok", "book", "reservation", "reserved_for"}
+    or {"loan", "ok", "error"}. The caller commits and sends the notifications.
+    """
+    loan_names = parse_basket(loan_names)
+    loans = {
+        row.name: row for row in frappe.db.sql(
+            """
+            SELECT name, book, book_copy, member, loan_date, return_date, returned, overdue
+            FROM `tabLoan`
+            WHERE name IN %s
+            ORDER BY name
+            FOR UPDATE
+            """,
+            (tuple(loan_names),),
+            as_dict=True,
+        )
+    }
+
+    results, returning, seen = [], [], set()
+    for name in loan_names:
+        loan = loans.get(name)
+        if name in seen:
+            error = "Listed more than once in this basket."
+        elif not loan:
+            error = f"Loan with ID '{name}' not found for return."
+        elif loan.returned:
+            error = f"Loan '{name}' has already been marked as returned."
+        else:
+            error = None
+        seen.add(name)
+
+        if error:
+            results.append({"loan": name, "ok": False, "error": error})
+        else:
+            returning.append(loan)
+            results.append({"loan": name, "ok": True, "book": loan.book})
+
+    if not returning:
+        return results
+
+    book_names = sorted({loan.book for loan in returning})
+    books = lock_books(book_names)
+
+    # loans from before copies existed: give each one a copy of its title that is out
+    if any(not loan.book_copy for loan in returning):
+        out = defaultdict(list)
+        for copy, book in frappe.db.sql(
+            "SELECT name, book FROM `tabBook Copy` WHERE book IN %s AND status = 'On Loan' FOR UPDATE",
+            (tuple(book_names),),
+        ):
+            out[book].append(copy)
+        taken = {loan.book_copy for loan in returning}
+        for loan in returning:
+            if not loan.book_copy:
+                spare = [copy for copy in out[loan.book] if copy not in taken]
+                loan.book_copy = spare[0] if spare else None
+                taken.add(loan.book_copy)
+
+    # the first N members in each title's queue, N = copies of it coming back
+    returned_per_book = Counter(loan.book for loan in returning if loan.book_copy)
+    waiting = defaultdict(list)
+    if returned_per_book:
+        for reservation in frappe.db.sql(
+            """
+            SELECT reservation.name, reservation.book, reservation.member
+            FROM `tabBook` book
+            JOIN `tabReservation` reservation
+                ON reservation.book = book.name
+                AND reservation.status = 'Pending'
+                AND reservation.queue_slot > book.reservation_queue_offset
+                AND reservation.queue_slot <= book.reservation_queue_offset + %s
+            WHERE book.name IN %s
+            ORDER BY reservation.book, reservation.queue_slot
+            FOR UPDATE
+            """,
+            (max(returned_per_book.values()), tuple(returned_per_book)),
+            as_dict=True,
+        ):
+            if len(waiting[reservation.book]) < returned_per_book[reservation.book]:
+                waiting[reservation.book].append(reservation)
+
+    holds, shelved = [], []
+    for loan in returning:
+        if not loan.book_copy:
+            continue
+        if waiting[loan.book]:
+            holds.append((loan, waiting[loan.book].pop(0)))
+        else:
+            shelved.append(loan)
+
+    now = now_datetime()
+    user = frappe.session.user
+    today = nowdate()
+    frappe.db.sql(
+        "UPDATE `tabLoan` SET returned = 1, returned_on = %s, modified = %s, modified_by = %s WHERE name IN %s",
+        (today, now, user, tuple(loan.name for loan in returning)),
+    )
+    set_copy_status([loan.book_copy for loan, _ in holds], "Reserved")
+    set_copy_status([loan.book_copy for loan in shelved], "Available")
+
+    served = Counter(loan.book for loan, _ in holds)
+    if holds:
+        params = []
+        for loan, reservation in holds:
+            params.extend([reservation.name, loan.book_copy])
+        frappe.db.sql(
+            f"""
+            UPDATE `tabReservation`
+            SET status = 'Completed', queue_slot = 0, modified = %s, modified_by = %s,
+                book_copy = CASE name {" ".join(["WHEN %s THEN %s"] * len(holds))} END
+            WHERE name IN %s
+            """,
+            (now, user, *params, tuple(reservation.name for _, reservation in holds)),
+        )
+        # the served heads leave their queues: offsets move up, nobody else's slot changes
+        add_to_books("reservation_queue_offset", served)
+        add_to_books("reservation_queue_length", {book: -count for book, count in served.items()})
+
+    to_shelf = Counter(loan.book for loan in shelved)
+    add_to_books("available_copies", to_shelf)
+
+    deltas = update_statuses(
+        [books[name] for name in book_names if name in books],
+        available_delta=to_shelf,
+        queue_delta={book: -count for book, count in served.items()},
+    )
+    deltas["active_loans"] -= len(returning)
+    deltas["overdue_loans"] -= sum(1 for loan in returning if loan.overdue)
+    deltas["pending_reservations"] -= len(holds)
+    bump(deltas)
+    refresh_loans([loan.name for loan in returning])
+    record_returns(returning, today)
+    invalidate("Loan", [loan.name for loan in returning])
+    invalidate("Book", book_names)
+    if holds:
+        invalidate("Reservation", [reservation.name for _, reservation in holds])
+    enqueue_index_books(book_names)
+
+    held_for = {loan.name: reservation for loan, reservation in holds}
+    for result in results:
+        reservation = result["ok"] and held_for.get(result["loan"])
+        if reservation:
+            result["reservation"] = reservation.name
+            result["reserved_for"] = reservation.member
+            result["book_title"] = books[result["book"]].title
+    return results
@@ -0,0 +1,269 @@
+# library_app/library_app/commands.py
+import click
+import frappe
+from frappe.commands import pass_context
+from frappe.exceptions import SiteNotSpecifiedError
+
+# --- bench commands for the library app ---
+#
+# Frappe picks these up from `commands` below, e.g.
+#     bench --site your-site.com rebuild-book-search-index
+
+
+def run_for_sites(context, fn, *args, **kwargs):
+    """Runs `fn` once per site passed with --site, connected as Administrator."""
+    if not context.sites:
+        raise SiteNotSpecifiedError
+
+    results = {}
+    for site in context.sites:
+        try:
+            frappe.init(site=site)
+            frappe.connect()
+            results[site] = fn(*args, **kwargs)
+        finally:
+            frappe.destroy()
+    return results
+
+
+@click.command("rebuild-book-search-index")
+@pass_context
+def rebuild_book_search_index(context):
+    """Rebuild the catalog search index from scratch."""
+    from library_app.search import build_book_index
+
+    for site, count in run_for_sites(context, build_book_index).items():
+        click.echo(f"{site}: indexed {count} books")
+
+
+
+@click.command("reconcile-library-counters")
+@click.option("--dry-run", is_flag=True, default=False, help="Only report drift, do not correct it")
+@pass_context
+def reconcile_library_counters(context, dry_run=False):
+    """Recompute the dashboard counters and report any drift."""
+    from library_app.stats import reconcile_counters
+
+    for site, drift in run_for_sites(context, reconcile_counters, fix=not dry_run).items():
+        if not drift:
+            click.echo(f"{site}: counters are in sync")
+            continue
+        click.echo(f"{site}: {len(drift)} counter(s) drifted" + ("" if dry_run else " (corrected)"))
+        for key, values in drift.items():
+            click.echo(f"  {key}: stored {values['stored']}, actual {values['actual']}")
+
+
+
+@click.command("explain-library-queries")
+@click.option("--verbose", is_flag=True, default=False, help="Print every plan, not only full scans")
+@pass_context
+def explain_library_queries(context, verbose=False):
+    """EXPLAIN the queries issued by library_app.api and flag full table scans."""
+    from library_app.benchmarks.explain import run
+
+    def explain_as_admin():
+        frappe.set_user("Administrator")
+        return run(verbose=verbose)
+
+    run_for_sites(context, explain_as_admin)
+
+
+
+@click.command("import-books")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, resolve_path=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "json", "jsonl"]), help="Defaults to the file extension")
+@click.option("--chunk-size", type=int, default=None, help="Rows per INSERT/commit")
+@pass_context
+def import_books(context, path, fmt=None, chunk_size=None):
+    """Bulk import books from a CSV, JSON array or JSON Lines file."""
+    from library_app.book_import import import_books as run_import
+
+    for site, report in run_for_sites(context, run_import, path, fmt=fmt, chunk_size=chunk_size).items():
+        click.echo(
+            f"{site}: {report['rows']} rows, {report['inserted']} inserted, {report['duplicates']} duplicates, "
+            f"{report['invalid']} invalid in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+        )
+        for entry in report["errors"]:
+            click.echo(f"  row {entry['row']}: {entry['error']}")
+
+
+@click.command("import-members")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False, resolve_path=True))
+@click.option("--format", "fmt", type=click.Choice(["csv", "json", "jsonl"]), help="Defaults to the file extension")
+@click.option("--role", "default_role", default="Library Member", help="Role for rows without a role column")
+@click.option("--chunk-size", type=int, default=None, help="Rows per INSERT/commit")
+@click.option("--processes", type=int, default=None, help="Password hashing processes (default: CPU count)")
+@click.option("--resume", is_flag=True, default=False, help="Continue from the last checkpoint of this file")
+@pass_context
+def import_members(context, path, fmt=None, default_role="Library Member", chunk_size=None, processes=None, resume=False):
+    """Bulk onboard patrons (User + role + Member) from a CSV, JSON array or JSON Lines roster."""
+    from library_app.onboarding import onboard_members
+
+    results = run_for_sites(
+        context, onboard_members, path,
+        fmt=fmt, default_role=default_role, chunk_size=chunk_size, processes=processes, resume=resume,
+    )
+    for site, report in results.items():
+        click.echo(
+            f"{site}: {report['rows']} rows from row {report['resumed_from'] + 1}, {report['users']} users, "
+            f"{report['linked']} linked to existing users, {report['password_resets']} sent a password reset, "
+            f"{report['duplicates']} duplicates, "
+            f"{report['invalid']} invalid in {report['seconds']}s ({report['rows_per_second']} rows/s)"
+        )
+        for entry in report["errors"]:
+            click.echo(f"  row {entry['row']}: {entry['error']}")
+
+
+@click.command("merge-duplicate-books")
+@click.option("--dry-run", is_flag=True, default=False, help="Only list the books that would be merged")
+@pass_context
+def merge_duplicate_books(context, dry_run=False):
+    """Merge Books with the same title and author into one title with several copies."""
+    from library_app.inventory import merge_duplicate_titles
+
+    for site, report in run_for_sites(context, merge_duplicate_titles, dry_run=dry_run).items():
+        click.echo(f"{site}: {len(report)} duplicated title(s)" + (" (dry run)" if dry_run else " merged"))
+        for entry in report:
+            click.echo(f"  {entry['title']}: keep {entry['kept']}, merge {', '.join(entry['merged'])}")
+
+
+@click.command("rebuild-loan-report")
+@pass_context
+def rebuild_loan_report(context):
+    """Rebuild the materialized books-on-loan/overdue report from the Loan table."""
+    from library_app.loan_report import rebuild
+
+    def rebuild_and_commit():
+        count = rebuild()
+        frappe.db.commit()
+        return count
+
+    for site, count in run_for_sites(context, rebuild_and_commit).items():
+        click.echo(f"{site}: {count} open loans in the report")
+
+
+@click.command("rebuild-circulation-analytics")
+@pass_context
+def rebuild_circulation_analytics(context):
+    """Recompute the circulation rollups (loans per period, top titles, member activity) from the Loan table."""
+    from library_app.analytics import rebuild
+
+    for site, result in run_for_sites(context, rebuild).items():
+        click.echo(f"{site}: {result['loans']} loans over {result['months']} months in {result['seconds']}s")
+
+
+@click.command("sync-library-permissions")
+@click.option("--dry-run", is_flag=True, help="Only report what would change")
+@click.option("--force", is_flag=True, help="Also reset roles and permission rows that differ from the spec")
+@pass_context
+def sync_library_permissions(context, dry_run=False, force=False):
+    """
+    Create the library roles and permissions missing from library_app.install
+    (as every migrate does); with --force, also reset the ones that differ.
+    """
+    from library_app.install import sync
+
+    def sync_and_commit():
+        report = sync(dry_run=dry_run, force=force)
+        frappe.db.commit()
+        return report
+
+    for site, report in run_for_sites(context, sync_and_commit).items():
+        roles, permissions = report["roles"], report["permissions"]
+        changes = [
+            *(f"create role {role}" for role in roles["created"]),
+            *(f"copy standard permissions of {doctype}" for doctype in report["customized"]),
+            *(f"create permission {key}" for key in permissions["created"]),
+        ]
+        differences = [
+            *(f"role {role}: {changes}" for role, changes in roles["updated"].items()),
+            *(f"permission {key}: {changes}" for key, changes in permissions["updated"].items()),
+        ]
+        if force:
+            changes += [f"reset {difference}" for difference in differences]
+        click.echo(f"{site}: {len(changes) or 'no'} change(s){' (dry run)' if dry_run else ''}")
+        for change in changes:
+            click.echo(f"  {change}")
+        if differences and not force:
+            click.echo(f"  {len(differences)} difference(s) from the spec kept; rerun with --force to reset:")
+            for difference in differences:
+                click.echo(f"    {difference}")
+
+
+@click.command("generate-library-data")
+@click.option("--scale", type=click.Choice(["tiny", "small", "medium", "large"]), help="Preset size; overrides the counts")
+@click.option("--books", type=int, default=1_000)
+@click.option("--members", type=int, default=200)
+@click.option("--loans", type=int, default=5_000)
+@click.option("--reservations", type=int, default=500)
+@click.option("--seed", type=int, default=0, help="The same seed generates the same library")
+@click.option("--chunk-size", type=int, default=None, help="Rows per INSERT/commit")
+@pass_context
+def generate_library_data(context, scale=None, books=1_000, members=200, loans=5_000, reservations=500, seed=0, chunk_size=None):
+    """Generate a synthetic library with bulk inserts (committed; remove with purge-library-data)."""
+    from library_app.benchmarks import datagen
+
+    def generate():
+        if scale:
+            return datagen.generate_scale(scale, seed=seed, chunk_size=chunk_size)
+        return datagen.generate(books, members, loans, reservations, seed=seed, chunk_size=chunk_size)
+
+    for site, summary in run_for_sites(context, generate).items():
+        click.echo(
+            f"{site}: {summary['prefix']}: {summary['books']} books, {summary['members']} members, "
+            f"{summary['loans']} loans, {summary['reservations']} reservations in {summary['seconds']}s"
+        )
+
+
+@click.command("purge-library-data")
+@click.argument("prefix")
+@pass_context
+def purge_library_data(context, prefix):
+    """Delete a generated dataset (GEN-...)."""
+    from library_app.benchmarks.datagen import purge
+
+    for site, deleted in run_for_sites(context, purge, prefix).items():
+        click.echo(f"{site}: " + ", ".join(f"{count} {doctype}" for doctype, count in deleted.items()))
+
+
+@click.command("run-library-benchmarks")
+@click.option("--scale", "scales", multiple=True, type=click.Choice(["tiny", "small", "medium", "large"]), help="Repeat for several scale points")
+@click.option("--repeat", type=int, default=5, help="Calls per endpoint")
+@click.option("--baseline", type=click.Path(exists=True, dir_okay=False, resolve_path=True), help="Results JSON to compare against")
+@click.option("--output", type=click.Path(dir_okay=False, resolve_path=True), help="Where to write the results JSON")
+@click.option("--tolerance", type=float, default=0.25, help="Allowed slowdown of the median, e.g. 0.25 for 25%")
+@click.option("--seed", type=int, default=0)
+@click.option("--keep-data", is_flag=True, default=False, help="Keep the generated datasets")
+@pass_context
+def run_library_benchmarks(context, scales=(), repeat=5, baseline=None, output=None, tolerance=0.25, seed=0, keep_data=False):
+    """Time every library API endpoint at each scale and fail on regressions against a baseline."""
+    from library_app.benchmarks.suite import BenchmarkRegression, run
+
+    try:
+        for site, (results, path) in run_for_sites(
+            context, run, scales=scales or ("tiny",), repeat=repeat, baseline=baseline, output=output,
+            tolerance=tolerance, seed=seed, keep_data=keep_data,
+        ).items():
+            click.echo(f"{site}: results written to {path}")
+            if results["uncovered"]:
+                click.echo(f"  not benchmarked: {', '.join(results['uncovered'])}")
+    except BenchmarkRegression as e:
+        for scale, endpoint, reason in e.regressions:
+            click.echo(f"REGRESSION {scale} {endpoint}: {reason}", err=True)
+        raise click.ClickException(str(e))
+
+
+commands = [
+    rebuild_book_search_index,
+    reconcile_library_counters,
+    explain_library_queries,
+    import_books,
+    import_members,
+    merge_duplicate_books,
+    rebuild_loan_report,
+    rebuild_circulation_analytics,
+    sync_library_permissions,
+    generate_library_data,
+    purge_library_data,
+    run_library_benchmarks,
+]
@@ -0,0 +1,58 @@
+# library_app/library_app/conditional.py
+import hashlib
+
+import frappe
+from werkzeug.wrappers import Response
+
+from library_app.cache import list_tag
+
+# --- Conditional GETs for the polled list endpoints ---
+#
+# get_books, get_members, get_loans and get_reservations answer with an ETag
+# built from the list version counters (library_app.cache.list_tag, bumped
+# by every write that can change the list, and stored in one hash with the
+# epoch so they are never evicted apart), the call's arguments and the
+# user. When the client sends that ETag back in If-None-Match the endpoint
+# returns 304 after one Redis HMGET: no SQL, no serialization. Responses are
+# marked `private, no-cache`, so browsers keep them but revalidate on every
+# poll.
+#
+# The endpoints call not_modified() first; after_request (wired in
+# hooks.py) adds the ETag and Cache-Control headers to the response.
+
+CACHE_CONTROL = "private, no-cache"
+
+
+def list_etag(doctype, args):
+    digest = hashlib.sha1(
+        frappe.as_json([doctype, list_tag(doctype), frappe.session.user, args], indent=None).encode()
+    ).hexdigest()
+    return f'W/"{digest}"'
+
+
+def not_modified(doctype, **args):
+    """
+    For a GET request, remembers the list's ETag for the response and returns
+    a 304 Response when the client already has it; otherwise returns None.
+    """
+    request = getattr(frappe.local, "request", None)
+    if request is None or request.method != "GET":
+        return None
+
+    frappe.has_permission(doctype, "read", throw=True)
+    etag = list_etag(doctype, args)
+    frappe.local.library_etag = etag
+    if etag in [tag.strip() for tag in request.headers.get("If-None-Match", "").split(",")]:
+        return Response(status=304)
+    return None
+
+
+def after_request(response=None, request=None):
+    etag = getattr(frappe.local, "library_etag", None)
+    if not etag:
+        return
+    frappe.local.library_etag = None
+    if response is not None and response.status_code in (200, 304):
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        response.headers["Vary"] = "Cookie"
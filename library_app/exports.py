@@ -0,0 +1,261 @@
+# library_app/library_app/exports.py
+import csv
+import io
+import os
+import tempfile
+from contextlib import contextmanager, nullcontext
+
+import frappe
+from frappe.utils import cint, date_diff, nowdate
+from werkzeug.wrappers import Response
+
+# --- Streaming CSV/XLSX exports ---
+#
+# Rows are read with one joined query through an unbuffered (server-side)
+# cursor and written out as they arrive, so memory stays flat no matter how
+# many rows an export has. CSV is streamed straight into the HTTP response;
+# XLSX is written in openpyxl's write-only mode to a temporary file that is
+# then streamed. Large exports can run as a background job instead, which
+# saves a private File and notifies the user when it is ready.
+
+CSV_FLUSH_ROWS = 1000
+STREAM_CHUNK_BYTES = 64 * 1024
+XLSX_MAX_ROWS_PER_SHEET = 1_048_575  # Excel's row limit minus the header
+# Streamed bodies open their own connection (see site_connection). Tests
+# consume the body inside the request and turn this off to use its one.
+STREAM_OWN_CONNECTION = True
+
+FORMATS = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "xlsx": ("application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "xlsx"),
+}
+
+
+def loan_status(returned):
+    return "Returned" if returned else "On Loan"
+
+
+def yes_no(value):
+    return "Yes" if value else "No"
+
+
+EXPORTS = {
+    "member_loan_history": {
+        "title": "loan_history",
+        "requires_member": True,
+        "header": ["Loan ID", "Book Title", "ISBN", "Loan Date", "Return Date", "Status", "Overdue"],
+        "query": """
+            SELECT loan.name, book.title, book.isbn, loan.loan_date, loan.return_date, loan.returned, loan.overdue
+            FROM `tabLoan` loan
+            LEFT JOIN `tabBook` book ON book.name = loan.book
+            WHERE loan.member = %(member)s
+            ORDER BY loan.loan_date DESC
+        """,
+        "row": lambda r: [r[0], r[1], r[2], r[3], r[4], loan_status(r[5]), yes_no(r[6])],
+    },
+    "loans": {
+        "title": "all_loans",
+        "header": ["Loan ID", "Book ID", "Book Title", "ISBN", "Member ID", "Member Name", "Loan Date", "Return Date", "Status", "Overdue"],
+        "query": """
+            SELECT loan.name, loan.book, book.title, book.isbn, loan.member, member.member_name,
+                loan.loan_date, loan.return_date, loan.returned, loan.overdue
+            FROM `tabLoan` loan
+            LEFT JOIN `tabBook` book ON book.name = loan.book
+            LEFT JOIN `tabMember` member ON member.name = loan.member
+            ORDER BY loan.name
+        """,
+        "row": lambda r: [*r[:8], loan_status(r[8]), yes_no(r[9])],
+    },
+    "overdue": {
+        "title": "overdue_loans",
+        "header": ["Loan ID", "Book Title", "ISBN", "Member Name", "Member Email", "Loan Date", "Return Date", "Days Overdue"],
+        "query": """
+            SELECT loan.name, book.title, book.isbn, member.member_name, member.email, loan.loan_date, loan.return_date
+            FROM `tabLoan` loan
+            LEFT JOIN `tabBook` book ON book.name = loan.book
+            LEFT JOIN `tabMember` member ON member.name = loan.member
+            WHERE loan.returned = 0 AND loan.return_date < %(today)s
+            ORDER BY loan.return_date
+        """,
+        "row": lambda r: [*r[:7], date_diff(nowdate(), r[6])],
+    },
+    "catalog": {
+        "title": "catalog",
+        "header": ["Book ID", "Title", "Author", "Publish Date", "ISBN", "Status", "Copies", "Available Copies"],
+        "query": """
+            SELECT name, title, author, publish_date, isbn, status, total_copies, available_copies
+            FROM `tabBook`
+            ORDER BY name
+        """,
+        "row": list,
+    },
+}
+
+
+def get_export(export, member=None, fmt="csv"):
+    """Validates the export name, format and arguments, and checks the caller may run it."""
+    if export not in EXPORTS:
+        frappe.throw(f"Unknown export '{export}'.")
+    if fmt not in FORMATS:
+        frappe.throw(f"Unsupported export format '{fmt}'. Use csv or xlsx.")
+
+    spec = EXPORTS[export]
+    if spec.get("requires_member"):
+        if not member:
+            frappe.throw("A member is required for this export.")
+        frappe.has_permission("Member", "read", doc=member, throw=True)
+    else:
+        from library_app.api import check_librarian_permission
+
+        check_librarian_permission()
+    return spec
+
+
+def iter_rows(spec, member=None):
+    """Yields the export's formatted rows from a server-side cursor (header not included)."""
+    params = {"member": member, "today": nowdate()}
+    with frappe.db.unbuffered_cursor():
+        for row in frappe.db.sql(spec["query"], params, as_iterator=True):
+            yield spec["row"](row)
+
+
+def iter_csv(spec, member=None):
+    """Yields CSV text in chunks of CSV_FLUSH_ROWS rows."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(spec["header"])
+
+    for count, row in enumerate(iter_rows(spec, member), start=1):
+        writer.writerow(row)
+        if count % CSV_FLUSH_ROWS == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def write_xlsx(spec, path, member=None):
+    """Writes the export to `path` with openpyxl's write-only workbook, starting a new sheet at Excel's row limit."""
+    from openpyxl import Workbook
+
+    workbook = Workbook(write_only=True)
+    sheet = None
+    rows_in_sheet = XLSX_MAX_ROWS_PER_SHEET
+
+    for row in iter_rows(spec, member):
+        if rows_in_sheet >= XLSX_MAX_ROWS_PER_SHEET:
+            sheet = workbook.create_sheet(f"{spec['title']}_{len(workbook.worksheets) + 1}"[:31])
+            sheet.append(spec["header"])
+            rows_in_sheet = 0
+        sheet.append(row)
+        rows_in_sheet += 1
+
+    if sheet is None:
+        workbook.create_sheet(spec["title"][:31]).append(spec["header"])
+    workbook.save(path)
+
+
+def write_export(spec, fmt, path, member=None):
+    if fmt == "xlsx":
+        write_xlsx(spec, path, member)
+        return
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        for chunk in iter_csv(spec, member):
+            f.write(chunk)
+
+
+def export_filename(spec, fmt, member=None):
+    parts = [spec["title"], member, nowdate()]
+    return "_".join(part for part in parts if part) + f".{FORMATS[fmt][1]}"
+
+
+@contextmanager
+def site_connection(site, user):
+    """
+    A database connection of its own, for code that runs outside a request's
+    lifecycle. The WSGI server iterates a streamed body after application()
+    has closed the request's connection (frappe.local is only released once
+    the body is done), so the stream re-initialises the local, connects, and
+    destroys the connection when it finishes.
+    """
+    frappe.init(site=site, force=True)
+    try:
+        frappe.connect()
+        frappe.set_user(user)
+        yield
+    finally:
+        frappe.destroy()
+
+
+def stream_export(export, fmt="csv", member=None):
+    """A streamed werkzeug Response for the export; nothing is buffered beyond one chunk."""
+    spec = get_export(export, member, fmt)
+    site, user = frappe.local.site, frappe.session.user
+    content_type, _ = FORMATS[fmt]
+
+    def generate():
+        with site_connection(site, user) if STREAM_OWN_CONNECTION else nullcontext():
+            if fmt == "csv":
+                for chunk in iter_csv(spec, member):
+                    yield chunk.encode("utf-8")
+                return
+
+            fd, path = tempfile.mkstemp(suffix=".xlsx")
+            os.close(fd)
+            try:
+                write_xlsx(spec, path, member)
+                with open(path, "rb") as f:
+                    while chunk := f.read(STREAM_CHUNK_BYTES):
+                        yield chunk
+            finally:
+                os.remove(path)
+
+    response = Response(generate(), content_type=content_type, direct_passthrough=True)
+    response.headers["Content-Disposition"] = f'attachment; filename="{export_filename(spec, fmt, member)}"'
+    response.headers["Cache-Control"] = "no-store"
+    return response
+
+
+def enqueue_export(export, fmt="csv", member=None):
+    """Runs the export as a background job; the user is notified with the file URL when done."""
+    get_export(export, member, fmt)
+    job = frappe.enqueue(
+        "library_app.exports.build_export_file",
+        queue="long",
+        timeout=cint(frappe.conf.get("library_export_timeout")) or 6 * 60 * 60,
+        export=export,
+        fmt=fmt,
+        member=member,
+        user=frappe.session.user,
+    )
+    return {"message": "Export started. You will be notified when the file is ready.", "job_id": job.id if job else None}
+
+
+def build_export_file(export, fmt, member=None, user=None):
+    """Background job: writes the export into a private File and publishes its URL to the user."""
+    spec = EXPORTS[export]
+    filename = export_filename(spec, fmt, member)
+    filename = f"{os.path.splitext(filename)[0]}_{frappe.generate_hash(length=6)}{os.path.splitext(filename)[1]}"
+    path = frappe.get_site_path("private", "files", filename)
+
+    write_export(spec, fmt, path, member)
+
+    file_doc = frappe.get_doc({
+        "doctype": "File",
+        "file_name": filename,
+        "file_url": f"/private/files/{filename}",
+        "is_private": 1,
+        "file_size": os.path.getsize(path),
+    })
+    file_doc.insert(ignore_permissions=True)
+    if user:
+        # the file belongs to the user who asked for it
+        frappe.db.set_value("File", file_doc.name, "owner", user, update_modified=False)
+    frappe.db.commit()
+
+    frappe.publish_realtime(
+        "library_export_ready",
+        {"export": export, "file_url": file_doc.file_url, "file_name": filename},
+        user=user,
+    )
+    return file_doc.file_url
@@ -86,7 +86,8 @@ app_license = "mit"
 # ------------
 
 # before_install = "library_app.install.before_install"
-# after_install = "library_app.install.after_install"
+after_install = "library_app.install.after_install"
+after_migrate = "library_app.install.after_migrate"
 
 # Uninstallation
 # ------------
@@ -140,9 +141,98 @@ app_license = "mit"
 # 	}
 # }
 
+doc_events = {
+	"Book": {
+		"after_insert": "library_app.stats.on_doc_insert",
+		"on_update": [
+			"library_app.stats.on_doc_update",
+			"library_app.search.on_book_update",
+			"library_app.loan_report.on_book_update",
+		],
+		"on_change": "library_app.cache.on_doc_change",
+		"after_rename": "library_app.cache.on_doc_change",
+		"on_trash": [
+			"library_app.stats.on_doc_trash",
+			"library_app.search.on_book_trash",
+			"library_app.cache.on_doc_change",
+		],
+	},
+	"User": {
+		"on_update": "library_app.cache.on_user_change",
+		"after_rename": "library_app.cache.on_user_change",
+		"on_trash": "library_app.cache.on_user_change",
+	},
+	"Member": {
+		"after_insert": [
+			"library_app.stats.on_doc_insert",
+			"library_app.analytics.on_member_insert",
+		],
+		"on_update": "library_app.loan_report.on_member_update",
+		"on_change": [
+			"library_app.cache.on_doc_change",
+			"library_app.cache.on_member_user_change",
+		],
+		"after_rename": [
+			"library_app.cache.on_doc_change",
+			"library_app.cache.on_member_user_change",
+		],
+		"on_trash": [
+			"library_app.stats.on_doc_trash",
+			"library_app.cache.on_doc_change",
+			"library_app.cache.on_member_user_change",
+			"library_app.analytics.on_member_trash",
+		],
+	},
+	"Loan": {
+		"after_insert": [
+			"library_app.stats.on_doc_insert",
+			"library_app.analytics.on_loan_insert",
+		],
+		"on_update": [
+			"library_app.stats.on_doc_update",
+			"library_app.analytics.on_loan_update",
+		],
+		"on_change": [
+			"library_app.cache.on_doc_change",
+			"library_app.loan_report.on_loan_change",
+		],
+		"after_rename": "library_app.cache.on_doc_change",
+		"on_trash": [
+			"library_app.stats.on_doc_trash",
+			"library_app.cache.on_doc_change",
+			"library_app.loan_report.on_loan_change",
+			"library_app.analytics.on_loan_trash",
+		],
+	},
+	"Reservation": {
+		"after_insert": "library_app.stats.on_doc_insert",
+		"on_update": "library_app.stats.on_doc_update",
+		"on_change": "library_app.cache.on_doc_change",
+		"after_rename": "library_app.cache.on_doc_change",
+		"on_trash": [
+			"library_app.stats.on_doc_trash",
+			"library_app.cache.on_doc_change",
+		],
+	},
+}
+
 # Scheduled Tasks
 # ---------------
 
+scheduler_events = {
+	"cron": {
+		"0 9 * * *": [
+			"library_app.api.check_and_notify_overdue_books",
+		],
+		"* * * * *": [
+			"library_app.analytics.flush_pending",
+		],
+		"*/5 * * * *": [
+			"library_app.notifications.retry_notifications",
+		],
+	},
+}
+
 # scheduler_events = {
 # 	"all": [
 # 		"library_app.tasks.all"
@@ -191,8 +281,8 @@ app_license = "mit"
 
 # Request Events
 # ----------------
-# before_request = ["library_app.utils.before_request"]
-# after_request = ["library_app.utils.after_request"]
+before_request = ["library_app.instrumentation.before_request"]
+after_request = ["library_app.instrumentation.after_request", "library_app.conditional.after_request"]
 
 # Job Events
 # ----------
@@ -237,234 +327,6 @@ app_license = "mit"
 # 	"Logging DocType Name": 30  # days to retain logs
 # }
 
-
-
-import frappe
-
-
-# --- Library Management System Roles and Permissions ---
-
-def create_library_roles():
-    """Creates the necessary roles for the library management system."""
-    roles = [
-        {
-            "role_name": "Librarian",
-            "desk_access": 1,
-            "restrict_to_domain": None,
-            "disabled": 0
-        },
-        {
-            "role_name": "Library Member",
-            "desk_access": 0,  # Members don't need desk access
-            "restrict_to_domain": None,
-            "disabled": 0
-        },
-        {
-            "role_name": "Library Manager",
-            "desk_access": 1,
-            "restrict_to_domain": None,
-            "disabled": 0
-        }
-    ]
-    
-    for role_data in roles:
-        if not frappe.db.exists("Role", role_data["role_name"]):
-            role = frappe.get_doc({
-                "doctype": "Role",
-                **role_data
-            })
-            role.insert(ignore_permissions=True)
-
-def setup_library_permissions():
-    """Sets up permissions for library DocTypes."""
-    # Permissions for Librarian role
-    librarian_permissions = [
-        {
-            "doctype": "Book",
-            "role": "Librarian",
-            "create": 1,
-            "read": 1,
-            "write": 1,
-            "delete": 1,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 1,
-            "export": 1,
-            "share": 1,
-            "print": 1,
-            "email": 1
-        },
-        {
-            "doctype": "Member",
-            "role": "Librarian",
-            "create": 1,
-            "read": 1,
-            "write": 1,
-            "delete": 1,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 1,
-            "export": 1,
-            "share": 1,
-            "print": 1,
-            "email": 1
-        },
-        {
-            "doctype": "Loan",
-            "role": "Librarian",
-            "create": 1,
-            "read": 1,
-            "write": 1,
-            "delete": 1,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 1,
-            "export": 1,
-            "share": 1,
-            "print": 1,
-            "email": 1
-        },
-        {
-            "doctype": "Reservation",
-            "role": "Librarian",
-            "create": 1,
-            "read": 1,
-            "write": 1,
-            "delete": 1,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 1,
-            "export": 1,
-            "share": 1,
-            "print": 1,
-            "email": 1
-        }
-    ]
-    
-    # Permissions for Library Member role
-    member_permissions = [
-        {
-            "doctype": "Book",
-            "role": "Library Member",
-            "create": 0,
-            "read": 1,
-            "write": 0,
-            "delete": 0,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 0,
-            "export": 0,
-            "share": 0,
-            "print": 0,
-            "email": 0
-        },
-        {
-            "doctype": "Member",
-            "role": "Library Member",
-            "create": 0,
-            "read": 1,
-            "write": 1,  # Can update their own member record
-            "delete": 0,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 0,
-            "export": 0,
-            "share": 0,
-            "print": 0,
-            "email": 0
-        },
-        {
-            "doctype": "Loan",
-            "role": "Library Member",
-            "create": 0,
-            "read": 1,
-            "write": 0,
-            "delete": 0,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 0,
-            "export": 0,
-            "share": 0,
-            "print": 0,
-            "email": 0
-        },
-        {
-            "doctype": "Reservation",
-            "role": "Library Member",
-            "create": 1,
-            "read": 1,
-            "write": 1,  # Can create and cancel their own reservations
-            "delete": 0,
-            "submit": 0,
-            "cancel": 0,
-            "amend": 0,
-            "report": 0,
-            "export": 0,
-            "share": 0,
-            "print": 0,
-            "email": 0
-        }
-    ]
-    
-    all_permissions = librarian_permissions + member_permissions
-    
-    for perm_data in all_permissions:
-        # Check if permission already exists
-        existing_perm = frappe.db.exists(
-            "Custom DocPerm",
-            {
-                "parent": perm_data["doctype"],
-                "role": perm_data["role"]
-            }
-        )
-        
-        if not existing_perm:
-            perm = frappe.get_doc({
-                "doctype": "Custom DocPerm",
-                "parent": perm_data["doctype"],
-                **perm_data
-            })
-            perm.insert(ignore_permissions=True)
-
-# --- Scheduled Tasks for Library Management ---
-
-def setup_library_scheduled_tasks():
-    """Sets up scheduled tasks for the library management system."""
-    # Task to check for overdue books and send notifications
-    if not frappe.db.exists("Scheduled Job Type", "library.check_and_notify_overdue_books"):
-        frappe.get_doc({
-            "doctype": "Scheduled Job Type",
-            "method": "library_management_system.api.check_and_notify_overdue_books",
-            "frequency": "Daily",
-            "cron_format": "0 9 * * *",  # Run at 9 AM daily
-            "create_log": 1,
-            "last_execution": None,
-            "stopped": 0
-        }).insert(ignore_permissions=True)
-
-# --- App Installation Hook ---
-
-def after_install():
-    """Runs after the app is installed."""
-    create_library_roles()
-    setup_library_permissions()
-    setup_library_scheduled_tasks()
-
-# --- App Migration Hook ---
-
-def after_migrate():
-    """Runs after the app is migrated."""
-    create_library_roles()
-    setup_library_permissions()
-    setup_library_scheduled_tasks()
-
 # API Methods
 # -----------
 api_methods = {
@@ -474,6 +336,10 @@ api_methods = {
     "library_app.api.get_book": "GET",
     "library_app.api.update_book": "PUT", # Or use POST if you prefer simpler client-side calls
     "library_app.api.delete_book": "DELETE", # Or use POST
+    "library_app.api.search_books": "GET",
+    "library_app.api.import_books": "POST",
+    "library_app.api.get_book_availability": "GET",
+    "library_app.api.add_book_copies": "POST",
 
     # Member Management
     "library_app.api.get_members": "GET",
@@ -483,21 +349,37 @@ api_methods = {
     "library_app.api.delete_member": "DELETE",
     "library_app.api.get_member_by_user": "GET",
     "library_app.api.create_member_for_user": "POST",
+    "library_app.api.get_my_account": "GET",
+    "library_app.boot.get_boot_script": "GET",
 
     # Loan Management
     "library_app.api.create_loan": "POST",
     "library_app.api.return_book": "POST", # A custom action, so POST is appropriate
+    "library_app.api.create_loans_bulk": "POST",
+    "library_app.api.return_books_bulk": "POST",
     "library_app.api.get_loans": "GET",
     "library_app.api.get_loan": "GET",
 
     # Reports
+    "library_app.api.get_dashboard_stats": "GET",
     "library_app.api.get_books_on_loan_report": "GET",
     "library_app.api.get_overdue_books_report": "GET",
+    "library_app.api.get_circulation_trend": "GET",
+    "library_app.api.get_top_titles": "GET",
+    "library_app.api.get_dormant_members": "GET",
+    "library_app.api.export_member_loan_history": "GET",
+    "library_app.api.download_export": "GET",
+    "library_app.api.start_export": "POST",
+    "library_app.api.get_cache_stats": "GET",
+    "library_app.api.get_api_metrics": "GET",
+    "library_app.api.get_api_profile": "GET",
     
     "library_app.api.register_user": "POST",
+    "library_app.api.import_members": "POST",
 
     "library_app.api.list_all_users": "GET",
     "library_app.api.set_user_roles": "POST",
+    "library_app.api.set_user_roles_bulk": "POST",
     "library_app.api.reset_user_password": "POST",
     "library_app.api.get_loan_details": "GET",
     "library_app.api.get_reservation_details": "GET",
@@ -0,0 +1,214 @@
+# library_app/library_app/install.py
+import frappe
+from frappe.permissions import setup_custom_perms
+
+from library_app.instrumentation import logger
+
+# --- Roles and permissions ---
+#
+# ROLES and PERMISSIONS declare the library's roles and their permission
+# rows (permlevel 0) on the library DocTypes. sync() reads the current Role
+# and Custom DocPerm rows with one query each, diffs them against the spec
+# and creates what is missing: roles through the Role controller, permission
+# rows in one bulk insert. A migrate with nothing to create is two SELECTs.
+#
+# Rows that exist but differ from the spec (e.g. edited in the Role
+# Permission Manager) are only reported and logged; they are overwritten
+# with sync(force=True), i.e. `bench sync-library-permissions --force`.
+#
+# Custom DocPerm rows replace a DocType's standard permissions, so the first
+# time a DocType is customized its standard rows are copied over first
+# (frappe.permissions.setup_custom_perms, as the Role Permission Manager does).
+#
+# Runs after install and after every migrate (see hooks.py), and as
+#     bench --site your-site.com sync-library-permissions [--dry-run] [--force]
+
+ROLES = {
+    "Librarian": {"desk_access": 1, "disabled": 0},
+    # members use the SPA only
+    "Library Member": {"desk_access": 0, "disabled": 0},
+    "Library Manager": {"desk_access": 1, "disabled": 0},
+}
+
+PERM_FIELDS = (
+    "create", "read", "write", "delete", "submit", "cancel", "amend",
+    "report", "export", "share", "print", "email",
+)
+FULL_ACCESS = ("create", "read", "write", "delete", "report", "export", "share", "print", "email")
+
+# (DocType, role) -> the permissions granted; every other PERM_FIELD is 0
+PERMISSIONS = {
+    ("Book", "Librarian"): FULL_ACCESS,
+    ("Member", "Librarian"): FULL_ACCESS,
+    ("Loan", "Librarian"): FULL_ACCESS,
+    ("Reservation", "Librarian"): FULL_ACCESS,
+    ("Book", "Library Member"): ("read",),
+    # their own member record
+    ("Member", "Library Member"): ("read", "write"),
+    ("Loan", "Library Member"): ("read",),
+    # create and cancel their own reservations
+    ("Reservation", "Library Member"): ("create", "read", "write"),
+}
+
+
+def desired_permission(doctype, role):
+    granted = PERMISSIONS[(doctype, role)]
+    return {field: int(field in granted) for field in PERM_FIELDS}
+
+
+def diff_roles(existing):
+    """(missing, changed) roles given {role: {field: value}} of the spec's roles that exist."""
+    missing, changed = [], {}
+    for role, spec in ROLES.items():
+        if role not in existing:
+            missing.append(role)
+            continue
+        changes = {field: value for field, value in spec.items() if existing[role].get(field) != value}
+        if changes:
+            changed[role] = changes
+    return missing, changed
+
+
+def diff_permissions(existing):
+    """
+    (missing, changed) permission rows given the current permlevel-0
+    Custom DocPerm rows ({(doctype, role): row}). `missing` lists the
+    (doctype, role) keys to insert, `changed` maps row names to their updates.
+    """
+    missing, changed = [], {}
+    for key in PERMISSIONS:
+        desired = desired_permission(*key)
+        row = existing.get(key)
+        if not row:
+            missing.append(key)
+            continue
+        changes = {field: value for field, value in desired.items() if row[field] != value}
+        if changes:
+            changed[row["name"]] = changes
+    return missing, changed
+
+
+def read_roles():
+    return {
+        row.name: row for row in frappe.db.sql(
+            "SELECT name, desk_access, disabled FROM `tabRole` WHERE name IN %s",
+            (tuple(ROLES),),
+            as_dict=True,
+        )
+    }
+
+
+def read_permissions(doctypes):
+    """{(doctype, role): row} of the permlevel-0 rows, and the DocTypes with no Custom DocPerm at all."""
+    rows = frappe.db.sql(
+        f"""
+        SELECT name, parent, role, permlevel, if_owner, {", ".join(f"`{field}`" for field in PERM_FIELDS)}
+        FROM `tabCustom DocPerm`
+        WHERE parent IN %s
+        """,
+        (tuple(doctypes),),
+        as_dict=True,
+    )
+    customized = {row.parent for row in rows}
+    existing = {
+        (row.parent, row.role): row for row in rows
+        if not row.permlevel and not row.if_owner
+    }
+    return existing, [doctype for doctype in doctypes if doctype not in customized]
+
+
+def sync(dry_run=False, force=False):
+    """
+    Creates the roles and permission rows of ROLES and PERMISSIONS that are
+    missing and, with force, resets those that differ. Returns what changed
+    (or would change, with dry_run); "updated" lists the differences, which
+    were only written if "forced":
+    {"roles": {"created": [...], "updated": {...}},
+     "permissions": {"created": [...], "updated": {...}}, "customized": [...],
+     "forced": bool}
+    """
+    doctypes = sorted({doctype for doctype, _ in PERMISSIONS})
+    missing_roles, changed_roles = diff_roles(read_roles())
+    existing, uncustomized = read_permissions(doctypes)
+
+    if not dry_run:
+        # through the controller, which validates desk access and clears caches
+        for role in missing_roles:
+            frappe.get_doc({"doctype": "Role", "role_name": role, **ROLES[role]}).insert(ignore_permissions=True)
+        for role, changes in changed_roles.items() if force else ():
+            # Role.on_update updates the users' desk access
+            role_doc = frappe.get_doc("Role", role)
+            role_doc.update(changes)
+            role_doc.save(ignore_permissions=True)
+
+        if uncustomized:
+            for doctype in uncustomized:
+                setup_custom_perms(doctype)
+            existing, _ = read_permissions(doctypes)
+
+    missing, changed = diff_permissions(existing)
+    if not dry_run:
+        if missing:
+            insert_permissions(missing)
+        touched = {doctype for doctype, _ in missing} | set(uncustomized)
+        if force:
+            for name, changes in changed.items():
+                frappe.db.set_value("Custom DocPerm", name, changes, update_modified=False)
+            touched |= {row.parent for row in existing.values() if row.name in changed}
+        for doctype in touched:
+            frappe.clear_cache(doctype=doctype)
+
+    report = {
+        "roles": {"created": missing_roles, "updated": changed_roles},
+        "permissions": {
+            "created": [f"{doctype}: {role}" for doctype, role in missing],
+            "updated": {
+                f"{row.parent}: {row.role}": changed[row.name]
+                for row in existing.values() if row.name in changed
+            },
+        },
+        "customized": uncustomized,
+        "forced": force,
+    }
+    if missing_roles or missing or uncustomized or (force and (changed_roles or changed)):
+        logger().info({"event": "library_permissions_sync", "dry_run": dry_run, **report})
+    if not force and (changed_roles or changed):
+        logger().warning({
+            "event": "library_permissions_drift",
+            "roles": changed_roles,
+            "permissions": report["permissions"]["updated"],
+        })
+    return report
+
+
+def insert_permissions(keys):
+    now = frappe.utils.now_datetime()
+    user = frappe.session.user
+    next_idx = dict(frappe.db.sql(
+        "SELECT parent, MAX(idx) FROM `tabCustom DocPerm` WHERE parent IN %s GROUP BY parent",
+        (tuple({doctype for doctype, _ in keys}),),
+    ))
+    rows = []
+    for doctype, role in keys:
+        next_idx[doctype] = (next_idx.get(doctype) or 0) + 1
+        permission = desired_permission(doctype, role)
+        rows.append((
+            frappe.generate_hash(length=10), doctype, "DocType", "permissions", next_idx[doctype],
+            role, 0, 0, *(permission[field] for field in PERM_FIELDS), now, now, user, user,
+        ))
+    frappe.db.bulk_insert(
+        "Custom DocPerm",
+        ["name", "parent", "parenttype", "parentfield", "idx", "role", "permlevel", "if_owner",
+         *PERM_FIELDS, "creation", "modified", "owner", "modified_by"],
+        rows,
+    )
+
+
+# --- App hooks ---
+
+def after_install():
+    sync()
+
+
+def after_migrate():
+    sync()
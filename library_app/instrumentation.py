@@ -0,0 +1,249 @@
+# library_app/library_app/instrumentation.py
+import cProfile
+import io
+import pstats
+import random
+import time
+from collections import defaultdict
+
+import frappe
+from frappe.utils import cint, flt
+from werkzeug.wrappers import Response
+
+# --- Request instrumentation for the library API ---
+#
+# before_request / after_request hooks (see hooks.py) time every call to a
+# method listed in hooks.api_methods and record, per method and status:
+#
+#     requests, wall time (histogram), SQL queries, SQL time,
+#     rows returned and response bytes
+#
+# SQL is counted by wrapping frappe.db.sql for the duration of the request
+# (frappe.db is per request, so nothing leaks into other requests). Metrics
+# are summed in one Redis hash shared by every worker and exported in the
+# Prometheus text format by get_metrics_text().
+#
+# Profiling: a System Manager request sent with `X-Library-Profile: 1` is run
+# under cProfile with probability `library_profile_sample_rate` (site config,
+# default 0.1). The stats are kept for an hour under the id returned in the
+# `X-Library-Profile-Id` response header.
+
+METRICS_KEY = "library_app:api_metrics"
+PROFILE_KEY = "library_app:profile"
+PROFILE_HEADER = "X-Library-Profile"
+PROFILE_TTL = 60 * 60
+PROFILE_LINES = 40
+DEFAULT_PROFILE_SAMPLE_RATE = 0.1
+DEFAULT_SLOW_REQUEST_SECONDS = 1.0
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+# (field suffix, metric name, help), summed per method and status
+COUNTERS = (
+    ("count", "library_api_requests_total", "Requests served"),
+    ("sql_count", "library_api_sql_queries_total", "SQL queries issued"),
+    ("sql_seconds", "library_api_sql_seconds_total", "Time spent in SQL"),
+    ("rows", "library_api_rows_returned_total", "Rows returned in the response"),
+    ("bytes", "library_api_response_bytes_total", "Response body bytes"),
+)
+
+
+def logger():
+    return frappe.logger("library_app")
+
+
+def instrumented_methods():
+    return frappe.get_hooks("api_methods", app_name="library_app") or {}
+
+
+def requested_method():
+    path = frappe.request.path if getattr(frappe.local, "request", None) else ""
+    if "/method/" in path:
+        return path.split("/method/", 1)[1].strip("/")
+    return frappe.form_dict.get("cmd")
+
+
+# --- Hooks ---
+
+def before_request():
+    method = requested_method()
+    if not method or method not in instrumented_methods():
+        return
+
+    state = frappe._dict(method=method, sql_count=0, sql_seconds=0.0, profiler=None)
+    original_sql = frappe.db.sql
+
+    def sql(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return original_sql(*args, **kwargs)
+        finally:
+            state.sql_count += 1
+            state.sql_seconds += time.perf_counter() - start
+
+    frappe.db.sql = sql
+    state.restore_sql = lambda: setattr(frappe.db, "sql", original_sql)
+
+    if (
+        cint(frappe.get_request_header(PROFILE_HEADER))
+        and random.random() < profile_sample_rate()
+        and "System Manager" in frappe.get_roles()
+    ):
+        state.profiler = cProfile.Profile()
+        state.profiler.enable()
+
+    frappe.local.library_request = state
+    state.start = time.perf_counter()
+
+
+def after_request(response=None, request=None):
+    state = getattr(frappe.local, "library_request", None)
+    if not state:
+        return
+    frappe.local.library_request = None
+    elapsed = time.perf_counter() - state.start
+
+    if state.profiler:
+        state.profiler.disable()
+    if frappe.db:
+        state.restore_sql()
+
+    status = response.status_code if response is not None else 500
+    rows = count_rows(frappe.response.get("message"))
+    size = response_size(response)
+    record(state.method, status, elapsed, state.sql_count, state.sql_seconds, rows, size)
+
+    if state.profiler:
+        profile_id = save_profile(state.profiler, state.method)
+        if response is not None:
+            response.headers["X-Library-Profile-Id"] = profile_id
+
+    if elapsed >= slow_request_seconds():
+        logger().warning({
+            "event": "slow_request",
+            "method": state.method,
+            "status": status,
+            "seconds": round(elapsed, 4),
+            "sql_count": state.sql_count,
+            "sql_seconds": round(state.sql_seconds, 4),
+            "rows": rows,
+            "bytes": size,
+            "user": frappe.session.user,
+        })
+
+
+def profile_sample_rate():
+    rate = frappe.conf.get("library_profile_sample_rate")
+    return DEFAULT_PROFILE_SAMPLE_RATE if rate is None else flt(rate)
+
+
+def slow_request_seconds():
+    return flt(frappe.conf.get("library_slow_request_seconds")) or DEFAULT_SLOW_REQUEST_SECONDS
+
+
+def count_rows(message):
+    """Rows in an endpoint's return value: list length, a page's `data`, or 1 for a single record."""
+    if message is None:
+        return 0
+    if isinstance(message, list | tuple):
+        return len(message)
+    if isinstance(message, dict):
+        for key in ("data", "results"):
+            if isinstance(message.get(key), list | tuple):
+                return len(message[key])
+    return 1
+
+
+def response_size(response):
+    if response is None or getattr(response, "is_streamed", False):
+        return 0
+    return response.calculate_content_length() or 0
+
+
+# --- Metrics ---
+
+def metrics_key():
+    return frappe.cache.make_key(METRICS_KEY)
+
+
+def record(method, status, elapsed, sql_count, sql_seconds, rows, size):
+    prefix = f"{method}|{status}"
+    pipe = frappe.cache.pipeline()
+    key = metrics_key()
+    pipe.hincrby(key, f"{prefix}|count", 1)
+    pipe.hincrbyfloat(key, f"{prefix}|seconds", elapsed)
+    pipe.hincrby(key, f"{prefix}|sql_count", sql_count)
+    pipe.hincrbyfloat(key, f"{prefix}|sql_seconds", sql_seconds)
+    pipe.hincrby(key, f"{prefix}|rows", rows)
+    pipe.hincrby(key, f"{prefix}|bytes", size)
+    for bound in DURATION_BUCKETS:
+        if elapsed <= bound:
+            pipe.hincrby(key, f"{prefix}|le:{bound}", 1)
+    pipe.execute()
+
+
+def read_metrics(reset=False):
+    """{(method, status): {field: value}} from the shared hash."""
+    key = metrics_key()
+    # through a pipeline, like record(): RedisWrapper.hgetall would prefix the key again
+    pipe = frappe.cache.pipeline()
+    pipe.hgetall(key)
+    if reset:
+        pipe.delete(key)
+    raw = pipe.execute()[0]
+
+    metrics = defaultdict(dict)
+    for field, value in raw.items():
+        method, status, name = field.decode().split("|", 2)
+        metrics[(method, status)][name] = float(value)
+    return metrics
+
+
+def get_metrics_text(reset=False):
+    """All API metrics in the Prometheus text exposition format."""
+    metrics = read_metrics(reset)
+    lines = []
+
+    def labels(method, status, **extra):
+        pairs = {"method": method, "status": status, **extra}
+        return "{" + ",".join(f'{k}="{v}"' for k, v in pairs.items()) + "}"
+
+    lines += [
+        "# HELP library_api_request_seconds Wall time of library API requests",
+        "# TYPE library_api_request_seconds histogram",
+    ]
+    for (method, status), values in sorted(metrics.items()):
+        for bound in DURATION_BUCKETS:
+            lines.append(f"library_api_request_seconds_bucket{labels(method, status, le=bound)} {int(values.get(f'le:{bound}', 0))}")
+        lines.append(f"library_api_request_seconds_bucket{labels(method, status, le='+Inf')} {int(values.get('count', 0))}")
+        lines.append(f"library_api_request_seconds_sum{labels(method, status)} {values.get('seconds', 0)}")
+        lines.append(f"library_api_request_seconds_count{labels(method, status)} {int(values.get('count', 0))}")
+
+    for field, name, help_text in COUNTERS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for (method, status), values in sorted(metrics.items()):
+            value = values.get(field, 0)
+            lines.append(f"{name}{labels(method, status)} {value if field.endswith('seconds') else int(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+def metrics_response(reset=False):
+    return Response(get_metrics_text(reset), content_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# --- Profiles ---
+
+def save_profile(profiler, method):
+    out = io.StringIO()
+    out.write(f"{method}\n")
+    pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_LINES)
+    profile_id = frappe.generate_hash(length=12)
+    frappe.cache.set(frappe.cache.make_key(f"{PROFILE_KEY}:{profile_id}"), out.getvalue().encode(), ex=PROFILE_TTL)
+    return profile_id
+
+
+def get_profile(profile_id):
+    value = frappe.cache.get(frappe.cache.make_key(f"{PROFILE_KEY}:{profile_id}"))
+    if value is None:
+        frappe.throw(f"Profile '{profile_id}' not found or expired.", frappe.DoesNotExistError)
+    return value.decode()
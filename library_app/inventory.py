@@ -0,0 +1,297 @@
+# library_app/library_app/inventory.py
+import frappe
+from frappe.utils import cint, now_datetime
+
+from library_app.cache import invalidate
+from library_app.reservation_queue import next_in_line
+
+# --- Copies ---
+#
+# A Book is a title; each physical copy is a Book Copy. The Book keeps
+# total_copies and available_copies, so "is it on the shelf?" is one row
+# read, and its status is derived from them:
+#
+#     Available  at least one copy on the shelf
+#     Reserved   none on the shelf, and members are waiting in the queue or a
+#                copy is held for a completed reservation
+#     On Loan    none on the shelf and nobody waiting
+#
+# Copies are allocated and released while the Book row is locked, which
+# serializes circulation per title and keeps the counters exact. Counters are
+# written with SQL and never through a Book document (Book.before_save re-reads
+# them), so a Book loaded earlier can still be saved safely. Those writes
+# don't go through doc_events either, so they invalidate the read cache
+# themselves.
+
+COPY_COUNTERS = ["total_copies", "available_copies"]
+
+
+class BookUnavailable(frappe.ValidationError):
+    pass
+
+
+def title_status(available_copies, queue_length, held_copies=0):
+    if cint(available_copies) > 0:
+        return "Available"
+    return "Reserved" if cint(queue_length) > 0 or cint(held_copies) > 0 else "On Loan"
+
+
+def held_copies(books):
+    """{book: number of copies held on the shelf for a completed reservation} for `books`."""
+    if not books:
+        return {}
+    return dict(frappe.db.sql(
+        "SELECT book, COUNT(*) FROM `tabBook Copy` WHERE book IN %s AND status = 'Reserved' GROUP BY book",
+        (tuple(books),),
+    ))
+
+
+def lock_title(book):
+    """Title, ISBN, copy counters and queue length of `book`, with the Book row locked."""
+    row = frappe.db.get_value(
+        "Book",
+        book,
+        ["name", "title", "isbn", "status", *COPY_COUNTERS, "reservation_queue_length"],
+        as_dict=True,
+        for_update=True,
+    )
+    if not row:
+        frappe.throw(f"Book '{book}' not found.", frappe.DoesNotExistError)
+    return row
+
+
+def refresh_status(book):
+    """Saves the Book with its derived status when that changed (so stats, cache and search follow)."""
+    doc = frappe.get_doc("Book", book, for_update=True)
+    status = title_status(doc.available_copies, doc.reservation_queue_length, held_copies([book]).get(book))
+    if doc.status != status:
+        doc.status = status
+        doc.save(ignore_permissions=True)
+
+
+def copies_changed(book, total=0, available=0):
+    """Adds to the Book's copy counters and refreshes its status."""
+    frappe.db.sql(
+        """
+        UPDATE `tabBook`
+        SET total_copies = total_copies + %s, available_copies = available_copies + %s
+        WHERE name = %s
+        """,
+        (total, available, book),
+    )
+    invalidate("Book", [book])
+    refresh_status(book)
+
+
+def set_copy_status(copies, status):
+    if copies:
+        frappe.db.sql(
+            "UPDATE `tabBook Copy` SET status = %s, modified = %s WHERE name IN %s",
+            (status, now_datetime(), tuple(copies)),
+        )
+
+
+def add_copies(book, count=1, barcodes=None):
+    """Adds `count` copies of `book` to the shelf with one INSERT. Returns their names."""
+    barcodes = list(barcodes or [])
+    count = max(cint(count), len(barcodes))
+    if count <= 0:
+        return []
+
+    now = now_datetime()
+    user = frappe.session.user
+    names = [frappe.generate_hash(length=10) for _ in range(count)]
+    frappe.db.bulk_insert(
+        "Book Copy",
+        ["name", "book", "barcode", "status", "creation", "modified", "owner", "modified_by"],
+        [
+            (name, book, barcodes[i] if i < len(barcodes) else None, "Available", now, now, user, user)
+            for i, name in enumerate(names)
+        ],
+    )
+    copies_changed(book, total=count, available=count)
+    return names
+
+
+# --- Checkout and return ---
+
+def allocate_copy(book, member):
+    """
+    Takes a copy of `book` for `member`: the copy held for their completed
+    reservation if there is one, otherwise any copy on the shelf. Returns the
+    copy's name, or None when there is nothing to lend. The caller must hold
+    the Book row lock (lock_title).
+    """
+    held = frappe.db.sql(
+        """
+        SELECT copy.name
+        FROM `tabReservation` reservation
+        JOIN `tabBook Copy` copy ON copy.name = reservation.book_copy
+        WHERE reservation.book = %s AND reservation.member = %s
+            AND reservation.status = 'Completed' AND copy.status = 'Reserved'
+        LIMIT 1
+        FOR UPDATE
+        """,
+        (book, member),
+    )
+    if held:
+        copy = held[0][0]
+    else:
+        free = frappe.db.sql(
+            "SELECT name FROM `tabBook Copy` WHERE book = %s AND status = 'Available' LIMIT 1 FOR UPDATE",
+            (book,),
+        )
+        if not free:
+            return None
+        copy = free[0][0]
+        frappe.db.sql("UPDATE `tabBook` SET available_copies = available_copies - 1 WHERE name = %s", (book,))
+        invalidate("Book", [book])
+
+    set_copy_status([copy], "On Loan")
+    return copy
+
+
+def release_copy(book, copy=None):
+    """
+    Puts a returned copy back. If anyone is waiting it is held for the head of
+    the queue, whose reservation becomes Completed; otherwise it goes back on
+    the shelf. Returns the completed Reservation, or None.
+    """
+    lock_title(book)
+    if not copy:
+        # loans from before copies existed: any copy of the title that is out
+        copy = frappe.db.get_value("Book Copy", {"book": book, "status": "On Loan"}, "name")
+        if not copy:
+            return None
+
+    reservation = None
+    head = next_in_line(book)
+    if head:
+        set_copy_status([copy], "Reserved")
+        reservation = frappe.get_doc("Reservation", head.name)
+        reservation.status = "Completed"
+        reservation.book_copy = copy
+        reservation.save(ignore_permissions=True)
+    else:
+        set_copy_status([copy], "Available")
+        frappe.db.sql("UPDATE `tabBook` SET available_copies = available_copies + 1 WHERE name = %s", (book,))
+        invalidate("Book", [book])
+
+    refresh_status(book)
+    return reservation
+
+
+def get_availability(book):
+    """Copy counts, queue length and status of a title from its Book row."""
+    row = frappe.db.get_value(
+        "Book", book, ["name", "status", *COPY_COUNTERS, "reservation_queue_length"], as_dict=True
+    )
+    if not row:
+        frappe.throw(f"Book with ID '{book}' not found.", frappe.DoesNotExistError)
+    return row
+
+
+# --- Maintenance ---
+
+def recount_copies(books=None):
+    """Recomputes copy counters and the derived status of `books` (all books if None) from Book Copy."""
+    condition = "WHERE book.name IN %(books)s" if books else ""
+    frappe.db.sql(
+        f"""
+        UPDATE `tabBook` book
+        LEFT JOIN (
+            SELECT book, COUNT(*) AS total, SUM(status = 'Available') AS available,
+                SUM(status = 'Reserved') AS held
+            FROM `tabBook Copy`
+            GROUP BY book
+        ) copies ON copies.book = book.name
+        SET book.total_copies = COALESCE(copies.total, 0),
+            book.available_copies = COALESCE(copies.available, 0),
+            book.status = CASE
+                WHEN COALESCE(copies.available, 0) > 0 THEN 'Available'
+                WHEN book.reservation_queue_length > 0 OR COALESCE(copies.held, 0) > 0 THEN 'Reserved'
+                ELSE 'On Loan'
+            END
+        {condition}
+        """,
+        {"books": tuple(books or ())},
+    )
+
+
+def find_duplicate_titles():
+    """[[name, ...], ...]: Books sharing a title and author, oldest name first."""
+    rows = frappe.db.sql(
+        """
+        SELECT book.name, TRIM(book.title), TRIM(book.author)
+        FROM `tabBook` book
+        JOIN (
+            SELECT TRIM(title) AS title, TRIM(author) AS author
+            FROM `tabBook`
+            GROUP BY TRIM(title), TRIM(author)
+            HAVING COUNT(*) > 1
+        ) dup ON dup.title = TRIM(book.title) AND dup.author = TRIM(book.author)
+        ORDER BY TRIM(book.title), TRIM(book.author), book.creation, book.name
+        """
+    )
+    groups = {}
+    for name, title, author in rows:
+        groups.setdefault((title.lower(), author.lower()), []).append(name)
+    return list(groups.values())
+
+
+def merge_titles(keep, merge):
+    """
+    Folds the Books in `merge` into `keep`: their copies, loans and
+    reservations move over (copies keep the old Book ID as their barcode) and
+    the merged Books are deleted. Counters are recomputed; the caller commits.
+    """
+    from library_app.analytics import move_subjects
+    from library_app.loan_report import refresh_loans
+    from library_app.reservation_queue import renumber_queues
+
+    merge = tuple(merge)
+    frappe.db.sql(
+        "SELECT name FROM `tabBook` WHERE name IN %s ORDER BY name FOR UPDATE",
+        ((keep, *merge),),
+    )
+    # SET runs left to right, so barcode still sees the old book
+    frappe.db.sql(
+        "UPDATE `tabBook Copy` SET barcode = COALESCE(barcode, book), book = %s WHERE book IN %s",
+        (keep, merge),
+    )
+    loans = frappe.get_all("Loan", filters={"book": ["in", merge]}, pluck="name")
+    reservations = frappe.get_all("Reservation", filters={"book": ["in", merge]}, pluck="name")
+    frappe.db.sql("UPDATE `tabLoan` SET book = %s WHERE book IN %s", (keep, merge))
+    frappe.db.sql("UPDATE `tabReservation` SET book = %s WHERE book IN %s", (keep, merge))
+    frappe.db.sql("DELETE FROM `tabBook` WHERE name IN %s", (merge,))
+
+    renumber_queues([keep])
+    recount_copies([keep])
+    refresh_loans(loans)
+    move_subjects("Book", merge, keep)
+    invalidate("Book", [keep, *merge])
+    invalidate("Loan", loans)
+    invalidate("Reservation", reservations)
+
+
+def merge_duplicate_titles(dry_run=False):
+    """
+    Merges Books that are copies of one title (same title and author) into a
+    single Book each, keeping the oldest. One commit per title. Returns
+    [{"title", "kept", "merged"}]; nothing is changed with `dry_run`.
+    """
+    from library_app.stats import reconcile_counters
+
+    report = []
+    for names in find_duplicate_titles():
+        keep, merge = names[0], names[1:]
+        report.append({"title": frappe.db.get_value("Book", keep, "title"), "kept": keep, "merged": merge})
+        if dry_run:
+            continue
+        merge_titles(keep, merge)
+        frappe.db.commit()
+
+    if report and not dry_run:
+        reconcile_counters(fix=True)
+        frappe.enqueue("library_app.search.build_book_index", queue="long", timeout=4 * 60 * 60)
+    return report
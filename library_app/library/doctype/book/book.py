@@ -1,9 +1,38 @@
 # Copyright (c) 2025, Tewodros and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
+from frappe.utils import cint
+
+from library_app.inventory import COPY_COUNTERS, add_copies, refresh_status
+from library_app.reservation_queue import QUEUE_FIELDS
+from library_app.search import normalize_isbn
 
 
 class Book(Document):
-	pass
+	def validate(self):
+		# ISBNs are stored as typed; duplicate checks compare them without separators
+		self.isbn_compact = normalize_isbn(self.isbn)
+
+	def before_save(self):
+		if not self.is_new():
+			# copy and queue counters are maintained with SQL (see library_app.inventory
+			# and library_app.reservation_queue); never write back a stale copy of them
+			current = frappe.db.get_value("Book", self.name, [*COPY_COUNTERS, *QUEUE_FIELDS], as_dict=True, for_update=True)
+			if current:
+				self.update(current)
+
+	def after_insert(self):
+		# a new title comes with one copy unless the caller asks for another number
+		copies = 1 if self.flags.copies is None else cint(self.flags.copies)
+		if copies:
+			add_copies(self.name, copies)
+		else:
+			# nothing on the shelf yet
+			refresh_status(self.name)
+
+	def on_trash(self):
+		if frappe.db.exists("Book Copy", {"book": self.name, "status": "On Loan"}):
+			frappe.throw(f"Book '{self.name}' has copies on loan and cannot be deleted.")
+		frappe.db.delete("Book Copy", {"book": self.name})
@@ -1,9 +1,10 @@
 # Copyright (c) 2025, Tewodros and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests import IntegrationTestCase
 
+from library_app import pagination
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -12,6 +13,19 @@ EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
 
+def make_book(copies=1, **kwargs):
+	book = frappe.get_doc({
+		"doctype": "Book",
+		"title": "Test Book",
+		"author": "Test Author",
+		"publish_date": "2020-01-01",
+		"isbn": frappe.generate_hash(length=13),
+		"status": "Available",
+		**kwargs,
+	})
+	book.flags.copies = copies
+	return book.insert(ignore_permissions=True)
+
 
 class IntegrationTestBook(IntegrationTestCase):
 	"""
@@ -19,4 +33,43 @@ class IntegrationTestBook(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def test_book_pages_break_ties_on_name(self):
+		names = sorted(make_book(publish_date="1000-01-01").name for _ in range(5))
+		page = pagination.get_page("Book", page_length=2, order_by="publish_date asc", fields=["title"])
+		self.assertEqual([set(row) for row in page["data"]], [{"title"}, {"title"}])
+		self.assertTrue(page["has_more"])
+		self.assertEqual(
+			pagination.decode_cursor(page["next_cursor"], "publish_date", "asc"), ("1000-01-01", names[1])
+		)
+
+		seen, after = [], None
+		while len(seen) < len(names):
+			page = pagination.get_page("Book", after=after, page_length=2, order_by="publish_date asc", fields=["name"])
+			seen += [row.name for row in page["data"]]
+			after = page["next_cursor"]
+		self.assertEqual(seen[: len(names)], names)
+
+	def test_book_page_knows_when_it_is_the_last(self):
+		for _ in range(3):
+			make_book(publish_date="1000-01-02")
+		filters = {"publish_date": "1000-01-02"}
+
+		page = pagination.get_page("Book", page_length=3, filters=filters)
+		self.assertEqual((len(page["data"]), page["has_more"], page["next_cursor"]), (3, False, None))
+		page = pagination.get_page("Book", page_length=2, filters=filters)
+		self.assertEqual((len(page["data"]), page["has_more"]), (2, True))
+		page = pagination.get_page("Book", after=page["next_cursor"], page_length=2, filters=filters)
+		self.assertEqual((len(page["data"]), page["has_more"]), (1, False))
+
+	def test_book_pages_reject_unlisted_sorts_and_fields(self):
+		make_book(), make_book()
+		for kwargs in (
+			{"order_by": "isbn_compact"},
+			{"order_by": "title; DROP TABLE `tabBook`"},
+			{"order_by": "title sideways"},
+			{"fields": ["title", "isbn_compact"]},
+			{"after": "not-a-cursor"},
+			{"after": pagination.get_page("Book", page_length=1)["next_cursor"], "order_by": "title asc"},
+		):
+			with self.assertRaises(frappe.ValidationError):
+				pagination.get_page("Book", **kwargs)
@@ -0,0 +1,22 @@
+# Copyright (c) 2026, Tewodros and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+from library_app.inventory import copies_changed
+
+
+class BookCopy(Document):
+	def after_insert(self):
+		copies_changed(self.book, total=1, available=1 if self.status == "Available" else 0)
+
+	def on_trash(self):
+		if self.status == "On Loan":
+			frappe.throw(f"Book Copy '{self.name}' is on loan and cannot be deleted.")
+		copies_changed(self.book, total=-1, available=-1 if self.status == "Available" else 0)
+
+
+def on_doctype_update():
+	# (book, status): picking a free copy of a title at checkout
+	frappe.db.add_index("Book Copy", ["book", "status"])
@@ -0,0 +1,109 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from library_app import api
+from library_app.inventory import (
+	BookUnavailable,
+	add_copies,
+	find_duplicate_titles,
+	get_availability,
+	merge_titles,
+)
+from library_app.library.doctype.book.test_book import make_book
+from library_app.library.doctype.loan.test_loan import make_loan
+from library_app.library.doctype.member.test_member import make_member
+from library_app.library.doctype.reservation.test_reservation import make_reservation
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+
+def return_loan(loan):
+	doc = frappe.get_doc("Loan", loan)
+	doc.returned = 1
+	doc.save(ignore_permissions=True)
+	return doc
+
+
+class IntegrationTestBookCopy(IntegrationTestCase):
+	"""
+	Integration tests for BookCopy.
+	Use this class for testing interactions between multiple components.
+	"""
+
+	def availability(self, book):
+		row = get_availability(book)
+		return row.status, row.total_copies, row.available_copies
+
+	def test_each_copy_can_be_lent_once(self):
+		book = make_book(copies=3).name
+		loans = [make_loan(book=book) for _ in range(3)]
+
+		self.assertEqual(len({loan.book_copy for loan in loans}), 3)
+		self.assertEqual(self.availability(book), ("On Loan", 3, 0))
+		self.assertRaises(BookUnavailable, make_loan, book=book)
+
+		return_loan(loans[0].name)
+		self.assertEqual(self.availability(book), ("Available", 3, 1))
+
+	def test_added_copies_go_on_the_shelf(self):
+		book = make_book().name
+		make_loan(book=book)
+		self.assertEqual(self.availability(book), ("On Loan", 1, 0))
+
+		add_copies(book, 2, barcodes=["SHELF-1"])
+
+		self.assertEqual(self.availability(book), ("Available", 3, 2))
+		self.assertTrue(frappe.db.exists("Book Copy", {"book": book, "barcode": "SHELF-1"}))
+
+	def test_title_without_copies_is_not_available(self):
+		self.assertEqual(self.availability(make_book(copies=0).name), ("On Loan", 0, 0))
+
+	def test_cached_book_follows_the_copy_counters(self):
+		book = make_book(copies=2).name
+		self.assertEqual(api.get_book(book).available_copies, 2)
+
+		# the title stays Available, so only the counters change
+		make_loan(book=book)
+		self.assertEqual(api.get_book(book).available_copies, 1)
+
+	def test_returned_copy_is_held_for_the_queue(self):
+		book = make_book().name
+		loan = make_loan(book=book)
+		reservation = make_reservation(book)
+		self.assertEqual(self.availability(book), ("Reserved", 1, 0))
+
+		returned = return_loan(loan.name)
+
+		self.assertEqual(returned.flags.held_for.name, reservation.name)
+		self.assertEqual(frappe.db.get_value("Book Copy", loan.book_copy, "status"), "Reserved")
+		# the queue is empty, but the copy on the hold shelf keeps the title reserved
+		self.assertEqual(self.availability(book), ("Reserved", 1, 0))
+		# only the member the copy is held for can borrow it
+		self.assertRaises(BookUnavailable, make_loan, book=book)
+		self.assertEqual(make_loan(book=book, member=reservation.member).book_copy, loan.book_copy)
+		self.assertEqual(self.availability(book), ("On Loan", 1, 0))
+
+	def test_copy_on_loan_cannot_be_deleted(self):
+		loan = make_loan()
+		self.assertRaises(frappe.ValidationError, frappe.delete_doc, "Book Copy", loan.book_copy)
+
+	def test_duplicate_titles_are_merged(self):
+		title = f"Merge {frappe.generate_hash(length=8)}"
+		keep, other = make_book(title=title).name, make_book(title=title).name
+		loan = make_loan(book=other, member=make_member().name)
+
+		self.assertIn([keep, other], find_duplicate_titles())
+
+		merge_titles(keep, [other])
+
+		self.assertFalse(frappe.db.exists("Book", other))
+		self.assertEqual(frappe.db.get_value("Loan", loan.name, "book"), keep)
+		self.assertEqual(frappe.db.get_value("Book Copy", loan.book_copy, ["book", "barcode"]), (keep, other))
+		self.assertEqual(self.availability(keep), ("Available", 2, 1))
@@ -0,0 +1,18 @@
+# Copyright (c) 2026, Tewodros and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class CirculationRollup(Document):
+	pass
+
+
+def on_doctype_update():
+	# trends: the periods of one subject in a date range
+	frappe.db.add_index("Circulation Rollup", ["granularity", "dimension", "subject", "period"])
+	# top titles/members of a period
+	frappe.db.add_index("Circulation Rollup", ["granularity", "dimension", "period", "loans"])
+	# dormant members
+	frappe.db.add_index("Circulation Rollup", ["granularity", "dimension", "idle_since"])
@@ -0,0 +1,118 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, get_first_day, getdate, nowdate
+
+from library_app import analytics, api
+from library_app.circulation import checkout_many, return_many
+from library_app.library.doctype.book.test_book import make_book
+from library_app.library.doctype.loan.test_loan import make_loan
+from library_app.library.doctype.member.test_member import make_member
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+
+def rollups(*subjects):
+	return {
+		row.name: (row.loans, row.returns, row.loan_days, row.overdue_returns, row.last_loan_on)
+		for row in frappe.get_all(
+			"Circulation Rollup",
+			filters={"subject": ["in", subjects]},
+			fields=["name", "loans", "returns", "loan_days", "overdue_returns", "last_loan_on"],
+		)
+		if row.loans or row.returns
+	}
+
+
+class IntegrationTestCirculationRollup(IntegrationTestCase):
+	"""
+	Integration tests for CirculationRollup.
+	Use this class for testing interactions between multiple components.
+	"""
+
+	def test_incremental_rollups_match_rebuild(self):
+		member = make_member().name
+		books = [make_book().name for _ in range(4)]
+		early = make_loan(books[0], member, loan_date=add_days(nowdate(), -40), return_date=add_days(nowdate(), -26))
+		early.returned = 1
+		early.save()
+		make_loan(books[1], member, loan_date=add_days(nowdate(), -3))
+		make_loan(books[2], member).delete()
+		checkout_many(member, [books[2], books[3]], nowdate(), add_days(nowdate(), 14))
+		bulk = frappe.get_all("Loan", filters={"book": books[3], "returned": 0}, pluck="name")
+		return_many(bulk)
+
+		incremental = rollups(member, *books)
+		analytics.rebuild(commit=False)
+		self.assertEqual(incremental, rollups(member, *books))
+		self.assertEqual(analytics.totals("Member", member)["loans"], 4)
+		self.assertEqual(analytics.totals("Member", member)["returns"], 2)
+
+	def test_trend_top_titles_and_dormant_members(self):
+		popular, quiet = make_book().name, make_book().name
+		month = get_first_day(add_days(nowdate(), -60))
+		for day in range(3):
+			loan = make_loan(popular, loan_date=add_days(month, day), return_date=add_days(month, day + 1))
+			loan.returned_on = add_days(month, day + 3)
+			loan.returned = 1
+			loan.save()
+		idle = make_member().name
+		make_loan(quiet, idle, loan_date=add_days(nowdate(), -400))
+
+		trend = api.get_circulation_trend("Day", month, add_days(month, 5), book=popular)
+		self.assertEqual([row["loans"] for row in trend["periods"]], [1, 1, 1, 0, 0, 0])
+		self.assertEqual([row["returns"] for row in trend["periods"]], [0, 0, 0, 1, 1, 1])
+		self.assertEqual(trend["totals"]["average_loan_days"], 3)
+		self.assertEqual(trend["totals"]["overdue_rate"], 1)
+
+		top = api.get_top_titles(month=add_days(month, 10), limit=500)
+		self.assertEqual(next(row for row in top if row["book_id"] == popular)["loans"], 3)
+		self.assertNotIn(quiet, [row["book_id"] for row in top])
+
+		never = make_member().name
+		seeded = analytics.rollup_name("Total", analytics.TOTAL_PERIOD, "Member", never)
+		self.assertEqual(getdate(frappe.db.get_value("Circulation Rollup", seeded, "idle_since")), getdate(nowdate()))
+		# joined long ago
+		frappe.db.set_value("Circulation Rollup", seeded, "idle_since", add_days(nowdate(), -500))
+		recent = make_member().name
+		dormant = {row["member"]: row for row in api.get_dormant_members(days=365, limit=500)}
+		self.assertEqual(getdate(dormant[idle]["last_loan_on"]), getdate(add_days(nowdate(), -400)))
+		self.assertEqual((dormant[never]["last_loan_on"], dormant[never]["loans"]), (None, 0))
+		self.assertNotIn(recent, dormant)
+
+		with self.assertRaises(frappe.ValidationError):
+			api.get_circulation_trend("Day", add_days(nowdate(), -400), nowdate())
+
+	def test_library_wide_rollups_are_applied_after_commit(self):
+		analytics.flush_pending(commit=False)
+		before = analytics.totals()["loans"]
+
+		make_loan(make_book().name, loan_date=add_days(nowdate(), -1))
+		# the All rows are not touched inside the loan's transaction
+		self.assertEqual(analytics.totals()["loans"], before)
+
+		frappe.db.after_commit.run()
+		analytics.flush_pending(commit=False)
+		totals = analytics.totals()
+		self.assertEqual(totals["loans"], before + 1)
+		self.assertGreaterEqual(getdate(totals["last_loan_on"]), getdate(add_days(nowdate(), -1)))
+
+	def test_rebuild_keeps_members_who_never_borrowed(self):
+		never = make_member().name
+		analytics.rebuild(commit=False)
+		row = frappe.db.get_value(
+			"Circulation Rollup",
+			analytics.rollup_name("Total", analytics.TOTAL_PERIOD, "Member", never),
+			["loans", "last_loan_on", "idle_since"],
+			as_dict=True,
+		)
+		self.assertEqual((row.loans, row.last_loan_on, getdate(row.idle_since)), (0, None, getdate(nowdate())))
+
+		frappe.delete_doc("Member", never)
+		self.assertFalse(frappe.db.exists("Circulation Rollup", {"dimension": "Member", "subject": never}))
@@ -0,0 +1,14 @@
+# Copyright (c) 2026, Tewodros and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LibraryNotification(Document):
+	pass
+
+
+def on_doctype_update():
+	# the retry job picks due notices by status and next attempt
+	frappe.db.add_index("Library Notification", ["status", "next_attempt_at"])
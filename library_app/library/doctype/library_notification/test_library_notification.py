@@ -0,0 +1,123 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+import time
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_to_date, now_datetime
+
+from library_app import api, notifications
+from library_app.library.doctype.book.test_book import make_book
+from library_app.library.doctype.loan.test_loan import make_loan
+from library_app.library.doctype.member.test_member import make_member
+from library_app.library.doctype.reservation.test_reservation import make_reservation
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+SMTP_DELAY = 2
+
+
+class SMTPStub:
+	"""Stands in for frappe.sendmail talking to a mail relay: slow, and failing when told to."""
+
+	def __init__(self, delay=0, fail=False):
+		self.delay, self.fail, self.sent = delay, fail, []
+
+	def __call__(self, recipients=None, subject=None, **kwargs):
+		time.sleep(self.delay)
+		if self.fail:
+			raise ConnectionRefusedError("SMTP relay unavailable")
+		self.sent.append((recipients, subject))
+
+
+class IntegrationTestLibraryNotification(IntegrationTestCase):
+	"""
+	Integration tests for LibraryNotification.
+	Use this class for testing interactions between multiple components.
+	"""
+
+	def test_return_does_not_wait_for_a_slow_mail_server(self):
+		book = make_book().name
+		loan = make_loan(book=book)
+		reservation = make_reservation(book)
+		smtp, jobs = SMTPStub(delay=SMTP_DELAY), []
+
+		with patch("frappe.sendmail", smtp), patch("frappe.enqueue", lambda method, **kwargs: jobs.append((method, kwargs))), patch("frappe.db.commit"):
+			start = time.perf_counter()
+			api.return_book(loan.name)
+			elapsed = time.perf_counter() - start
+
+		self.assertLess(elapsed, SMTP_DELAY / 2)
+		self.assertEqual(smtp.sent, [])
+		notices = [kwargs for method, kwargs in jobs if method.endswith("deliver_reservation_notice")]
+		self.assertEqual(len(notices), 1)
+		self.assertEqual(
+			{key: notices[0][key] for key in ("member", "book_title", "reservation")},
+			{"member": reservation.member, "book_title": "Test Book", "reservation": reservation.name},
+		)
+
+	def test_failed_send_is_retried_then_dead_lettered(self):
+		member = make_member().name
+		with patch("frappe.sendmail", SMTPStub(fail=True)):
+			notifications.deliver_reservation_notice(member, "Retry Me")
+
+		notice = frappe.get_last_doc("Library Notification", filters={"member": member})
+		self.assertEqual((notice.status, notice.attempts), ("Retrying", 1))
+		self.assertGreater(notice.next_attempt_at, now_datetime())
+
+		with patch("frappe.sendmail", SMTPStub(fail=True)):
+			for _ in range(notifications.max_attempts() - 1):
+				frappe.db.set_value("Library Notification", notice.name, "next_attempt_at", add_to_date(now_datetime(), seconds=-1))
+				notifications.retry_notifications()
+
+		notice.reload()
+		self.assertEqual((notice.status, notice.attempts), ("Dead", notifications.max_attempts()))
+
+	def test_retry_sends_once_the_relay_is_back(self):
+		member = make_member().name
+		with patch("frappe.sendmail", SMTPStub(fail=True)):
+			notifications.deliver_reservation_notice(member, "Second Try")
+		notice = frappe.get_last_doc("Library Notification", filters={"member": member})
+		frappe.db.set_value("Library Notification", notice.name, "next_attempt_at", add_to_date(now_datetime(), seconds=-1))
+
+		smtp = SMTPStub()
+		with patch("frappe.sendmail", smtp):
+			notifications.retry_notifications()
+
+		self.assertEqual(len(smtp.sent), 1)
+		self.assertEqual(frappe.db.get_value("Library Notification", notice.name, "status"), "Sent")
+
+	def test_failed_email_is_not_left_for_the_email_flush(self):
+		member = make_member().name
+		queued = []
+
+		def sendmail(recipients=None, subject=None, **kwargs):
+			# frappe.sendmail(now=True) doesn't raise on SMTP errors: the row stays "Not Sent"
+			doc = frappe.get_doc({
+				"doctype": "Email Queue",
+				"sender": "library@example.com",
+				"message": subject,
+				"status": "Not Sent",
+				"error": "SMTP relay unavailable",
+				"recipients": [{"recipient": recipients[0]}],
+			}).insert(ignore_permissions=True)
+			queued.append(doc.name)
+			return doc
+
+		with patch("frappe.sendmail", sendmail):
+			notifications.deliver_reservation_notice(member, "Sent Once")
+
+		self.assertFalse(frappe.db.exists("Email Queue", queued[0]))
+		self.assertFalse(frappe.db.exists("Email Queue Recipient", {"parent": queued[0]}))
+		notice = frappe.get_last_doc("Library Notification", filters={"member": member})
+		self.assertEqual((notice.status, notice.last_error), ("Retrying", "SMTP relay unavailable"))
+
+	def test_backoff_doubles_up_to_the_cap(self):
+		self.assertEqual([notifications.retry_delay(n) for n in (1, 2, 3)], [60, 120, 240])
+		self.assertEqual(notifications.retry_delay(20), notifications.RETRY_MAX_SECONDS)
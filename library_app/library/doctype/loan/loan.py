@@ -1,9 +1,56 @@
 # Copyright (c) 2025, Tewodros and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
+from frappe.utils import nowdate
+
+from library_app.inventory import BookUnavailable, allocate_copy, lock_title, refresh_status, release_copy
 
 
 class Loan(Document):
-	pass
+	def before_insert(self):
+		if self.returned or self.book_copy:
+			return
+		book = lock_title(self.book)
+		self.book_copy = allocate_copy(self.book, self.member)
+		if not self.book_copy:
+			frappe.throw(f"Book '{book.title}' (ISBN: {book.isbn}) is already on loan.", BookUnavailable)
+
+	def after_insert(self):
+		if self.book_copy and not self.returned:
+			refresh_status(self.book)
+
+	def before_save(self):
+		previous = self.get_doc_before_save()
+		self.flags.releasing = bool(previous and not previous.returned and self.returned)
+		if not self.returned:
+			self.returned_on = None
+		elif not self.returned_on:
+			self.returned_on = nowdate()
+
+	def on_update(self):
+		if self.flags.releasing:
+			self.flags.releasing = False
+			# the reservation the copy is now held for, if any
+			self.flags.held_for = release_copy(self.book, self.book_copy)
+
+	def on_trash(self):
+		if not self.returned:
+			release_copy(self.book, self.book_copy)
+
+
+def on_doctype_update():
+	# (returned, return_date, overdue): overdue marking and the overdue report
+	frappe.db.add_index("Loan", ["returned", "return_date", "overdue"])
+	# (book, member, returned): "already on loan" checks in create_loan/create_reservation
+	frappe.db.add_index("Loan", ["book", "member", "returned"])
+	# member: my loans and loan history export
+	frappe.db.add_index("Loan", ["member"])
+	# overdue digests pick members with overdue loans not yet notified
+	frappe.db.add_index("Loan", ["overdue", "returned", "overdue_notified_on", "member"])
+	# book_copy: the open loan of a copy
+	frappe.db.add_index("Loan", ["book_copy"])
+	# loan_date / returned_on: month-by-month circulation analytics backfill
+	frappe.db.add_index("Loan", ["loan_date"])
+	frappe.db.add_index("Loan", ["returned_on"])
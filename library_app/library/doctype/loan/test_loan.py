@@ -1,9 +1,19 @@
 # Copyright (c) 2025, Tewodros and Contributors
 # See license.txt
 
-# import frappe
+import threading
+from collections import Counter
+
+import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, nowdate
 
+from library_app import api
+from library_app.circulation import checkout_many, return_many
+from library_app.exports import site_connection
+from library_app.library.doctype.book.test_book import make_book
+from library_app.library.doctype.member.test_member import make_library_member, make_member
+from library_app.overdue import mark_overdue_loans
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -12,6 +22,17 @@ EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
 
+def make_loan(book=None, member=None, **kwargs):
+	loan = frappe.get_doc({
+		"doctype": "Loan",
+		"book": book or make_book().name,
+		"member": member or make_member().name,
+		"loan_date": nowdate(),
+		"return_date": add_days(nowdate(), 14),
+		**kwargs,
+	})
+	return loan.insert(ignore_permissions=True)
+
 
 class IntegrationTestLoan(IntegrationTestCase):
 	"""
@@ -19,4 +40,150 @@ class IntegrationTestLoan(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def test_loan_details_follow_linked_writes(self):
+		loan = make_loan()
+		details = api.get_loan_details(loan.name)
+		self.assertEqual(details["book"].title, "Test Book")
+
+		book = frappe.get_doc("Book", loan.book)
+		book.title = "Retitled"
+		book.save()
+		member = frappe.get_doc("Member", loan.member)
+		member.member_name = "Renamed Member"
+		member.save()
+
+		details = api.get_loan_details(loan.name)
+		self.assertEqual(details["book"].title, "Retitled")
+		self.assertEqual(details["member"].member_name, "Renamed Member")
+
+	def test_overdue_marking_invalidates_cached_loans(self):
+		loan = make_loan(loan_date=add_days(nowdate(), -20), return_date=add_days(nowdate(), -6))
+		self.assertFalse(api.get_loan(loan.name).overdue)
+		api.get_loans(page_length=5, order_by="creation desc")
+
+		mark_overdue_loans(commit=False)
+
+		self.assertTrue(api.get_loan(loan.name).overdue)
+		page = api.get_loans(page_length=5, order_by="creation desc")
+		self.assertTrue(next(row for row in page["data"] if row.name == loan.name).overdue)
+
+	def test_loan_list_follows_book_title(self):
+		loan = make_loan()
+		api.get_loans(page_length=5, order_by="creation desc")
+
+		book = frappe.get_doc("Book", loan.book)
+		book.title = "Joined Title"
+		book.save()
+
+		page = api.get_loans(page_length=5, order_by="creation desc")
+		self.assertEqual(next(row for row in page["data"] if row.name == loan.name).book_title, "Joined Title")
+
+	def test_members_list_only_their_own_loans(self):
+		user, member = make_library_member()
+		mine = make_loan(member=member).name
+		other = make_loan().name
+		# cached for a user who sees everything first
+		self.assertIn(other, [loan.name for loan in api.get_loans()])
+
+		with self.set_user(user):
+			self.assertEqual([loan.name for loan in api.get_loans()], [mine])
+			page = api.get_loans(page_length=50)
+		self.assertEqual([loan.name for loan in page["data"]], [mine])
+
+	def test_basket_checkout_reports_each_item(self):
+		member = make_member().name
+		free, lent = make_book(), make_book()
+		make_loan(book=lent.name)
+
+		results = checkout_many(member, [free.name, lent.name, "BOOK-MISSING"], nowdate(), add_days(nowdate(), 14))
+
+		self.assertEqual([r["ok"] for r in results], [True, False, False])
+		self.assertEqual(frappe.db.get_value("Book", free.name, "status"), "On Loan")
+		self.assertEqual(frappe.db.get_value("Loan", results[0]["loan"], ["book", "member", "returned"]), (free.name, member, 0))
+
+	def test_basket_return_hands_books_to_reservations(self):
+		reserved, plain = make_book(), make_book()
+		loans = [make_loan(book=reserved.name).name, make_loan(book=plain.name).name]
+		reservation = frappe.get_doc({
+			"doctype": "Reservation",
+			"book": reserved.name,
+			"member": make_member().name,
+			"reserve_date": nowdate(),
+			"status": "Pending",
+		}).insert(ignore_permissions=True)
+
+		results = return_many([*loans, loans[0]])
+
+		self.assertEqual([r["ok"] for r in results], [True, True, False])
+		self.assertEqual(results[0]["reservation"], reservation.name)
+		self.assertEqual(frappe.db.get_value("Book", reserved.name, "status"), "Reserved")
+		self.assertEqual(frappe.db.get_value("Book", plain.name, "status"), "Available")
+		self.assertEqual(frappe.db.get_value("Reservation", reservation.name, "status"), "Completed")
+		self.assertTrue(api.get_loan(loans[1]).returned)
+
+
+class TestConcurrentCheckout(IntegrationTestCase):
+	"""Fires checkouts from many threads, each with its own database connection."""
+
+	BOOKS = 100
+	MEMBERS = 20
+	CHECKOUTS = 1000
+	THREADS = 20
+
+	def setUp(self):
+		self.books = [make_book().name for _ in range(self.BOOKS)]
+		self.members = [make_member().name for _ in range(self.MEMBERS)]
+		# the worker threads only see committed data
+		frappe.db.commit()
+
+	def tearDown(self):
+		frappe.db.rollback()
+		for loan in frappe.get_all("Loan", filters={"book": ["in", self.books]}, pluck="name"):
+			frappe.delete_doc("Loan", loan, force=True)
+		for book in self.books:
+			frappe.delete_doc("Book", book, force=True)
+		for member in self.members:
+			frappe.delete_doc("Member", member, force=True)
+		frappe.db.commit()
+
+	def test_no_book_is_lent_twice(self):
+		site = frappe.local.site
+		attempts = [
+			(self.books[i % self.BOOKS], self.members[i % self.MEMBERS]) for i in range(self.CHECKOUTS)
+		]
+		start = threading.Barrier(self.THREADS)
+		lent, refused, failed = [], [], []
+
+		def worker(chunk):
+			with site_connection(site, "Administrator"):
+				start.wait()
+				for book, member in chunk:
+					try:
+						api.create_loan(book, member, nowdate(), add_days(nowdate(), 14))
+						lent.append(book)
+					except frappe.ValidationError:
+						refused.append(book)
+					except Exception as e:
+						frappe.db.rollback()
+						failed.append(repr(e))
+
+		threads = [
+			threading.Thread(target=worker, args=(attempts[i :: self.THREADS],)) for i in range(self.THREADS)
+		]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+
+		self.assertEqual(failed, [])
+		self.assertEqual(len(lent) + len(refused), self.CHECKOUTS)
+		self.assertEqual(sorted(lent), sorted(self.books))
+
+		open_loans = Counter(
+			frappe.get_all("Loan", filters={"book": ["in", self.books], "returned": 0}, pluck="book")
+		)
+		self.assertEqual(max(open_loans.values()), 1)
+		self.assertEqual(len(open_loans), self.BOOKS)
+		self.assertEqual(
+			set(frappe.get_all("Book", filters={"name": ["in", self.books]}, pluck="status")), {"On Loan"}
+		)
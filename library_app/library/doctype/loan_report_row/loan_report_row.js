@@ -0,0 +1,8 @@
+// Copyright (c) 2026, Tewodros and contributors
+// For license information, please see license.txt
+
+// frappe.ui.form.on("Loan Report Row", {
+// 	refresh(frm) {
+
+// 	},
+// });
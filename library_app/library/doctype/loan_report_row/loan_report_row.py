@@ -0,0 +1,17 @@
+# Copyright (c) 2026, Tewodros and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+
+
+class LoanReportRow(Document):
+	pass
+
+
+def on_doctype_update():
+	# one index per sortable column, with name as the keyset tie-breaker
+	for column in ("loan_date", "return_date", "book_title", "member_name"):
+		frappe.db.add_index("Loan Report Row", [column, "name"])
+	frappe.db.add_index("Loan Report Row", ["book"])
+	frappe.db.add_index("Loan Report Row", ["member"])
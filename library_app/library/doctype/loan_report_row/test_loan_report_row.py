@@ -0,0 +1,75 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, nowdate
+
+from library_app import api
+from library_app.circulation import return_many
+from library_app.library.doctype.loan.test_loan import make_loan
+from library_app.loan_report import rebuild
+
+# On IntegrationTestCase, the doctype test records and all
+# link-field test record dependencies are recursively loaded
+# Use these module variables to add/remove to/from that list
+EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
+
+
+def overdue_loan(days=6):
+	return make_loan(loan_date=add_days(nowdate(), -14 - days), return_date=add_days(nowdate(), -days))
+
+
+class IntegrationTestLoanReportRow(IntegrationTestCase):
+	"""
+	Integration tests for LoanReportRow.
+	Use this class for testing interactions between multiple components.
+	"""
+
+	def report_ids(self, report, **kwargs):
+		return [row["loan_id"] for row in report(**kwargs)]
+
+	def test_report_follows_loans_and_returns(self):
+		current, late = make_loan(), overdue_loan()
+		on_loan = self.report_ids(api.get_books_on_loan_report)
+		self.assertIn(current.name, on_loan)
+		self.assertIn(late.name, on_loan)
+		overdue = self.report_ids(api.get_overdue_books_report)
+		self.assertIn(late.name, overdue)
+		self.assertNotIn(current.name, overdue)
+
+		return_many([late.name])
+		frappe.delete_doc("Loan", current.name)
+
+		on_loan = self.report_ids(api.get_books_on_loan_report)
+		self.assertNotIn(current.name, on_loan)
+		self.assertNotIn(late.name, on_loan)
+
+	def test_report_rows_follow_title_and_member_changes(self):
+		loan = overdue_loan()
+		book = frappe.get_doc("Book", loan.book)
+		book.title = "Report Title"
+		book.save()
+		member = frappe.get_doc("Member", loan.member)
+		member.email = f"{frappe.generate_hash(length=8)}@example.com"
+		member.save()
+
+		row = next(row for row in api.get_overdue_books_report() if row["loan_id"] == loan.name)
+		self.assertEqual((row["book_title"], row["member_email"]), ("Report Title", member.email))
+
+	def test_report_pages_cover_every_row_once(self):
+		loans = {overdue_loan(days).name for days in range(1, 8)}
+		rebuild()
+
+		seen, after = [], None
+		while True:
+			page = api.get_overdue_books_report(after=after, page_length=3, order_by="return_date asc")
+			seen.extend(row["loan_id"] for row in page["data"])
+			if not page["has_more"]:
+				break
+			after = page["next_cursor"]
+
+		self.assertEqual(len(seen), len(set(seen)))
+		self.assertTrue(loans <= set(seen))
+		self.assertEqual(sorted(seen), sorted(self.report_ids(api.get_overdue_books_report)))
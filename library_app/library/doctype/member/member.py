@@ -1,9 +1,14 @@
 # Copyright (c) 2025, Tewodros and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
 
 class Member(Document):
 	pass
+
+
+def on_doctype_update():
+	# user: session user -> member lookups (email already has a unique index)
+	frappe.db.add_index("Member", ["user"])
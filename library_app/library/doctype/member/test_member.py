@@ -1,9 +1,18 @@
 # Copyright (c) 2025, Tewodros and Contributors
 # See license.txt
 
-# import frappe
+import csv
+import json
+import os
+import tempfile
+from unittest.mock import patch
+
+import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, nowdate
+from frappe.utils.password import check_password
 
+from library_app import api, boot, cache, install, onboarding
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -12,6 +21,47 @@ EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
 
+def make_member(**kwargs):
+	key = frappe.generate_hash(length=10)
+	member = frappe.get_doc({
+		"doctype": "Member",
+		"member_name": "Test Member",
+		"membership_id": f"TM-{key}",
+		"email": f"{key}@example.com",
+		"phone": "0900000000",
+		**kwargs,
+	})
+	return member.insert(ignore_permissions=True)
+
+
+def make_user():
+	return frappe.get_doc({
+		"doctype": "User",
+		"email": f"{frappe.generate_hash(length=10)}@example.com",
+		"first_name": "Reader",
+		"send_welcome_email": 0,
+	}).insert(ignore_permissions=True).name
+
+
+def make_library_member():
+	"""A Library Member user restricted (by a User Permission) to their own Member."""
+	user = make_user()
+	frappe.get_doc("User", user).add_roles("Library Member")
+	member = make_member(user=user).name
+	frappe.get_doc({
+		"doctype": "User Permission", "user": user, "allow": "Member", "for_value": member,
+	}).insert(ignore_permissions=True)
+	return user, member
+
+
+def write_roster(rows):
+	fd, path = tempfile.mkstemp(suffix=".csv")
+	with os.fdopen(fd, "w", newline="") as f:
+		writer = csv.DictWriter(f, fieldnames=["email", "full_name", "phone", "role", "password"])
+		writer.writeheader()
+		writer.writerows(rows)
+	return path
+
 
 class IntegrationTestMember(IntegrationTestCase):
 	"""
@@ -19,4 +69,204 @@ class IntegrationTestMember(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def test_get_member_is_fresh_after_save(self):
+		member = make_member(phone="0911111111")
+		self.assertEqual(api.get_member(member.name).phone, "0911111111")
+
+		member.phone = "0922222222"
+		member.save()
+		self.assertEqual(api.get_member(member.name).phone, "0922222222")
+
+	def test_member_list_is_fresh_after_insert(self):
+		api.get_members(page_length=5, order_by="creation desc")
+		member = make_member()
+		page = api.get_members(page_length=5, order_by="creation desc")
+		self.assertEqual(page["data"][0].name, member.name)
+
+	def test_my_account_in_one_call(self):
+		from library_app.library.doctype.book.test_book import make_book
+		from library_app.library.doctype.loan.test_loan import make_loan
+		from library_app.library.doctype.reservation.test_reservation import make_reservation
+
+		user = make_user()
+		member = make_member(user=user).name
+		late = make_loan(member=member, loan_date=add_days(nowdate(), -20), return_date=add_days(nowdate(), -6))
+		history = [make_loan(member=member, loan_date=add_days(nowdate(), -40 - i)) for i in range(3)]
+		for loan in history:
+			frappe.db.set_value("Loan", loan.name, "returned", 1)
+		waiting = make_book(copies=0).name
+		make_reservation(waiting)
+		reservation = make_reservation(waiting, member=member)
+
+		with self.set_user(user):
+			account = api.get_my_account(history_length=2)
+			rest = api.get_my_account(history_after=account["history"]["next_cursor"], history_length=2)
+
+		self.assertEqual(account["member"]["name"], member)
+		self.assertEqual([loan.name for loan in account["active_loans"]], [late.name])
+		self.assertEqual(account["overdue_count"], 1)
+		self.assertEqual(
+			[loan.name for loan in account["history"]["data"] + rest["history"]["data"]],
+			[loan.name for loan in history],
+		)
+		self.assertFalse(rest["history"]["has_more"])
+		self.assertEqual([(r.name, r.queue_position) for r in account["reservations"]], [(reservation.name, 2)])
+
+	def test_user_member_mapping_follows_member_user(self):
+		first, second = make_user(), make_user()
+		member = make_member(user=first)
+		self.assertEqual(cache.get_member_for_user(first), member.name)
+		self.assertIsNone(cache.get_member_for_user(second))
+
+		member.user = second
+		member.save()
+
+		self.assertIsNone(cache.get_member_for_user(first))
+		self.assertEqual(cache.get_member_for_user(second), member.name)
+
+	def test_roster_onboarding_dedupes_and_links(self):
+		key = frappe.generate_hash(length=8)
+		existing_member = make_member()
+		existing_user = make_user()
+		# a User with a mixed-case name, as older sites and imports have
+		mixed_user = f"Mixed-{key}@Example.com"
+		frappe.db.sql("UPDATE `tabUser` SET name = %s, email = %s WHERE name = %s", (mixed_user, mixed_user, make_user()))
+		# a User that already has a Member under another email
+		member_user = make_user()
+		make_member(user=member_user)
+		path = write_roster([
+			{"email": f"new-{key}@example.com", "full_name": "New Reader", "phone": "1", "password": "Roster-Pass-123"},
+			{"email": f"NEW-{key}@example.com", "full_name": "Same Reader", "phone": "2"},
+			{"email": existing_member.email, "full_name": "Already Member", "phone": "3"},
+			{"email": existing_user, "full_name": "Has Account", "phone": "4"},
+			{"email": f"staff-{key}@example.com", "full_name": "Staff Person", "phone": "5", "role": "Librarian"},
+			{"email": "not-an-email", "full_name": "Broken", "phone": "6"},
+			{"email": f"nophone-{key}@example.com", "full_name": "No Phone"},
+			{"email": mixed_user.lower(), "full_name": "Mixed Case", "phone": "7"},
+			{"email": member_user, "full_name": "Member Elsewhere", "phone": "8"},
+		])
+		self.addCleanup(os.remove, path)
+
+		jobs = []
+		with patch("frappe.db.commit"), patch("frappe.enqueue", lambda method, **kwargs: jobs.append((method, kwargs))):
+			report = onboarding.onboard_members(path, chunk_size=2, processes=0)
+
+		self.assertEqual(
+			{field: report[field] for field in ("rows", "users", "linked", "password_resets", "duplicates", "invalid")},
+			{"rows": 9, "users": 2, "linked": 2, "password_resets": 1, "duplicates": 3, "invalid": 2},
+		)
+		# the staff row had no password; the linked users keep their accounts
+		self.assertEqual(
+			[kwargs["users"] for method, kwargs in jobs if method == "library_app.onboarding.send_password_resets"],
+			[[f"staff-{key}@example.com"]],
+		)
+		self.assertEqual(frappe.db.get_value("Member", {"email": mixed_user.lower()}, "user"), mixed_user)
+		self.assertEqual(frappe.db.count("Member", {"user": member_user}), 1)
+		reader = f"new-{key}@example.com"
+		self.assertEqual(check_password(reader, "Roster-Pass-123"), reader)
+		self.assertEqual(frappe.get_roles(reader).count("Library Member"), 1)
+		self.assertIn("Librarian", frappe.get_roles(f"staff-{key}@example.com"))
+		self.assertEqual(cache.get_member_for_user(existing_user), frappe.db.get_value("Member", {"user": existing_user}))
+		self.assertIsNone(onboarding.read_checkpoint(path))
+
+	def test_roster_onboarding_resumes_from_checkpoint(self):
+		key = frappe.generate_hash(length=8)
+		path = write_roster([
+			{"email": f"r{i}-{key}@example.com", "full_name": f"Reader {i}", "phone": str(i)} for i in range(4)
+		])
+		self.addCleanup(os.remove, path)
+		done = {"rows": 2, "users": 2, "linked": 0, "duplicates": 0, "invalid": 0, "errors": []}
+		onboarding.save_checkpoint(path, 2, done)
+
+		with patch("frappe.db.commit"), patch("frappe.enqueue"):
+			report = onboarding.onboard_members(path, processes=0, resume=True)
+
+		self.assertEqual((report["resumed_from"], report["rows"], report["users"]), (2, 4, 4))
+		self.assertEqual(report["password_resets"], 2)
+		self.assertFalse(frappe.db.exists("User", f"r0-{key}@example.com"))
+		self.assertTrue(frappe.db.exists("Member", {"email": f"r3-{key}@example.com"}))
+
+	def test_user_admin_lists_roles_and_changes_them_in_bulk(self):
+		users = sorted(make_user() for _ in range(3))
+
+		with patch("frappe.db.commit"):
+			result = api.set_user_roles_bulk(users, add_roles=["Librarian"])
+		self.assertEqual((result["added"], result["removed"]), (3, 0))
+		self.assertEqual({frappe.db.get_value("User", user, "user_type") for user in users}, {"System User"})
+
+		seen, after = {}, None
+		while True:
+			page = api.list_all_users(after=after, page_length=2, role="Librarian")
+			seen.update({user.name: user.roles for user in page["data"]})
+			if not page["has_more"]:
+				break
+			after = page["next_cursor"]
+		for user in users:
+			self.assertIn("Librarian", seen[user])
+		self.assertEqual(len(api.list_all_users(search=users[0])), 1)
+
+		with patch("frappe.db.commit"):
+			result = api.set_user_roles_bulk(users, remove_roles=["Librarian"])
+		self.assertEqual(result["removed"], 3)
+		remaining = [user.name for user in api.list_all_users(role="Librarian", include_website_users=1)]
+		self.assertFalse(set(users) & set(remaining))
+
+	def test_boot_payload_is_cached_and_follows_roles_and_member(self):
+		user = make_user()
+		cached = boot.get_boot_json(user)
+		first = json.loads(cached)
+		self.assertEqual((first["user"]["roles"], first["user"]["member"]), ([], None))
+		self.assertEqual(boot.get_boot_json(user), cached)
+
+		frappe.get_doc("User", user).add_roles("Librarian")
+		member = make_member(user=user)
+
+		payload = json.loads(boot.get_boot_json(user))
+		self.assertEqual((payload["user"]["roles"], payload["user"]["member"]), (["Librarian"], member.name))
+		self.assertLess(len(boot.render_boot_script(user, "token")), 10 * 1024)
+
+	def test_permission_sync_writes_nothing_the_second_time(self):
+		install.sync()
+		report = install.sync()
+		self.assertEqual(report["roles"], {"created": [], "updated": {}})
+		self.assertEqual(report["permissions"], {"created": [], "updated": {}})
+		self.assertEqual(report["customized"], [])
+
+	def test_permission_sync_reports_edited_rows_and_resets_them_only_when_forced(self):
+		install.sync()
+		filters = {"parent": "Book", "role": "Library Member", "permlevel": 0, "if_owner": 0}
+		frappe.db.set_value("Custom DocPerm", filters, "write", 1)
+
+		# what every migrate does: the admin's edit is reported, not undone
+		report = install.sync()
+		self.assertEqual(report["permissions"]["updated"], {"Book: Library Member": {"write": 0}})
+		self.assertFalse(report["forced"])
+		self.assertEqual(frappe.db.get_value("Custom DocPerm", filters, "write"), 1)
+
+		install.sync(dry_run=True, force=True)
+		self.assertEqual(frappe.db.get_value("Custom DocPerm", filters, "write"), 1)
+
+		install.sync(force=True)
+		self.assertEqual(frappe.db.get_value("Custom DocPerm", filters, "write"), 0)
+		self.assertEqual(install.sync()["permissions"]["updated"], {})
+
+	def test_permission_sync_creates_missing_roles_through_the_controller(self):
+		frappe.db.delete("Has Role", {"role": "Library Manager"})
+		frappe.db.delete("Custom DocPerm", {"role": "Library Manager"})
+		frappe.db.delete("Role", {"name": "Library Manager"})
+
+		report = install.sync()
+		self.assertEqual(report["roles"]["created"], ["Library Manager"])
+		role = frappe.get_doc("Role", "Library Manager")
+		self.assertEqual((role.role_name, role.desk_access, role.disabled), ("Library Manager", 1, 0))
+
+	def test_permission_sync_keeps_standard_permissions_of_a_new_customization(self):
+		frappe.db.delete("Custom DocPerm", {"parent": "Reservation"})
+
+		report = install.sync()
+		self.assertEqual(report["customized"], ["Reservation"])
+		roles = set(frappe.get_all("Custom DocPerm", filters={"parent": "Reservation", "permlevel": 0}, pluck="role"))
+		# copied from the DocType's standard permissions before the library rows were applied
+		self.assertIn("System Manager", roles)
+		self.assertTrue({"Librarian", "Library Member"} <= roles)
+		self.assertEqual(install.sync()["customized"], [])
@@ -1,9 +1,50 @@
 # Copyright (c) 2025, Tewodros and contributors
 # For license information, please see license.txt
 
-# import frappe
+import frappe
 from frappe.model.document import Document
 
+from library_app.inventory import refresh_status
+from library_app.reservation_queue import join_queue, leave_queue
+
 
 class Reservation(Document):
-	pass
+	def before_save(self):
+		previous = self.get_doc_before_save()
+		was_queued = bool(previous and previous.status == "Pending")
+		if previous:
+			# queue_slot is shifted with SQL when someone ahead cancels
+			self.queue_slot = frappe.db.get_value("Reservation", self.name, "queue_slot", for_update=True)
+
+		if self.status == "Pending" and not was_queued:
+			join_queue(self)
+			self.flags.queue_changed = True
+		elif was_queued and self.status != "Pending":
+			self.flags.left_queue_slot = self.queue_slot
+			self.flags.queue_changed = True
+			self.queue_slot = 0
+
+	def on_update(self):
+		if self.flags.left_queue_slot:
+			leave_queue(self.book, self.flags.left_queue_slot)
+			self.flags.left_queue_slot = None
+		if self.flags.queue_changed:
+			# the queue length decides between "Reserved" and "On Loan"
+			self.flags.queue_changed = False
+			refresh_status(self.book)
+
+	def on_trash(self):
+		if self.status == "Pending":
+			slot = frappe.db.get_value("Reservation", self.name, "queue_slot", for_update=True)
+			if slot:
+				leave_queue(self.book, slot)
+				refresh_status(self.book)
+
+
+def on_doctype_update():
+	# (book, status, reserve_date): next pending reservation for a book
+	frappe.db.add_index("Reservation", ["book", "status", "reserve_date"])
+	# (book, status, queue_slot): head of a book's queue and the shift behind a cancellation
+	frappe.db.add_index("Reservation", ["book", "status", "queue_slot"])
+	# member: my reservations
+	frappe.db.add_index("Reservation", ["member"])
@@ -1,9 +1,14 @@
 # Copyright (c) 2025, Tewodros and Contributors
 # See license.txt
 
-# import frappe
+import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import nowdate
 
+from library_app import api
+from library_app.library.doctype.book.test_book import make_book
+from library_app.library.doctype.member.test_member import make_library_member, make_member
+from library_app.reservation_queue import next_in_line, queue_length, queue_position
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -12,6 +17,23 @@ EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
 
+def make_reservation(book, member=None, **kwargs):
+	reservation = frappe.get_doc({
+		"doctype": "Reservation",
+		"book": book,
+		"member": member or make_member().name,
+		"reserve_date": nowdate(),
+		"status": "Pending",
+		**kwargs,
+	})
+	return reservation.insert(ignore_permissions=True)
+
+
+def set_status(reservation, status):
+	doc = frappe.get_doc("Reservation", reservation)
+	doc.status = status
+	doc.save()
+
 
 class IntegrationTestReservation(IntegrationTestCase):
 	"""
@@ -19,4 +41,66 @@ class IntegrationTestReservation(IntegrationTestCase):
 	Use this class for testing interactions between multiple components.
 	"""
 
-	pass
+	def positions(self, reservations):
+		return [queue_position(frappe.get_doc("Reservation", name)) for name in reservations]
+
+	def test_queue_is_first_in_first_out(self):
+		book = make_book(copies=0).name
+		queue = [make_reservation(book).name for _ in range(4)]
+
+		self.assertEqual(self.positions(queue), [1, 2, 3, 4])
+		self.assertEqual(queue_length(book), 4)
+		self.assertEqual(next_in_line(book).name, queue[0])
+
+	def test_serving_the_head_moves_everyone_up(self):
+		book = make_book(copies=0).name
+		queue = [make_reservation(book).name for _ in range(3)]
+
+		set_status(queue[0], "Completed")
+
+		self.assertEqual(self.positions(queue), [None, 1, 2])
+		self.assertEqual(next_in_line(book).name, queue[1])
+		self.assertEqual(queue_length(book), 2)
+
+	def test_cancelling_from_the_middle_closes_the_gap(self):
+		book = make_book(copies=0).name
+		queue = [make_reservation(book).name for _ in range(4)]
+
+		set_status(queue[1], "Cancelled")
+		frappe.delete_doc("Reservation", queue[2])
+		latecomer = make_reservation(book).name
+
+		self.assertEqual(self.positions([queue[0], queue[3], latecomer]), [1, 2, 3])
+		self.assertEqual(queue_length(book), 3)
+
+	def test_cached_book_and_reservations_follow_the_queue(self):
+		book = make_book(copies=0).name
+		queue = [make_reservation(book).name for _ in range(3)]
+		self.assertEqual(api.get_book(book).reservation_queue_length, 3)
+		self.assertEqual(api.get_reservation_details(queue[2])["reservation"].queue_slot, 3)
+
+		set_status(queue[1], "Cancelled")
+		self.assertEqual(api.get_book(book).reservation_queue_length, 2)
+		self.assertEqual(api.get_reservation_details(queue[2])["reservation"].queue_slot, 2)
+
+	def test_book_save_keeps_queue_counters(self):
+		book = make_book(copies=0)
+		make_reservation(book.name)
+		make_reservation(book.name)
+
+		book.title = "Saved From A Stale Copy"
+		book.save()
+
+		self.assertEqual(queue_length(book.name), 2)
+
+	def test_members_list_only_their_own_reservations(self):
+		user, member = make_library_member()
+		book = make_book(copies=0).name
+		mine = make_reservation(book, member=member).name
+		other = make_reservation(book).name
+		self.assertIn(other, [reservation.name for reservation in api.get_reservations()])
+
+		with self.set_user(user):
+			self.assertEqual([reservation.name for reservation in api.get_reservations()], [mine])
+			page = api.get_reservations(page_length=50)
+		self.assertEqual([reservation.name for reservation in page["data"]], [mine])
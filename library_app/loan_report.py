@@ -0,0 +1,102 @@
+# library_app/library_app/loan_report.py
+import frappe
+
+# --- Materialized open-loan report ---
+#
+# Loan Report Row holds one row per open loan with the book title and member
+# name/email copied in, so the books-on-loan and overdue reports are a single
+# indexed read of one table (paged with a keyset cursor) however many loans
+# are out. "Overdue" is return_date < today, evaluated when the report is
+# read, so the rows don't have to change when a loan falls due.
+#
+# Rows follow the source data incrementally:
+#
+#     Loan inserted/updated/trashed     refresh_loans([loan])   (doc_events)
+#     Book title, Member name/email     refresh_book / refresh_member (doc_events)
+#     set-based loan writes             callers run refresh_loans(names)
+#
+# rebuild() recomputes the whole table (`bench rebuild-loan-report`).
+
+REPORT_DOCTYPE = "Loan Report Row"
+
+SELECT_OPEN_LOANS = """
+    SELECT loan.name, loan.book, book.title, loan.member, member.member_name, member.email,
+        loan.loan_date, loan.return_date, %(now)s, %(now)s, %(now)s, %(user)s, %(user)s
+    FROM `tabLoan` loan
+    LEFT JOIN `tabBook` book ON book.name = loan.book
+    LEFT JOIN `tabMember` member ON member.name = loan.member
+    WHERE loan.returned = 0
+"""
+INSERT_ROWS = """
+    INSERT INTO `tabLoan Report Row`
+        (name, book, book_title, member, member_name, member_email, loan_date, return_date,
+         refreshed_on, creation, modified, owner, modified_by)
+"""
+
+
+def stamp():
+    return {"now": frappe.utils.now_datetime(), "user": frappe.session.user}
+
+
+def refresh_loans(loans):
+    """Re-reads the report rows of `loans`: open loans are (re)written, the others removed."""
+    loans = tuple(loans)
+    if not loans:
+        return
+    frappe.db.sql("DELETE FROM `tabLoan Report Row` WHERE name IN %(loans)s", {"loans": loans})
+    frappe.db.sql(INSERT_ROWS + SELECT_OPEN_LOANS + " AND loan.name IN %(loans)s", {**stamp(), "loans": loans})
+
+
+def refresh_book(book):
+    frappe.db.sql(
+        """
+        UPDATE `tabLoan Report Row` row
+        JOIN `tabBook` book ON book.name = row.book
+        SET row.book_title = book.title, row.refreshed_on = %(now)s
+        WHERE row.book = %(book)s
+        """,
+        {**stamp(), "book": book},
+    )
+
+
+def refresh_member(member):
+    frappe.db.sql(
+        """
+        UPDATE `tabLoan Report Row` row
+        JOIN `tabMember` member ON member.name = row.member
+        SET row.member_name = member.member_name, row.member_email = member.email, row.refreshed_on = %(now)s
+        WHERE row.member = %(member)s
+        """,
+        {**stamp(), "member": member},
+    )
+
+
+def rebuild():
+    """Recomputes the whole report from the Loan table; the caller commits. Returns the number of open loans."""
+    frappe.db.sql("DELETE FROM `tabLoan Report Row`")
+    frappe.db.sql(INSERT_ROWS + SELECT_OPEN_LOANS, stamp())
+    return frappe.db.count(REPORT_DOCTYPE)
+
+
+# --- Document event handlers (wired in hooks.py) ---
+
+def on_loan_change(doc, method=None):
+    if method == "on_trash":
+        frappe.db.delete(REPORT_DOCTYPE, {"name": doc.name})
+    else:
+        refresh_loans([doc.name])
+
+
+def changed(doc, *fields):
+    previous = doc.get_doc_before_save()
+    return not previous or any(previous.get(field) != doc.get(field) for field in fields)
+
+
+def on_book_update(doc, method=None):
+    if changed(doc, "title"):
+        refresh_book(doc.name)
+
+
+def on_member_update(doc, method=None):
+    if changed(doc, "member_name", "email"):
+        refresh_member(doc.name)
@@ -0,0 +1,250 @@
+# library_app/library_app/notifications.py
+from itertools import groupby
+
+import frappe
+from frappe.utils import add_to_date, cint, now_datetime
+
+from library_app.cache import invalidate
+
+# --- Overdue digest pipeline ---
+#
+# One email per member listing every overdue loan they have not been told
+# about yet. Members are processed in batches: one query picks the next
+# batch of members, one joined query loads all of their pending loans, the
+# digests are rendered with a template compiled once, queued through the
+# Frappe email queue, and the loans are stamped with overdue_notified_on in
+# the same transaction. A rerun only picks up loans that were never stamped.
+
+DIGEST_TEMPLATE = "library_app/templates/emails/overdue_digest.html"
+DEFAULT_MEMBER_BATCH_SIZE = 500
+
+
+def next_member_batch(after_member, batch_size):
+    return frappe.db.sql_list(
+        """
+        SELECT DISTINCT member
+        FROM `tabLoan`
+        WHERE returned = 0 AND overdue = 1 AND overdue_notified_on IS NULL AND member > %s
+        ORDER BY member
+        LIMIT %s
+        """,
+        (after_member, batch_size),
+    )
+
+
+def pending_loans_for(members):
+    return frappe.db.sql(
+        """
+        SELECT loan.name, loan.book, loan.member, loan.return_date,
+            book.title AS book_title, member.member_name, member.email AS member_email
+        FROM `tabLoan` loan
+        INNER JOIN `tabMember` member ON member.name = loan.member
+        LEFT JOIN `tabBook` book ON book.name = loan.book
+        WHERE loan.member IN %s
+            AND loan.returned = 0 AND loan.overdue = 1 AND loan.overdue_notified_on IS NULL
+        ORDER BY loan.member, loan.return_date
+        """,
+        (tuple(members),),
+        as_dict=True,
+    )
+
+
+def send_overdue_digests(batch_size=None):
+    """
+    Queues one overdue digest per member and stamps the loans it covered.
+    Returns {"members_notified": n, "loans_notified": n, "failed": n}.
+    """
+    batch_size = cint(batch_size) or cint(frappe.conf.get("library_digest_batch_size")) or DEFAULT_MEMBER_BATCH_SIZE
+    template = frappe.get_jenv().get_template(DIGEST_TEMPLATE)
+    summary = {"members_notified": 0, "loans_notified": 0, "failed": 0}
+
+    last_member = ""
+    while True:
+        members = next_member_batch(last_member, batch_size)
+        if not members:
+            break
+        last_member = members[-1]
+
+        notified = []
+        for member, loans in groupby(pending_loans_for(members), key=lambda loan: loan.member):
+            loans = list(loans)
+            try:
+                frappe.sendmail(
+                    recipients=[loans[0].member_email],
+                    subject=overdue_subject(loans),
+                    message=template.render({"member_name": loans[0].member_name, "loans": loans}),
+                    reference_doctype="Member",
+                    reference_name=member,
+                    now=False,
+                )
+            except Exception:
+                summary["failed"] += 1
+                frappe.log_error(frappe.get_traceback(), f"Overdue digest failed for {member}")
+                continue
+            notified.extend(loan.name for loan in loans)
+            summary["members_notified"] += 1
+
+        if notified:
+            frappe.db.sql(
+                "UPDATE `tabLoan` SET overdue_notified_on = %s WHERE name IN %s",
+                (now_datetime(), tuple(notified)),
+            )
+            invalidate("Loan", notified)
+        # Queued emails and the stamps they correspond to commit together
+        frappe.db.commit()
+        summary["loans_notified"] += len(notified)
+
+    return summary
+
+
+def overdue_subject(loans):
+    if len(loans) == 1:
+        return f"Overdue Notice: {loans[0].book_title or loans[0].book}"
+    return f"Overdue Notice: {len(loans)} books"
+
+
+# --- Reservation notices ---
+#
+# Requests never talk to SMTP. They enqueue a small job (member, book title,
+# reservation) after their transaction commits, on the queue named by the
+# `library_notification_queue` site config key; point it at a dedicated
+# worker queue (common_site_config "workers") to keep mail off the short
+# queue. The job renders and sends the email. When the send fails the notice
+# is written to Library Notification and retried by the scheduler with
+# exponential backoff; after the last attempt it is marked Dead and logged.
+# The failed Email Queue row is deleted, so Frappe's own email flush doesn't
+# send the notice a second time.
+
+DEFAULT_NOTIFICATION_QUEUE = "short"
+DEFAULT_MAX_ATTEMPTS = 5
+RETRY_BASE_SECONDS = 60
+RETRY_MAX_SECONDS = 60 * 60
+RETRY_BATCH_SIZE = 100
+
+RESERVATION_MESSAGE = """
+Dear {member_name},
+
+The book "{book_title}" that you reserved is now available for loan.
+Please visit the library to collect your book within 48 hours.
+
+Thank you,
+Library Management System
+"""
+
+
+class NotificationFailed(Exception):
+    pass
+
+
+def notification_queue():
+    return frappe.conf.get("library_notification_queue") or DEFAULT_NOTIFICATION_QUEUE
+
+
+def max_attempts():
+    return cint(frappe.conf.get("library_notification_max_attempts")) or DEFAULT_MAX_ATTEMPTS
+
+
+def retry_delay(attempts):
+    """Seconds before the next try after `attempts` failed ones: 1, 2, 4 ... minutes, capped at an hour."""
+    return min(RETRY_BASE_SECONDS * 2 ** (max(attempts, 1) - 1), RETRY_MAX_SECONDS)
+
+
+def enqueue_reservation_notice(member, book_title, reservation=None):
+    """Queues the "your reserved book is available" email; sent once the current transaction commits."""
+    frappe.enqueue(
+        "library_app.notifications.deliver_reservation_notice",
+        queue=notification_queue(),
+        enqueue_after_commit=True,
+        member=member,
+        book_title=book_title,
+        reservation=reservation,
+    )
+
+
+def send_reservation_notice(member, book_title, reservation=None):
+    """Sends the email over SMTP now. Raises NotificationFailed if it did not go out."""
+    recipient = frappe.db.get_value("Member", member, ["member_name", "email"], as_dict=True)
+    if not recipient or not recipient.email:
+        raise NotificationFailed(f"Member '{member}' has no email address.")
+
+    queued = frappe.sendmail(
+        recipients=[recipient.email],
+        subject=f"Book Available: {book_title}",
+        message=RESERVATION_MESSAGE.format(member_name=recipient.member_name, book_title=book_title),
+        reference_doctype="Reservation" if reservation else None,
+        reference_name=reservation,
+        now=True,
+    )
+    # sendmail records SMTP errors on the Email Queue row instead of raising
+    if queued and queued.name:
+        outcome = frappe.db.get_value("Email Queue", queued.name, ["status", "error"], as_dict=True)
+        if outcome and outcome.status != "Sent":
+            discard_email(queued.name)
+            raise NotificationFailed(outcome.error or f"Email Queue status {outcome.status}")
+
+
+def discard_email(name):
+    """Deletes an unsent Email Queue row; Library Notification owns the retries."""
+    frappe.db.delete("Email Queue Recipient", {"parent": name})
+    frappe.db.delete("Email Queue", {"name": name})
+
+
+def deliver_reservation_notice(member, book_title, reservation=None):
+    """Background job: sends a reservation notice, parking it for retry when the send fails."""
+    try:
+        send_reservation_notice(member, book_title, reservation)
+    except Exception as e:
+        frappe.get_doc({
+            "doctype": "Library Notification",
+            "kind": "Reservation Available",
+            "member": member,
+            "reservation": reservation,
+            "book_title": book_title,
+            "status": "Retrying",
+            "attempts": 1,
+            "next_attempt_at": add_to_date(now_datetime(), seconds=retry_delay(1)),
+            "last_error": str(e)[:1000],
+        }).insert(ignore_permissions=True)
+    frappe.db.commit()
+
+
+def retry_notifications(batch_size=RETRY_BATCH_SIZE):
+    """
+    Scheduled: retries Library Notifications whose backoff has elapsed.
+    Returns {"sent": n, "retrying": n, "dead": n}.
+    """
+    due = frappe.get_all(
+        "Library Notification",
+        filters={"status": "Retrying", "next_attempt_at": ["<=", now_datetime()]},
+        fields=["name", "member", "book_title", "reservation", "attempts"],
+        order_by="next_attempt_at",
+        limit=batch_size,
+    )
+    summary = {"sent": 0, "retrying": 0, "dead": 0}
+    limit = max_attempts()
+    for notice in due:
+        try:
+            send_reservation_notice(notice.member, notice.book_title, notice.reservation)
+        except Exception as e:
+            attempts = notice.attempts + 1
+            if attempts >= limit:
+                values = {"status": "Dead", "attempts": attempts, "next_attempt_at": None, "last_error": str(e)[:1000]}
+                summary["dead"] += 1
+                frappe.log_error(str(e), f"Reservation notice to {notice.member} failed {attempts} times")
+            else:
+                values = {
+                    "attempts": attempts,
+                    "next_attempt_at": add_to_date(now_datetime(), seconds=retry_delay(attempts)),
+                    "last_error": str(e)[:1000],
+                }
+                summary["retrying"] += 1
+            frappe.db.set_value("Library Notification", notice.name, values)
+        else:
+            frappe.db.set_value(
+                "Library Notification",
+                notice.name,
+                {"status": "Sent", "attempts": notice.attempts + 1, "next_attempt_at": None},
+            )
+            summary["sent"] += 1
+        frappe.db.commit()
+    return summary
@@ -0,0 +1,342 @@
+# library_app/library_app/onboarding.py
+import hashlib
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import frappe
+from frappe.utils import cint, now_datetime, validate_email_address
+from frappe.utils.password import passlibctx
+
+from library_app.analytics import seed_members
+from library_app.book_import import InvalidRow, iter_records
+from library_app.cache import forget_member_users, invalidate
+from library_app.install import ROLES
+from library_app.stats import bump
+
+# --- Bulk patron onboarding ---
+#
+# Streams a roster (CSV, JSON array or JSON Lines) and creates, per row, a
+# User with its role and password and a linked Member, in chunks:
+#
+#     dedupe      one query each for existing users, member emails and
+#                 membership IDs per chunk (and sets for repeats in the file)
+#     passwords   hashed in a process pool (pbkdf2 is the slow part)
+#     writes      one multi-row INSERT per table per chunk (User, Has Role,
+#                 __Auth, Member) and one commit per chunk
+#
+# Rows whose email already has a User (compared case-insensitively) with no
+# Member get a Member linked to that user; their account is left alone. After each committed chunk the
+# row reached is saved to a checkpoint file, and a rerun with resume=True
+# continues from there. Rerunning from the start is safe too, since rows
+# already onboarded are found by the dedupe and skipped.
+#
+# The bulk path skips the User controller: no welcome emails, contacts or
+# user permissions are created, as with the one-by-one endpoints
+# (send_welcome_email = 0). New users without a password in the roster could
+# not log in, so once their chunk has committed a background job emails
+# them a reset-password link (counted as password_resets in the report).
+
+DEFAULT_CHUNK_SIZE = 2000
+DEFAULT_ROLE = "Library Member"
+# passwords handed to each pool worker at a time
+HASH_BATCH = 64
+MAX_REPORTED_ERRORS = 1000
+MEMBERSHIP_PREFIXES = {"Library Member": "MEM", "Librarian": "LIB", "Library Manager": "MGR"}
+
+USER_FIELDS = [
+    "name", "email", "first_name", "last_name", "full_name", "enabled", "user_type", "send_welcome_email",
+    "creation", "modified", "owner", "modified_by",
+]
+ROLE_FIELDS = ["name", "parent", "parenttype", "parentfield", "idx", "role", "creation", "modified", "owner", "modified_by"]
+MEMBER_FIELDS = [
+    "name", "member_name", "membership_id", "email", "phone", "user",
+    "creation", "modified", "owner", "modified_by",
+]
+
+
+def clean_row(record, default_role=DEFAULT_ROLE):
+    """Validates one roster record and returns a dict of email, first/last name, phone, membership_id, role, password."""
+    record = {str(key).strip().lower().replace(" ", "_"): value for key, value in record.items() if key}
+
+    def text(field):
+        return str(record.get(field) or "").strip()
+
+    email = text("email").lower()
+    if not email:
+        raise InvalidRow("email is required")
+    if not validate_email_address(email):
+        raise InvalidRow(f"'{email}' is not a valid email address")
+
+    first_name, last_name = text("first_name"), text("last_name")
+    if not first_name and text("full_name"):
+        first_name, _, last_name = text("full_name").partition(" ")
+    if not first_name:
+        raise InvalidRow("full_name or first_name is required")
+    # Member.phone is mandatory, and the bulk insert skips its validation
+    if not text("phone"):
+        raise InvalidRow("phone is required")
+
+    role = text("role") or default_role
+    if role not in ROLES:
+        raise InvalidRow(f"role must be one of {', '.join(ROLES)}")
+
+    return {
+        "email": email,
+        "first_name": first_name,
+        "last_name": last_name.strip(),
+        "phone": text("phone"),
+        "membership_id": text("membership_id"),
+        "role": role,
+        "password": text("password"),
+    }
+
+
+# --- Passwords ---
+
+def hash_password(password):
+    return passlibctx.hash(password)
+
+
+def hash_passwords(passwords, pool=None):
+    """Hashes `passwords` in `pool` (a ProcessPoolExecutor) or inline."""
+    if pool is None:
+        return [hash_password(password) for password in passwords]
+    return list(pool.map(hash_password, passwords, chunksize=HASH_BATCH))
+
+
+# --- Checkpoints ---
+
+def checkpoint_path(path):
+    """One checkpoint per roster file (by absolute path and size) in the site's private folder."""
+    digest = hashlib.md5(f"{os.path.abspath(path)}:{os.path.getsize(path)}".encode()).hexdigest()
+    directory = frappe.get_site_path("private", "library_onboarding")
+    os.makedirs(directory, exist_ok=True)
+    return os.path.join(directory, f"{digest}.json")
+
+
+def read_checkpoint(path):
+    try:
+        with open(checkpoint_path(path)) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def save_checkpoint(path, row, report):
+    target = checkpoint_path(path)
+    with open(f"{target}.tmp", "w") as f:
+        json.dump({"row": row, "report": report}, f)
+    os.replace(f"{target}.tmp", target)
+
+
+def clear_checkpoint(path):
+    try:
+        os.remove(checkpoint_path(path))
+    except FileNotFoundError:
+        pass
+
+
+# --- Writing ---
+
+def existing(rows):
+    """
+    What a chunk already has in the database: {lower-cased email: User name},
+    the emails whose User or email already has a Member, and the membership
+    IDs taken.
+    """
+    emails = tuple({row["email"] for _, row in rows})
+    ids = tuple({row["membership_id"] for _, row in rows if row["membership_id"]})
+    # names compare case-insensitively, but older Users may keep mixed-case names
+    users = {name.lower(): name for name in frappe.db.sql_list("SELECT name FROM `tabUser` WHERE name IN %s", (emails,))}
+    members = {email.lower() for email in frappe.db.sql_list("SELECT email FROM `tabMember` WHERE email IN %s", (emails,))}
+    if users:
+        # a User linked to a Member under another email
+        members |= {user.lower() for user in frappe.db.sql_list(
+            "SELECT user FROM `tabMember` WHERE user IN %s", (tuple(users.values()),)
+        )}
+    taken_ids = set(frappe.db.sql_list("SELECT membership_id FROM `tabMember` WHERE membership_id IN %s", (ids,))) if ids else set()
+    return users, members, taken_ids
+
+
+def insert_chunk(rows, pool=None):
+    """
+    Dedupes a chunk of (row_number, cleaned) against the database and
+    onboards the rest. Returns (users created, members linked to existing
+    users, duplicate row numbers, [(row_number, error)], new users without
+    a password).
+    """
+    users, members, taken_ids = existing(rows)
+    fresh, linked, duplicates, rejected = [], [], [], []
+    for row_number, row in rows:
+        if row["email"] in members:
+            duplicates.append(row_number)
+        elif row["membership_id"] in taken_ids:
+            rejected.append((row_number, f"membership ID '{row['membership_id']}' is already taken"))
+        elif row["email"] in users:
+            linked.append({**row, "user": users[row["email"]]})
+        else:
+            fresh.append({**row, "user": row["email"]})
+    if not fresh and not linked:
+        return 0, 0, duplicates, rejected, []
+
+    now = now_datetime()
+    owner = frappe.session.user
+    meta = (now, now, owner, owner)
+
+    if fresh:
+        frappe.db.bulk_insert("User", USER_FIELDS, [
+            (row["email"], row["email"], row["first_name"], row["last_name"],
+             " ".join(filter(None, (row["first_name"], row["last_name"]))), 1,
+             "System User" if ROLES[row["role"]]["desk_access"] else "Website User", 0, *meta)
+            for row in fresh
+        ], chunk_size=len(fresh))
+        frappe.db.bulk_insert("Has Role", ROLE_FIELDS, [
+            (frappe.generate_hash(length=10), row["email"], "User", "roles", 1, row["role"], *meta)
+            for row in fresh
+        ], chunk_size=len(fresh))
+
+        with_password = [row for row in fresh if row["password"]]
+        if with_password:
+            hashes = hash_passwords([row["password"] for row in with_password], pool)
+            frappe.db.sql(
+                f"""
+                INSERT INTO `__Auth` (doctype, name, fieldname, `password`, encrypted)
+                VALUES {", ".join(["('User', %s, 'password', %s, 0)"] * len(with_password))}
+                ON DUPLICATE KEY UPDATE `password` = VALUES(`password`), encrypted = 0
+                """,
+                [value for row, hashed in zip(with_password, hashes, strict=True) for value in (row["email"], hashed)],
+            )
+
+    onboarded = fresh + linked
+    names = [frappe.generate_hash(length=10) for _ in onboarded]
+    frappe.db.bulk_insert("Member", MEMBER_FIELDS, [
+        (name, " ".join(filter(None, (row["first_name"], row["last_name"]))),
+         row["membership_id"] or f"{MEMBERSHIP_PREFIXES[row['role']]}-{frappe.generate_hash(length=8)}",
+         row["email"], row["phone"], row["user"], *meta)
+        for name, row in zip(names, onboarded, strict=True)
+    ], chunk_size=len(onboarded))
+
+    bump({"members": len(onboarded)})
+    seed_members(names)
+    invalidate("Member")
+    # the user -> member lookup caches misses
+    forget_member_users([row["user"] for row in onboarded])
+    return len(fresh), len(linked), duplicates, rejected, [row["email"] for row in fresh if not row["password"]]
+
+
+def onboard_members(path, fmt=None, default_role=DEFAULT_ROLE, chunk_size=None, processes=None, resume=False):
+    """
+    Onboards the patrons of a CSV/JSON/JSONL roster at `path` (columns: email,
+    full_name or first_name/last_name, phone, and optionally membership_id,
+    role and password). `processes` sets the password-hashing pool size
+    (default: CPU count, 0 hashes inline). New users without a password are
+    sent a reset-password email. Returns a report with counts, throughput and
+    per-row errors (first MAX_REPORTED_ERRORS).
+    """
+    chunk_size = cint(chunk_size) or DEFAULT_CHUNK_SIZE
+    processes = os.cpu_count() if processes is None else cint(processes)
+    checkpoint = read_checkpoint(path) if resume else None
+    start_row = checkpoint["row"] if checkpoint else 0
+    report = checkpoint["report"] if checkpoint else {
+        "rows": 0, "users": 0, "linked": 0, "password_resets": 0, "duplicates": 0, "invalid": 0, "errors": [],
+    }
+    report.setdefault("password_resets", 0)
+    report["resumed_from"] = start_row
+    started = time.perf_counter()
+
+    def note(row_number, message):
+        if len(report["errors"]) < MAX_REPORTED_ERRORS:
+            report["errors"].append({"row": row_number, "error": message})
+
+    def error(row_number, message):
+        report["invalid"] += 1
+        note(row_number, message)
+
+    def flush(rows, pool):
+        try:
+            users, linked, duplicates, rejected, without_password = insert_chunk(rows, pool)
+            frappe.db.commit()
+        except Exception as e:
+            frappe.db.rollback()
+            if len(rows) > 1:
+                # e.g. a user created concurrently: retry row by row so only
+                # the offending rows are rejected
+                for row in rows:
+                    flush([row], pool)
+            else:
+                error(rows[0][0], str(e))
+            return
+        report["users"] += users
+        report["linked"] += linked
+        if without_password:
+            frappe.enqueue(
+                "library_app.onboarding.send_password_resets", queue="long", users=without_password
+            )
+            report["password_resets"] += len(without_password)
+        report["duplicates"] += len(duplicates)
+        for row_number in duplicates:
+            note(row_number, "a member with this email already exists")
+        for row_number, message in rejected:
+            error(row_number, message)
+
+    pool = ProcessPoolExecutor(processes) if processes > 1 else None
+    try:
+        pending, seen_emails, seen_ids = [], set(), set()
+        for row_number, record in enumerate(iter_records(path, fmt), start=1):
+            if row_number <= start_row:
+                continue
+            report["rows"] += 1
+            try:
+                cleaned = clean_row(record, default_role)
+            except InvalidRow as e:
+                error(row_number, str(e))
+                continue
+            if cleaned["email"] in seen_emails or cleaned["membership_id"] in seen_ids:
+                report["duplicates"] += 1
+                note(row_number, "duplicate email or membership ID in file")
+                continue
+            seen_emails.add(cleaned["email"])
+            if cleaned["membership_id"]:
+                seen_ids.add(cleaned["membership_id"])
+            pending.append((row_number, cleaned))
+            if len(pending) >= chunk_size:
+                flush(pending, pool)
+                save_checkpoint(path, row_number, report)
+                pending = []
+        if pending:
+            flush(pending, pool)
+    finally:
+        if pool:
+            pool.shutdown()
+    clear_checkpoint(path)
+
+    elapsed = time.perf_counter() - started
+    report["seconds"] = round(elapsed, 2)
+    report["rows_per_second"] = round(report["rows"] / elapsed) if elapsed else report["rows"]
+    return report
+
+
+def send_password_resets(users):
+    """Background job: emails a reset-password link to onboarded users created without a password."""
+    for user in users:
+        try:
+            frappe.get_doc("User", user).reset_password(send_email=True)
+            frappe.db.commit()
+        except Exception:
+            frappe.db.rollback()
+            frappe.log_error(frappe.get_traceback(), f"Password reset email to {user} failed")
+
+
+def onboard_members_job(file_url, fmt=None, default_role=DEFAULT_ROLE, resume=False, user=None):
+    """Background job for the import_members endpoint; publishes the report to the user."""
+    file_doc = frappe.get_doc("File", {"file_url": file_url})
+    report = onboard_members(
+        file_doc.get_full_path(),
+        fmt or os.path.splitext(file_doc.file_name)[1].lstrip("."),
+        default_role=default_role,
+        resume=resume,
+    )
+    frappe.publish_realtime("library_member_import_done", report, user=user)
+    return report
@@ -0,0 +1,65 @@
+# library_app/library_app/overdue.py
+import frappe
+from frappe.utils import cint, now_datetime, nowdate
+
+from library_app.cache import invalidate
+from library_app.stats import bump
+
+# --- Set-based overdue marking ---
+#
+# Loans past their return date are flagged with one UPDATE per chunk instead
+# of a get_doc()/save() per loan. Each chunk is locked with SELECT ... FOR
+# UPDATE first, so the rows returned are exactly the rows this run changed
+# even if two runs overlap.
+
+DEFAULT_BATCH_SIZE = 1000
+
+
+def get_batch_size(batch_size=None):
+    """Explicit argument, then `library_overdue_batch_size` from site config, then the default."""
+    return cint(batch_size) or cint(frappe.conf.get("library_overdue_batch_size")) or DEFAULT_BATCH_SIZE
+
+
+def mark_overdue_loans(batch_size=None, today=None, commit=True):
+    """
+    Flags unreturned loans whose return_date is before `today` as overdue.
+    Returns the loans that changed as dicts with name, book, member and return_date.
+    """
+    batch_size = get_batch_size(batch_size)
+    today = today or nowdate()
+    changed = []
+
+    while True:
+        rows = frappe.db.sql(
+            """
+            SELECT name, book, member, return_date
+            FROM `tabLoan`
+            WHERE returned = 0 AND overdue = 0 AND return_date < %s
+            LIMIT %s
+            FOR UPDATE
+            """,
+            (today, batch_size),
+            as_dict=True,
+        )
+        if not rows:
+            break
+
+        frappe.db.sql(
+            """
+            UPDATE `tabLoan`
+            SET overdue = 1, modified = %s, modified_by = %s
+            WHERE name IN %s
+            """,
+            (now_datetime(), frappe.session.user, tuple(row.name for row in rows)),
+        )
+        bump({"overdue_loans": len(rows)})
+        invalidate("Loan", [row.name for row in rows])
+
+        if commit:
+            frappe.db.commit()
+        changed.extend(rows)
+
+        if len(rows) < batch_size:
+            break
+
+    return changed
@@ -0,0 +1,142 @@
+# library_app/library_app/pagination.py
+import base64
+import json
+
+import frappe
+from frappe.query_builder import Order
+from frappe.utils import cint
+
+from library_app.queries import LIST_SOURCES, apply_filters, permitted, select_columns
+
+# --- Keyset (cursor) pagination for the list endpoints ---
+#
+# Pages are addressed by the sort value and name of the last row already seen
+# instead of an OFFSET, so page 5,000 costs the same as page 1. The cursor is
+# opaque to clients: base64 JSON of the sort field, direction and last key.
+
+DEFAULT_PAGE_LENGTH = 20
+MAX_PAGE_LENGTH = 500
+
+# Default projection and the fields each list may be sorted on. Only non-null
+# columns are sortable, since keyset comparisons skip NULL sort values.
+LIST_SPECS = {
+    "Book": {
+        "fields": ["name", "title", "author", "publish_date", "isbn", "status", "total_copies", "available_copies"],
+        "sortable": ["creation", "modified", "title", "author", "publish_date", "isbn"],
+    },
+    "Member": {
+        "fields": ["name", "member_name", "membership_id", "email", "phone", "user"],
+        "sortable": ["creation", "modified", "member_name", "membership_id", "email"],
+    },
+    "Loan": {
+        "fields": ["name", "book", "member", "loan_date", "return_date", "returned", "overdue", "book_title", "member_name"],
+        "sortable": ["creation", "modified", "loan_date", "return_date"],
+    },
+    "Reservation": {
+        "fields": ["name", "book", "member", "reserve_date", "status", "book_title", "member_name"],
+        "sortable": ["creation", "modified"],
+    },
+    "Loan Report Row": {
+        "fields": ["name", "book", "book_title", "member", "member_name", "member_email", "loan_date", "return_date"],
+        "sortable": ["loan_date", "return_date", "book_title", "member_name"],
+    },
+    "User": {
+        "fields": ["name", "email", "first_name", "last_name", "full_name", "enabled", "user_type", "last_login", "roles"],
+        "sortable": ["creation", "modified", "name"],
+    },
+}
+
+
+def wants_page(*args):
+    """True when any pagination argument was passed; otherwise callers keep the legacy full list."""
+    return any(arg not in (None, "") for arg in args)
+
+
+def encode_cursor(order_by, order, row):
+    payload = [order_by, order, row[order_by], row["name"]]
+    return base64.urlsafe_b64encode(frappe.as_json(payload, indent=None).encode()).decode()
+
+
+def decode_cursor(cursor, order_by, order):
+    try:
+        cursor_field, cursor_order, value, name = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        frappe.throw("Invalid pagination cursor.")
+    if (cursor_field, cursor_order) != (order_by, order):
+        frappe.throw("Pagination cursor does not match the requested sort order.")
+    return value, name
+
+
+def parse_order(doctype, order_by=None, order=None):
+    """Validates `order_by` ("field" or "field asc|desc") against the doctype's whitelist."""
+    order_by = (order_by or "creation").strip()
+    if " " in order_by:
+        order_by, order = order_by.split(None, 1)
+    order = (order or "desc").strip().lower()
+
+    if order not in ("asc", "desc"):
+        frappe.throw(f"Invalid sort order '{order}'.")
+    if order_by not in LIST_SPECS[doctype]["sortable"]:
+        frappe.throw(f"Cannot sort {doctype} by '{order_by}'.")
+    return order_by, order
+
+
+def parse_fields(doctype, fields=None):
+    """Resolves the requested projection; unknown fields are rejected."""
+    if not fields:
+        return list(LIST_SPECS[doctype]["fields"])
+    if isinstance(fields, str):
+        fields = frappe.parse_json(fields) if fields.strip().startswith("[") else fields.split(",")
+
+    fields = [field.strip() for field in fields if field and field.strip()]
+    allowed = LIST_SPECS[doctype]["fields"]
+    invalid = [field for field in fields if field not in allowed]
+    if invalid:
+        frappe.throw(f"Invalid field(s) for {doctype}: {', '.join(invalid)}")
+    return fields
+
+
+def get_page(doctype, after=None, page_length=None, order_by=None, order=None, fields=None, filters=None, conditions=None):
+    """
+    Returns one page of the `doctype` rows the session user may read.
+    `conditions` are callables taking the source's columns and returning extra
+    criteria (filters only test equality).
+    Response: {"data": [...], "next_cursor": str | None, "has_more": bool}
+    """
+    order_by, order = parse_order(doctype, order_by, order)
+    fields = parse_fields(doctype, fields)
+    page_length = min(cint(page_length) or DEFAULT_PAGE_LENGTH, MAX_PAGE_LENGTH)
+
+    query, columns = LIST_SOURCES[doctype]()
+    query = permitted(query, doctype)
+    sort_column = columns[order_by]
+    name_column = columns["name"]
+
+    # name and the sort field are needed to build the next cursor
+    selected = list(dict.fromkeys([*fields, "name", order_by]))
+    query = select_columns(query, columns, selected)
+    query = apply_filters(query, columns, filters)
+    for condition in conditions or ():
+        query = query.where(condition(columns))
+
+    if after:
+        value, name = decode_cursor(after, order_by, order)
+        if order == "desc":
+            query = query.where((sort_column < value) | ((sort_column == value) & (name_column < name)))
+        else:
+            query = query.where((sort_column > value) | ((sort_column == value) & (name_column > name)))
+
+    direction = Order.desc if order == "desc" else Order.asc
+    rows = query.orderby(sort_column, order=direction).orderby(name_column, order=direction).limit(page_length + 1).run(as_dict=True)
+
+    has_more = len(rows) > page_length
+    rows = rows[:page_length]
+    next_cursor = encode_cursor(order_by, order, rows[-1]) if has_more else None
+
+    extra = set(selected) - set(fields)
+    if extra:
+        for row in rows:
+            for field in extra:
+                row.pop(field, None)
+
+    return {"data": rows, "next_cursor": next_cursor, "has_more": has_more}
@@ -0,0 +1,10 @@
+from library_app.library.doctype.loan.loan import on_doctype_update as add_loan_indexes
+from library_app.library.doctype.member.member import on_doctype_update as add_member_indexes
+from library_app.library.doctype.reservation.reservation import on_doctype_update as add_reservation_indexes
+
+
+def execute():
+    """Create the composite indexes declared in the Loan/Reservation/Member controllers on existing sites."""
+    add_loan_indexes()
+    add_reservation_indexes()
+    add_member_indexes()
@@ -0,0 +1,12 @@
+import frappe
+
+
+def execute():
+    """Fills Book.isbn_compact (the ISBN without spaces or hyphens, upper-case) for existing books."""
+    frappe.db.sql(
+        """
+        UPDATE `tabBook`
+        SET isbn_compact = UPPER(REPLACE(REPLACE(isbn, '-', ''), ' ', ''))
+        WHERE COALESCE(isbn_compact, '') = ''
+        """
+    )
@@ -0,0 +1,6 @@
+from library_app.stats import reconcile_counters
+
+
+def execute():
+    """Seed the dashboard counters from the existing Book/Member/Loan/Reservation rows."""
+    reconcile_counters(fix=True)
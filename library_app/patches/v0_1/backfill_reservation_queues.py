@@ -0,0 +1,30 @@
+import frappe
+
+
+def execute():
+    """Numbers existing Pending reservations per book in reserve_date order and sets each book's queue counters."""
+    frappe.db.sql(
+        """
+        UPDATE `tabReservation` reservation
+        JOIN (
+            SELECT name, ROW_NUMBER() OVER (PARTITION BY book ORDER BY reserve_date, creation) AS slot
+            FROM `tabReservation`
+            WHERE status = 'Pending'
+        ) queued ON queued.name = reservation.name
+        SET reservation.queue_slot = queued.slot
+        """
+    )
+    frappe.db.sql("UPDATE `tabReservation` SET queue_slot = 0 WHERE status != 'Pending'")
+    frappe.db.sql(
+        """
+        UPDATE `tabBook` book
+        LEFT JOIN (
+            SELECT book, COUNT(*) AS waiting
+            FROM `tabReservation`
+            WHERE status = 'Pending'
+            GROUP BY book
+        ) queued ON queued.book = book.name
+        SET book.reservation_queue_length = COALESCE(queued.waiting, 0),
+            book.reservation_queue_offset = 0
+        """
+    )
@@ -0,0 +1,15 @@
+import frappe
+
+from library_app.analytics import rebuild
+
+
+def execute():
+    """Dates returned loans (their last modification, the best record there is) and builds Circulation Rollup."""
+    frappe.db.sql(
+        """
+        UPDATE `tabLoan`
+        SET returned_on = GREATEST(DATE(modified), loan_date)
+        WHERE returned = 1 AND returned_on IS NULL
+        """
+    )
+    rebuild()
@@ -0,0 +1,6 @@
+from library_app.loan_report import rebuild
+
+
+def execute():
+    """Fills Loan Report Row from the open loans."""
+    rebuild()
@@ -0,0 +1,32 @@
+import frappe
+
+from library_app.inventory import recount_copies
+from library_app.stats import reconcile_counters
+
+
+def execute():
+    """Gives every Book without copies one Book Copy (On Loan if it has an open loan) and recounts availability."""
+    frappe.db.sql(
+        """
+        INSERT INTO `tabBook Copy` (name, book, status, creation, modified, owner, modified_by, docstatus, idx)
+        SELECT SUBSTRING(MD5(CONCAT('copy:', book.name)), 1, 10),
+            book.name,
+            IF(EXISTS(
+                SELECT 1 FROM `tabLoan` loan WHERE loan.book = book.name AND loan.returned = 0
+            ), 'On Loan', 'Available'),
+            NOW(), NOW(), 'Administrator', 'Administrator', 0, 0
+        FROM `tabBook` book
+        WHERE NOT EXISTS (SELECT 1 FROM `tabBook Copy` copy WHERE copy.book = book.name)
+        """
+    )
+    # open loans from before copies existed point at their title's only copy
+    frappe.db.sql(
+        """
+        UPDATE `tabLoan` loan
+        JOIN `tabBook Copy` copy ON copy.name = SUBSTRING(MD5(CONCAT('copy:', loan.book)), 1, 10)
+        SET loan.book_copy = copy.name
+        WHERE loan.returned = 0 AND COALESCE(loan.book_copy, '') = ''
+        """
+    )
+    recount_copies()
+    reconcile_counters(fix=True)
@@ -0,0 +1,9 @@
+import frappe
+
+from library_app.analytics import seed_members
+
+
+def execute():
+    """Fills Circulation Rollup.idle_since and gives members who never borrowed a Total row."""
+    frappe.db.sql("UPDATE `tabCirculation Rollup` SET idle_since = last_loan_on WHERE granularity = 'Total'")
+    seed_members()
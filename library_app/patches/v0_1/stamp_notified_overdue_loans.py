@@ -0,0 +1,12 @@
+import frappe
+
+
+def execute():
+    """Loans already flagged overdue were emailed by the old per-loan job; don't digest them again."""
+    frappe.db.sql(
+        """
+        UPDATE `tabLoan`
+        SET overdue_notified_on = modified
+        WHERE overdue = 1 AND returned = 0 AND overdue_notified_on IS NULL
+        """
+    )
@@ -0,0 +1,276 @@
+# library_app/library_app/queries.py
+import frappe
+from frappe.model.db_query import DatabaseQuery
+from frappe.query_builder import Case, DocType, Order
+from frappe.query_builder.functions import GroupConcat
+from pypika.terms import Criterion
+
+# --- Joined read queries ---
+#
+# The list endpoints used to call frappe.get_list() and then frappe.get_doc()
+# for every linked Book/Member. These helpers resolve the display fields with
+# a single LEFT JOIN so a page of rows is one SQL round trip.
+#
+# Each *_source() returns the base query plus the columns it can project,
+# keyed by the name they are returned under. The base doctype's table is not
+# aliased, so permitted() can add the row-level conditions frappe.get_list()
+# applies (User Permissions, if_owner rows, permission query conditions).
+
+class SQLCriterion(Criterion):
+    """A ready-made SQL condition, for conditions Frappe only builds as text."""
+
+    def __init__(self, sql):
+        super().__init__()
+        self.sql = sql
+
+    def get_sql(self, **kwargs):
+        return f"({self.sql})"
+
+
+def match_conditions(doctype):
+    """The session user's row-level read conditions on `tab<doctype>` as SQL, or "" when they may read every row."""
+    return DatabaseQuery(doctype).build_match_conditions(as_condition=True)
+
+
+def permitted(query, doctype):
+    """Checks read permission on `doctype` and restricts `query` to the rows the session user may read."""
+    frappe.has_permission(doctype, "read", throw=True)
+    conditions = match_conditions(doctype)
+    # the query runs with parameters, so literal % must be doubled
+    return query.where(SQLCriterion(conditions.replace("%", "%%"))) if conditions else query
+
+
+LOAN_LIST_FIELDS = ["name", "book", "member", "loan_date", "return_date", "returned", "overdue"]
+RESERVATION_LIST_FIELDS = ["name", "book", "member", "reserve_date", "status"]
+
+
+def book_source():
+    """Base Book query and its selectable columns."""
+    Book = DocType("Book")
+    fields = [
+        "name", "title", "author", "publish_date", "isbn", "status", "total_copies", "available_copies",
+        "creation", "modified",
+    ]
+    return frappe.qb.from_(Book), {field: Book[field] for field in fields}
+
+
+def member_source():
+    """Base Member query and its selectable columns."""
+    Member = DocType("Member")
+    fields = ["name", "member_name", "membership_id", "email", "phone", "user", "creation", "modified"]
+    return frappe.qb.from_(Member), {field: Member[field] for field in fields}
+
+
+def loan_source():
+    """Base Loan query joined with the book title and member name."""
+    Loan = DocType("Loan")
+    Book = DocType("Book")
+    Member = DocType("Member")
+
+    query = (
+        frappe.qb.from_(Loan)
+        .left_join(Book).on(Book.name == Loan.book)
+        .left_join(Member).on(Member.name == Loan.member)
+    )
+    columns = {field: Loan[field] for field in [*LOAN_LIST_FIELDS, "creation", "modified"]}
+    columns["book_title"] = Book.title
+    columns["member_name"] = Member.member_name
+    return query, columns
+
+
+def reservation_source():
+    """Base Reservation query joined with the book title and member name."""
+    Reservation = DocType("Reservation")
+    Book = DocType("Book")
+    Member = DocType("Member")
+
+    query = (
+        frappe.qb.from_(Reservation)
+        .left_join(Book).on(Book.name == Reservation.book)
+        .left_join(Member).on(Member.name == Reservation.member)
+    )
+    columns = {field: Reservation[field] for field in [*RESERVATION_LIST_FIELDS, "creation", "modified"]}
+    columns["book_title"] = Book.title
+    columns["member_name"] = Member.member_name
+    return query, columns
+
+
+def loan_report_source():
+    """Base query over the materialized open-loan report (see library_app.loan_report)."""
+    Row = DocType("Loan Report Row")
+    fields = [
+        "name", "book", "book_title", "member", "member_name", "member_email", "loan_date", "return_date",
+        "refreshed_on",
+    ]
+    return frappe.qb.from_(Row), {field: Row[field] for field in fields}
+
+
+def user_source():
+    """
+    Base User query with the user's roles aggregated into one comma-separated
+    `roles` column (GROUP_CONCAT over Has Role), so a page of users is one query.
+    """
+    User = DocType("User")
+    HasRole = DocType("Has Role")
+
+    query = (
+        frappe.qb.from_(User)
+        .left_join(HasRole).on((HasRole.parent == User.name) & (HasRole.parenttype == "User"))
+        .groupby(User.name)
+    )
+    fields = [
+        "name", "email", "first_name", "last_name", "full_name", "enabled", "user_type", "last_login",
+        "creation", "modified",
+    ]
+    columns = {field: User[field] for field in fields}
+    columns["roles"] = GroupConcat(HasRole.role)
+    return query, columns
+
+
+def users_with_role(role):
+    """Subquery of the users that have `role`, for filtering user_source()."""
+    HasRole = DocType("Has Role")
+    return (
+        frappe.qb.from_(HasRole)
+        .select(HasRole.parent)
+        .where((HasRole.parenttype == "User") & (HasRole.role == role))
+    )
+
+
+LIST_SOURCES = {
+    "Book": book_source,
+    "Member": member_source,
+    "Loan": loan_source,
+    "Reservation": reservation_source,
+    "Loan Report Row": loan_report_source,
+    "User": user_source,
+}
+
+
+def select_columns(query, columns, fields):
+    """Adds `fields` to the query, aliasing joined columns to their output name."""
+    return query.select(*[columns[field].as_(field) for field in fields])
+
+
+def apply_filters(query, columns, filters):
+    """Applies simple equality filters on known columns."""
+    for field, value in (filters or {}).items():
+        query = query.where(columns[field] == value)
+    return query
+
+
+def loan_list_query(filters=None, order_by="creation", order="desc"):
+    """Builds the Loan list query joined with the book title and member name."""
+    query, columns = loan_source()
+    query = select_columns(query, columns, [*LOAN_LIST_FIELDS, "book_title", "member_name"])
+    query = apply_filters(query, columns, filters)
+    return query.orderby(columns[order_by], order=Order.desc if order == "desc" else Order.asc)
+
+
+def get_loan_rows(filters=None, order_by="creation", order="desc"):
+    """Returns the loans the session user may read, with `book_title` and `member_name`, in one query."""
+    return permitted(loan_list_query(filters, order_by, order), "Loan").run(as_dict=True)
+
+
+def get_reservation_rows(filters=None, order_by="reserve_date", order="asc"):
+    """Returns the reservations the session user may read, with `book_title` and `member_name`, in one query."""
+    query, columns = reservation_source()
+    query = permitted(query, "Reservation")
+    query = select_columns(query, columns, [*RESERVATION_LIST_FIELDS, "book_title", "member_name"])
+    query = apply_filters(query, columns, filters)
+    return query.orderby(columns[order_by], order=Order.desc if order == "desc" else Order.asc).run(as_dict=True)
+
+
+def get_member_reservation_rows(member):
+    """A member's reservations, newest first, with book details and their live place in the queue."""
+    Reservation = DocType("Reservation")
+    Book = DocType("Book")
+    queue_position = Case().when(
+        Reservation.status == "Pending", Reservation.queue_slot - Book.reservation_queue_offset
+    )
+
+    return (
+        frappe.qb.from_(Reservation)
+        .left_join(Book).on(Book.name == Reservation.book)
+        .select(
+            Reservation.name,
+            Reservation.book,
+            Reservation.reserve_date,
+            Reservation.status,
+            Book.title.as_("book_title"),
+            Book.author.as_("book_author"),
+            queue_position.as_("queue_position"),
+            Book.reservation_queue_length.as_("queue_length"),
+        )
+        .where(Reservation.member == member)
+        .orderby(Reservation.reserve_date, order=Order.desc)
+    ).run(as_dict=True)
+
+
+def get_member_loan_rows(member):
+    """A member's loans, newest first, with the book title and author."""
+    query, columns = loan_source()
+    Book = DocType("Book")
+    columns["book_author"] = Book.author
+    query = select_columns(query, columns, [*LOAN_LIST_FIELDS, "book_title", "book_author"])
+    query = apply_filters(query, columns, {"member": member})
+    return query.orderby(columns["loan_date"], order=Order.desc).run(as_dict=True)
+
+
+def get_member_account_rows(member, history_length, history_after=None):
+    """
+    Everything on a member's account page in one round trip: open loans,
+    one page of returned loans (loan_date desc; `history_after` is the
+    (loan_date, name) of the last row already shown) and their waiting or
+    ready-to-collect reservations. Each row says which `section` it is for;
+    the history part returns up to history_length + 1 rows so the caller can
+    tell whether there is another page.
+    """
+    after_date, after_name = history_after or (None, None)
+    return frappe.db.sql(
+        """
+        (
+            SELECT 'active' AS section, loan.name, loan.book, book.title AS book_title, book.author AS book_author,
+                loan.loan_date AS date, loan.return_date AS due_date,
+                (loan.overdue = 1 OR loan.return_date < CURDATE()) AS overdue,
+                GREATEST(DATEDIFF(CURDATE(), loan.return_date), 0) AS days_overdue,
+                NULL AS status, NULL AS queue_position, NULL AS queue_length
+            FROM `tabLoan` loan
+            LEFT JOIN `tabBook` book ON book.name = loan.book
+            WHERE loan.member = %(member)s AND loan.returned = 0
+        )
+        UNION ALL
+        (
+            SELECT 'history', loan.name, loan.book, book.title, book.author,
+                loan.loan_date, loan.return_date, loan.overdue, 0,
+                NULL, NULL, NULL
+            FROM `tabLoan` loan
+            LEFT JOIN `tabBook` book ON book.name = loan.book
+            WHERE loan.member = %(member)s AND loan.returned = 1
+                AND (%(after_date)s IS NULL OR loan.loan_date < %(after_date)s
+                    OR (loan.loan_date = %(after_date)s AND loan.name < %(after_name)s))
+            ORDER BY loan.loan_date DESC, loan.name DESC
+            LIMIT %(history_limit)s
+        )
+        UNION ALL
+        (
+            SELECT 'reservation', reservation.name, reservation.book, book.title, book.author,
+                reservation.reserve_date, NULL, 0, 0,
+                reservation.status,
+                IF(reservation.status = 'Pending', reservation.queue_slot - book.reservation_queue_offset, NULL),
+                book.reservation_queue_length
+            FROM `tabReservation` reservation
+            LEFT JOIN `tabBook` book ON book.name = reservation.book
+            LEFT JOIN `tabBook Copy` copy ON copy.name = reservation.book_copy
+            WHERE reservation.member = %(member)s
+                AND (reservation.status = 'Pending' OR (reservation.status = 'Completed' AND copy.status = 'Reserved'))
+        )
+        """,
+        {
+            "member": member,
+            "after_date": after_date,
+            "after_name": after_name,
+            "history_limit": history_length + 1,
+        },
+        as_dict=True,
+    )
@@ -0,0 +1,133 @@
+# library_app/library_app/reservation_queue.py
+import frappe
+
+from library_app.cache import invalidate
+
+# --- Per-book reservation queue ---
+#
+# Every Pending reservation holds a slot number (Reservation.queue_slot) and
+# every Book stores its queue length and offset, the number of slots already
+# served or cancelled at the head:
+#
+#     position of a reservation = queue_slot - book.reservation_queue_offset
+#     next in line              = the Pending reservation in slot offset + 1
+#     queue depth               = book.reservation_queue_length
+#
+# so all three are single indexed lookups however long the queue is. Joining
+# takes slot offset + length + 1; serving or cancelling the head only bumps
+# the offset. Cancelling from the middle moves everyone behind up one slot
+# with a single UPDATE.
+#
+# Queue changes run under the Book row lock. They are written with SQL and
+# don't touch `modified`, so a Book or Reservation document loaded earlier
+# can still be saved; both controllers re-read these fields before saving.
+# Being set-based writes, they invalidate the cached documents themselves.
+
+QUEUE_FIELDS = ["reservation_queue_length", "reservation_queue_offset"]
+
+
+def lock_queue(book):
+    """The book's queue counters, with the Book row locked until the transaction ends."""
+    queue = frappe.db.get_value("Book", book, QUEUE_FIELDS, as_dict=True, for_update=True)
+    if not queue:
+        frappe.throw(f"Book '{book}' not found.", frappe.DoesNotExistError)
+    return queue
+
+
+def set_queue(book, length, offset):
+    frappe.db.sql(
+        "UPDATE `tabBook` SET reservation_queue_length = %s, reservation_queue_offset = %s WHERE name = %s",
+        (length, offset, book),
+    )
+    invalidate("Book", [book])
+
+
+def join_queue(reservation):
+    """Puts `reservation` at the back of its book's queue (sets queue_slot; the caller saves it)."""
+    queue = lock_queue(reservation.book)
+    reservation.queue_slot = queue.reservation_queue_offset + queue.reservation_queue_length + 1
+    set_queue(reservation.book, queue.reservation_queue_length + 1, queue.reservation_queue_offset)
+
+
+def leave_queue(book, slot):
+    """Removes the reservation in `slot` from the queue. Run after it stopped being Pending."""
+    queue = lock_queue(book)
+    if slot == queue.reservation_queue_offset + 1:
+        # the head: everyone else keeps their slot and moves up by the offset
+        set_queue(book, queue.reservation_queue_length - 1, queue.reservation_queue_offset + 1)
+        return
+
+    frappe.db.sql(
+        """
+        UPDATE `tabReservation`
+        SET queue_slot = queue_slot - 1
+        WHERE book = %s AND status = 'Pending' AND queue_slot > %s
+        """,
+        (book, slot),
+    )
+    invalidate("Reservation")
+    set_queue(book, queue.reservation_queue_length - 1, queue.reservation_queue_offset)
+
+
+def next_in_line(book):
+    """The Pending reservation at the head of the book's queue (name, member, queue_slot), or None."""
+    rows = frappe.db.sql(
+        """
+        SELECT reservation.name, reservation.member, reservation.queue_slot
+        FROM `tabBook` book
+        JOIN `tabReservation` reservation
+            ON reservation.book = book.name
+            AND reservation.status = 'Pending'
+            AND reservation.queue_slot = book.reservation_queue_offset + 1
+        WHERE book.name = %s
+        """,
+        (book,),
+        as_dict=True,
+    )
+    return rows[0] if rows else None
+
+
+def queue_length(book):
+    return frappe.db.get_value("Book", book, "reservation_queue_length") or 0
+
+
+def queue_position(reservation):
+    """1-based position of a Pending reservation in its book's queue, else None."""
+    if reservation.status != "Pending" or not reservation.queue_slot:
+        return None
+    offset = frappe.db.get_value("Book", reservation.book, "reservation_queue_offset") or 0
+    return reservation.queue_slot - offset
+
+
+def renumber_queues(books):
+    """Rebuilds queue slots and counters of `books` from their Pending reservations (maintenance)."""
+    if not books:
+        return
+    books = tuple(books)
+    frappe.db.sql(
+        """
+        UPDATE `tabReservation` reservation
+        JOIN (
+            SELECT name, ROW_NUMBER() OVER (PARTITION BY book ORDER BY queue_slot = 0, queue_slot, reserve_date, creation) AS slot
+            FROM `tabReservation`
+            WHERE status = 'Pending' AND book IN %s
+        ) queued ON queued.name = reservation.name
+        SET reservation.queue_slot = queued.slot
+        """,
+        (books,),
+    )
+    frappe.db.sql(
+        """
+        UPDATE `tabBook` book
+        LEFT JOIN (
+            SELECT book, COUNT(*) AS waiting
+            FROM `tabReservation`
+            WHERE status = 'Pending' AND book IN %s
+            GROUP BY book
+        ) queued ON queued.book = book.name
+        SET book.reservation_queue_length = COALESCE(queued.waiting, 0),
+            book.reservation_queue_offset = 0
+        WHERE book.name IN %s
+        """,
+        (books, books),
+    )
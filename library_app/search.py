@@ -0,0 +1,262 @@
+# library_app/library_app/search.py
+import html
+import re
+
+import frappe
+from frappe.search.full_text_search import FullTextSearch
+from whoosh.fields import ID, NGRAMWORDS, TEXT, Schema
+from whoosh.query import And, Or, Prefix, Term
+from whoosh.writing import AsyncWriter
+
+# --- Catalog search index (Whoosh, via Frappe's FullTextSearch) ---
+#
+# Title and author are indexed twice: as plain words (exact matches rank
+# highest) and as edge n-grams so a partial word is a single term lookup,
+# which is what keeps typeahead fast on a large catalog. ISBNs are indexed
+# without hyphens or spaces. The plain-word fields drop stop words and
+# one-letter words, so queries go through the same analyzer before their
+# words become terms.
+
+INDEX_NAME = "library_books"
+# Book fields the index stores; saves that change none of them skip reindexing
+INDEXED_FIELDS = ("title", "author", "isbn", "status")
+BUILD_CHUNK_SIZE = 10_000
+MAX_PREFIX_LENGTH = 20
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+ISBN_PATTERN = re.compile(r"^[0-9xX]{3,13}$")
+
+
+def normalize_isbn(isbn):
+    return re.sub(r"[\s-]", "", isbn or "").upper()
+
+
+class BookSearch(FullTextSearch):
+    """Full text index over Book title, author and ISBN."""
+
+    def __init__(self, index_name=INDEX_NAME):
+        super().__init__(index_name)
+
+    def get_schema(self):
+        return Schema(
+            name=ID(stored=True, unique=True),
+            title=TEXT(stored=True, field_boost=3.0),
+            author=TEXT(stored=True, field_boost=1.5),
+            isbn=ID(stored=True),
+            status=ID(stored=True),
+            title_prefix=NGRAMWORDS(minsize=1, maxsize=MAX_PREFIX_LENGTH, at="start", field_boost=2.0),
+            author_prefix=NGRAMWORDS(minsize=1, maxsize=MAX_PREFIX_LENGTH, at="start"),
+        )
+
+    def get_id(self):
+        return "name"
+
+    def get_fields_to_search(self):
+        return ["title", "author", "isbn"]
+
+    def get_document_to_index(self, doc_name):
+        book = frappe.db.get_value("Book", doc_name, ["name", "title", "author", "isbn", "status"], as_dict=True)
+        return self.to_document(book) if book else None
+
+    def to_document(self, book):
+        return {
+            "name": book.name,
+            "title": book.title or "",
+            "author": book.author or "",
+            "isbn": normalize_isbn(book.isbn),
+            "status": book.status or "",
+            "title_prefix": book.title or "",
+            "author_prefix": book.author or "",
+        }
+
+    def iter_books(self, chunk_size=BUILD_CHUNK_SIZE):
+        """Yields every Book in name order, `chunk_size` rows per query."""
+        last_name = ""
+        while True:
+            rows = frappe.db.sql(
+                """
+                SELECT name, title, author, isbn, status
+                FROM `tabBook`
+                WHERE name > %s
+                ORDER BY name
+                LIMIT %s
+                """,
+                (last_name, chunk_size),
+                as_dict=True,
+            )
+            if not rows:
+                return
+            yield from rows
+            last_name = rows[-1].name
+
+    def build(self):
+        """Rebuilds the index from scratch, streaming books instead of loading them all."""
+        ix = self.create_index()
+        writer = ix.writer(limitmb=256)
+        count = 0
+        try:
+            for book in self.iter_books():
+                writer.add_document(**self.to_document(book))
+                count += 1
+        except Exception:
+            writer.cancel()
+            raise
+        writer.commit(optimize=True)
+        return count
+
+    def add_documents(self, books):
+        """Adds or replaces a batch of books in one writer commit."""
+        ix = self.get_index()
+        writer = AsyncWriter(ix)
+        for book in books:
+            writer.update_document(**self.to_document(book))
+        writer.commit()
+
+    def update_index(self, document):
+        # The base class optimizes on every commit, which merges every segment
+        # of a large index; plain commits let Whoosh merge incrementally.
+        if not document:
+            return
+        writer = AsyncWriter(self.get_index())
+        writer.update_document(**document)
+        writer.commit()
+
+    def remove_document_from_index(self, doc_name):
+        if not doc_name:
+            return
+        writer = AsyncWriter(self.get_index())
+        writer.delete_by_term(self.id, doc_name)
+        writer.commit()
+
+    def analyze(self, fieldname, token):
+        """The terms `fieldname` indexes for `token`: none for a stop word or a one-letter word."""
+        return [t.text for t in self.schema[fieldname].analyzer(token, mode="query")]
+
+    def build_query(self, text):
+        """
+        Every word the index keeps must match; the last word may be a prefix
+        (typeahead). "the hobbit" searches for "hobbit", "j r r tolkien" for
+        "tolkien".
+        """
+        tokens = [token.lower() for token in TOKEN_PATTERN.findall(text or "")]
+        clauses = []
+        for position, token in enumerate(tokens):
+            is_last = position == len(tokens) - 1
+            options = [Term(field, term) for field in ("title", "author") for term in self.analyze(field, token)]
+            if is_last:
+                # the n-gram fields keep every word, so "the h" still narrows the typeahead
+                prefix = token[:MAX_PREFIX_LENGTH]
+                options += [Term("title_prefix", prefix), Term("author_prefix", prefix)]
+            if options:
+                clauses.append(Or(options))
+
+        query = And(clauses) if clauses else None
+
+        compact = normalize_isbn(text)
+        if ISBN_PATTERN.match(compact):
+            isbn_query = Prefix("isbn", compact)
+            query = Or([query, isbn_query]) if query else isbn_query
+        return query
+
+    def search_books(self, text, limit=20):
+        """Returns ranked matches with `<mark>` highlighting on title and author."""
+        query = self.build_query(text)
+        if query is None:
+            return []
+
+        tokens = [token.lower() for token in TOKEN_PATTERN.findall(text)]
+        out = []
+        with self.get_index().searcher() as searcher:
+            for hit in searcher.search(query, limit=limit):
+                out.append({
+                    "name": hit["name"],
+                    "title": hit["title"],
+                    "author": hit["author"],
+                    "isbn": hit["isbn"],
+                    "status": hit["status"],
+                    "score": round(hit.score, 4),
+                    "highlight": {
+                        "title": highlight(hit["title"], tokens),
+                        "author": highlight(hit["author"], tokens),
+                    },
+                })
+        return out
+
+
+def highlight(value, tokens):
+    """
+    Wraps word prefixes that match a query token in <mark> tags. Matching runs
+    on the raw text and each piece is escaped separately, so a token can't
+    match inside an HTML entity.
+    """
+    value = value or ""
+    if not tokens:
+        return html.escape(value)
+    pattern = re.compile(r"\b(" + "|".join(re.escape(token) for token in tokens) + ")", re.IGNORECASE)
+    out, last = [], 0
+    for match in pattern.finditer(value):
+        out.append(html.escape(value[last : match.start()]))
+        out.append(f"<mark>{html.escape(match.group(1))}</mark>")
+        last = match.end()
+    out.append(html.escape(value[last:]))
+    return "".join(out)
+
+
+def search_books(text, limit=20):
+    return BookSearch().search_books(text, limit=limit)
+
+
+def build_book_index():
+    """Rebuilds the catalog index from scratch. Used by `bench rebuild-book-search-index`."""
+    return BookSearch().build()
+
+
+def index_book(book):
+    BookSearch().update_index_by_name(book)
+
+
+def unindex_book(book):
+    BookSearch().remove_document_from_index(book)
+
+
+def index_books(books):
+    """Re-indexes a batch of books in one writer commit."""
+    BookSearch().add_documents(frappe.get_all(
+        "Book",
+        filters={"name": ["in", books]},
+        fields=["name", "title", "author", "isbn", "status"],
+    ))
+
+
+def enqueue_index_books(books):
+    """Queues index_books after commit, for code that updates books with set-based SQL."""
+    if books:
+        frappe.enqueue(
+            "library_app.search.index_books",
+            queue="short",
+            enqueue_after_commit=True,
+            books=list(books),
+        )
+
+
+# --- Document event handlers (wired in hooks.py) ---
+
+def on_book_update(doc, method=None):
+    # circulation saves books all the time; only reindex what the index holds
+    if not any(doc.has_value_changed(field) for field in INDEXED_FIELDS):
+        return
+    frappe.enqueue(
+        "library_app.search.index_book",
+        queue="short",
+        enqueue_after_commit=True,
+        book=doc.name,
+    )
+
+
+def on_book_trash(doc, method=None):
+    frappe.enqueue(
+        "library_app.search.unindex_book",
+        queue="short",
+        enqueue_after_commit=True,
+        book=doc.name,
+    )
@@ -0,0 +1,181 @@
+# library_app/library_app/stats.py
+from collections import Counter
+
+import frappe
+from frappe.utils import add_days, getdate, now_datetime, nowdate
+
+# --- Denormalized dashboard counters ---
+#
+# Each Library Counter row holds one number (books per status, active loans,
+# loans on a given day, ...). Counters are bumped inside the same transaction
+# as the write that changes them, so the dashboard reads a handful of rows
+# instead of scanning Book/Loan/Reservation.
+#
+# Document writes are tracked through doc_events (see hooks.py). Code that
+# changes rows with set-based SQL must call bump() itself.
+
+BOOK_STATUSES = ("Available", "On Loan", "Reserved")
+FIXED_COUNTERS = (
+    "books",
+    *[f"book_status:{status}" for status in BOOK_STATUSES],
+    "members",
+    "loans",
+    "active_loans",
+    "overdue_loans",
+    "reservations",
+    "pending_reservations",
+)
+LOANS_PER_DAY_PREFIX = "loans_on:"
+
+
+def loans_on_key(date):
+    return f"{LOANS_PER_DAY_PREFIX}{getdate(date)}"
+
+
+def doc_counter_keys(doc):
+    """The counters a document contributes 1 to in its current state."""
+    if doc.doctype == "Book":
+        return ["books", f"book_status:{doc.status}"]
+    if doc.doctype == "Member":
+        return ["members"]
+    if doc.doctype == "Loan":
+        keys = ["loans", loans_on_key(doc.loan_date)]
+        if not doc.returned:
+            keys.append("active_loans")
+            if doc.overdue:
+                keys.append("overdue_loans")
+        return keys
+    if doc.doctype == "Reservation":
+        keys = ["reservations"]
+        if doc.status == "Pending":
+            keys.append("pending_reservations")
+        return keys
+    return []
+
+
+def bump(deltas):
+    """Atomically adds `deltas` ({counter: delta}) to the counters, creating missing rows."""
+    deltas = {key: delta for key, delta in deltas.items() if delta}
+    if not deltas:
+        return
+
+    now = now_datetime()
+    user = frappe.session.user
+    rows = []
+    params = []
+    # sorted so concurrent transactions lock counter rows in the same order
+    for key in sorted(deltas):
+        rows.append("(%s, %s, %s, %s, %s, %s)")
+        params.extend([key, deltas[key], now, now, user, user])
+
+    frappe.db.sql(
+        f"""
+        INSERT INTO `tabLibrary Counter` (name, value, creation, modified, owner, modified_by)
+        VALUES {", ".join(rows)}
+        ON DUPLICATE KEY UPDATE value = value + VALUES(value), modified = VALUES(modified)
+        """,
+        params,
+    )
+
+
+# --- Document event handlers (wired in hooks.py) ---
+
+def on_doc_insert(doc, method=None):
+    bump(Counter(doc_counter_keys(doc)))
+
+
+def on_doc_update(doc, method=None):
+    before = doc.get_doc_before_save()
+    if not before:
+        # on_update also runs right after insert; after_insert counted it
+        return
+    deltas = Counter(doc_counter_keys(doc))
+    deltas.subtract(doc_counter_keys(before))
+    bump(deltas)
+
+
+def on_doc_trash(doc, method=None):
+    bump({key: -count for key, count in Counter(doc_counter_keys(doc)).items()})
+
+
+# --- Reads ---
+
+def get_dashboard_stats(days=30):
+    """All dashboard numbers from a single read of Library Counter."""
+    today = getdate(nowdate())
+    day_keys = [loans_on_key(add_days(today, -offset)) for offset in range(days - 1, -1, -1)]
+
+    values = dict(
+        frappe.get_all(
+            "Library Counter",
+            filters={"name": ["in", [*FIXED_COUNTERS, *day_keys]]},
+            fields=["name", "value"],
+            as_list=True,
+        )
+    )
+
+    return {
+        "books": values.get("books", 0),
+        "books_by_status": {status: values.get(f"book_status:{status}", 0) for status in BOOK_STATUSES},
+        "members": values.get("members", 0),
+        "loans": values.get("loans", 0),
+        "active_loans": values.get("active_loans", 0),
+        "overdue_loans": values.get("overdue_loans", 0),
+        "reservations": values.get("reservations", 0),
+        "pending_reservations": values.get("pending_reservations", 0),
+        "loans_per_day": [
+            {"date": key[len(LOANS_PER_DAY_PREFIX):], "count": values.get(key, 0)} for key in day_keys
+        ],
+    }
+
+
+# --- Reconciliation ---
+
+def compute_counters():
+    """Recomputes every counter from the source tables (full scans; maintenance only)."""
+    actual = Counter()
+
+    actual["books"] = frappe.db.count("Book")
+    for status, count in frappe.db.sql("SELECT status, COUNT(*) FROM `tabBook` GROUP BY status"):
+        actual[f"book_status:{status}"] = count
+
+    actual["members"] = frappe.db.count("Member")
+
+    loans, active, overdue = frappe.db.sql(
+        """
+        SELECT COUNT(*),
+            COALESCE(SUM(returned = 0), 0),
+            COALESCE(SUM(returned = 0 AND overdue = 1), 0)
+        FROM `tabLoan`
+        """
+    )[0]
+    actual["loans"], actual["active_loans"], actual["overdue_loans"] = loans, active, overdue
+    for loan_date, count in frappe.db.sql("SELECT loan_date, COUNT(*) FROM `tabLoan` GROUP BY loan_date"):
+        if loan_date:
+            actual[loans_on_key(loan_date)] = count
+
+    actual["reservations"] = frappe.db.count("Reservation")
+    actual["pending_reservations"] = frappe.db.count("Reservation", {"status": "Pending"})
+
+    return actual
+
+
+def reconcile_counters(fix=True):
+    """
+    Compares stored counters with the source tables.
+    Returns {counter: {"stored": x, "actual": y}} for every drifted counter and,
+    when `fix` is set, overwrites the stored values.
+    """
+    actual = compute_counters()
+    stored = dict(frappe.get_all("Library Counter", fields=["name", "value"], as_list=True))
+
+    drift = {}
+    for key in sorted(set(actual) | set(stored)):
+        if int(stored.get(key) or 0) != int(actual.get(key) or 0):
+            drift[key] = {"stored": int(stored.get(key) or 0), "actual": int(actual.get(key) or 0)}
+
+    if fix and drift:
+        bump({key: values["actual"] - values["stored"] for key, values in drift.items()})
+        frappe.db.commit()
+
+    return drift
@@ -0,0 +1,31 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+import csv
+import os
+import tempfile
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from library_app.book_import import import_books
+from library_app.library.doctype.book.test_book import make_book
+
+
+class TestBookImport(IntegrationTestCase):
+	def test_import_skips_isbns_already_in_the_catalog_with_hyphens(self):
+		isbn = "978-0-306-40615-7"
+		frappe.db.delete("Book", {"isbn_compact": "9780306406157"})
+		make_book(isbn=isbn)
+
+		with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, newline="") as f:
+			writer = csv.writer(f)
+			writer.writerow(["title", "author", "publish_date", "isbn"])
+			writer.writerow(["Typed Compact", "Author", "2020-01-01", "9780306406157"])
+		try:
+			report = import_books(f.name)
+		finally:
+			os.remove(f.name)
+
+		self.assertEqual((report["inserted"], report["duplicates"]), (0, 1))
+		self.assertEqual(frappe.db.count("Book", {"isbn_compact": "9780306406157"}), 1)
@@ -0,0 +1,92 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+
+from library_app import api, cache
+from library_app.library.doctype.book.test_book import make_book
+
+
+class TestCache(IntegrationTestCase):
+	def test_get_book_is_fresh_after_save(self):
+		book = make_book(title="Before")
+		self.assertEqual(api.get_book(book.name).title, "Before")
+		self.assertEqual(api.get_book(book.name).title, "Before")  # served from cache
+
+		book.title = "After"
+		book.save()
+		self.assertEqual(api.get_book(book.name).title, "After")
+
+	def test_get_book_is_fresh_after_delete(self):
+		book = make_book()
+		api.get_book(book.name)
+
+		frappe.delete_doc("Book", book.name)
+		with self.assertRaises(frappe.ValidationError):
+			api.get_book(book.name)
+
+	def test_book_list_is_fresh_after_insert_and_update(self):
+		book = make_book(title="Listed")
+		page = api.get_books(page_length=5, order_by="creation desc")
+		self.assertEqual(page["data"][0].title, "Listed")
+
+		book.title = "Relisted"
+		book.save()
+		newer = make_book(title="Newer")
+		page = api.get_books(page_length=5, order_by="creation desc")
+		self.assertEqual([row.name for row in page["data"][:2]], [newer.name, book.name])
+		self.assertEqual(page["data"][1].title, "Relisted")
+
+	def test_set_based_writes_must_invalidate(self):
+		book = make_book(title="Before")
+		api.get_book(book.name)
+
+		# direct SQL bypasses doc_events, so the cached copy survives...
+		frappe.db.set_value("Book", book.name, "title", "After")
+		self.assertEqual(api.get_book(book.name).title, "Before")
+		# ...until the writer invalidates it
+		cache.invalidate("Book", [book.name])
+		self.assertEqual(api.get_book(book.name).title, "After")
+
+	def test_hits_and_misses_are_counted(self):
+		book = make_book()
+		before = cache.get_stats()["doc"]
+		api.get_book(book.name)
+		api.get_book(book.name)
+		after = cache.get_stats()["doc"]
+		self.assertEqual(after["misses"] - before["misses"], 1)
+		self.assertEqual(after["hits"] - before["hits"], 1)
+
+	def test_oversized_entries_are_not_cached(self):
+		book = make_book(title="Before")
+		with patch.dict(frappe.conf, {"library_cache_max_entry_bytes": 16}):
+			api.get_book(book.name)
+			frappe.db.set_value("Book", book.name, "title", "After")
+			self.assertEqual(api.get_book(book.name).title, "After")
+
+	def test_unchanged_list_polls_get_304(self):
+		request = frappe._dict(method="GET", headers={})
+		with patch.object(frappe.local, "request", request, create=True):
+			self.assertIn("data", api.get_books(page_length=5))
+			etag = frappe.local.library_etag
+
+			request.headers = {"If-None-Match": etag}
+			self.assertEqual(api.get_books(page_length=5).status_code, 304)
+			# other arguments, other tag
+			self.assertIn("data", api.get_books(page_length=6))
+
+			make_book()
+			self.assertIn("data", api.get_books(page_length=5))
+			self.assertNotEqual(frappe.local.library_etag, etag)
+
+	def test_list_tags_are_not_reused_after_the_counters_are_evicted(self):
+		cache.invalidate("Book")
+		tag = cache.list_tag("Book")
+
+		# evicted or flushed: the counters restart, and the epoch goes with them
+		frappe.cache.delete(cache.list_versions_key())
+		cache.invalidate("Book")
+		self.assertNotEqual(cache.list_tag("Book"), tag)
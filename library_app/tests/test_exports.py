@@ -0,0 +1,82 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+import csv
+import io
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from openpyxl import load_workbook
+
+from library_app import api, exports
+from library_app.library.doctype.book.test_book import make_book
+from library_app.library.doctype.loan.test_loan import make_loan
+from library_app.library.doctype.member.test_member import make_library_member, make_member
+
+
+def body(response):
+	return b"".join(response.response)
+
+
+def read_csv(response):
+	return list(csv.reader(io.StringIO(body(response).decode("utf-8"))))
+
+
+class TestExports(IntegrationTestCase):
+	def setUp(self):
+		# the body is consumed here, inside the test's request, on its connection
+		patcher = patch.object(exports, "STREAM_OWN_CONNECTION", False)
+		patcher.start()
+		self.addCleanup(patcher.stop)
+
+	def test_csv_export_has_the_header_and_a_row_per_loan(self):
+		book = make_book(title="Exported")
+		loan = make_loan(book.name)
+		response = api.download_export("loans", "csv")
+
+		self.assertEqual(response.headers["Content-Type"], "text/csv; charset=utf-8")
+		self.assertIn("attachment;", response.headers["Content-Disposition"])
+		rows = read_csv(response)
+		self.assertEqual(rows[0], exports.EXPORTS["loans"]["header"])
+		row = next(row for row in rows[1:] if row[0] == loan.name)
+		self.assertEqual((row[2], row[3], row[8], row[9]), ("Exported", book.isbn, "On Loan", "No"))
+		self.assertEqual(len(rows) - 1, frappe.db.count("Loan"))
+
+	def test_member_history_covers_only_that_member(self):
+		member, other = make_member().name, make_member().name
+		mine = [make_loan(member=member).name for _ in range(2)]
+		make_loan(member=other)
+
+		rows = read_csv(api.download_export("member_loan_history", "csv", member))
+		self.assertEqual(sorted(row[0] for row in rows[1:]), sorted(mine))
+		legacy = api.export_member_loan_history(member)
+		self.assertEqual(legacy["content"], body(api.download_export("member_loan_history", "csv", member)).decode())
+
+	def test_members_export_only_their_own_history(self):
+		user, member = make_library_member()
+		other = make_member().name
+
+		with self.set_user(user):
+			self.assertEqual(len(read_csv(api.download_export("member_loan_history", "csv", member))), 1)
+			with self.assertRaises(frappe.PermissionError):
+				api.download_export("member_loan_history", "csv", other)
+			# librarian-only exports
+			with self.assertRaises(frappe.ValidationError):
+				api.download_export("loans", "csv")
+
+	def test_xlsx_export_is_a_workbook_with_the_header(self):
+		book = make_book(title="Spreadsheet")
+		response = api.download_export("catalog", "xlsx")
+
+		self.assertEqual(response.headers["Content-Type"], exports.FORMATS["xlsx"][0])
+		sheet = load_workbook(io.BytesIO(body(response)), read_only=True).worksheets[0]
+		rows = [list(row) for row in sheet.iter_rows(values_only=True)]
+		self.assertEqual(rows[0], exports.EXPORTS["catalog"]["header"])
+		self.assertIn(book.name, [row[0] for row in rows[1:]])
+
+	def test_unknown_exports_and_formats_are_rejected(self):
+		with self.assertRaises(frappe.ValidationError):
+			api.download_export("everything", "csv")
+		with self.assertRaises(frappe.ValidationError):
+			api.download_export("catalog", "pdf")
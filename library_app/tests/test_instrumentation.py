@@ -0,0 +1,65 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from werkzeug.wrappers import Response
+
+from library_app import instrumentation
+
+
+class TestInstrumentation(IntegrationTestCase):
+	def test_rows_are_counted_per_response_shape(self):
+		count_rows = instrumentation.count_rows
+		self.assertEqual(count_rows(None), 0)
+		self.assertEqual(count_rows([{"name": "a"}, {"name": "b"}]), 2)
+		self.assertEqual(count_rows({"data": [1, 2, 3], "next_cursor": None}), 3)
+		self.assertEqual(count_rows({"results": (1,)}), 1)
+		self.assertEqual(count_rows({"name": "BOOK-1"}), 1)
+
+	def test_api_metrics_are_summed_per_method_and_status(self):
+		method = f"library_app.api.test_{frappe.generate_hash(length=8)}"
+		instrumentation.record(method, 200, 0.02, 3, 0.01, 5, 100)
+		instrumentation.record(method, 200, 2, 1, 0.5, 0, 10)
+
+		values = instrumentation.read_metrics()[(method, "200")]
+		self.assertEqual(values["count"], 2)
+		self.assertEqual(values["sql_count"], 4)
+		self.assertEqual(values["rows"], 5)
+		self.assertEqual(values["bytes"], 110)
+		self.assertEqual(values["le:0.025"], 1)
+		self.assertEqual(values["le:2.5"], 2)
+		self.assertIn(f'library_api_requests_total{{method="{method}",status="200"}} 2', instrumentation.get_metrics_text())
+
+	def test_requests_count_sql_and_profile_only_for_system_managers(self):
+		original_sql = frappe.db.sql
+		request = frappe._dict(
+			path="/api/method/library_app.api.get_books",
+			headers={instrumentation.PROFILE_HEADER: "1"},
+		)
+
+		def run():
+			instrumentation.before_request()
+			state = frappe.local.library_request
+			frappe.db.sql("SELECT 1")
+			frappe.db.sql("SELECT 2")
+			response = Response("[]")
+			instrumentation.after_request(response)
+			self.assertEqual(frappe.db.sql, original_sql)
+			return state, response
+
+		with (
+			patch.object(frappe.local, "request", request, create=True),
+			patch.dict(frappe.conf, {"library_profile_sample_rate": 1}),
+		):
+			state, response = run()
+			self.assertEqual(state.sql_count, 2)
+			self.assertIn("X-Library-Profile-Id", response.headers)
+
+			with self.set_user("Guest"):
+				state, response = run()
+			self.assertEqual(state.sql_count, 2)
+			self.assertIsNone(state.profiler)
+			self.assertNotIn("X-Library-Profile-Id", response.headers)
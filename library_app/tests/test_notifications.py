@@ -0,0 +1,61 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+import frappe
+from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, nowdate
+
+from library_app import notifications
+from library_app.library.doctype.loan.test_loan import make_loan
+from library_app.library.doctype.member.test_member import make_member
+
+
+def make_overdue_loan(member):
+	return make_loan(
+		member=member, loan_date=add_days(nowdate(), -20), return_date=add_days(nowdate(), -6), overdue=1
+	)
+
+
+class TestOverdueDigests(IntegrationTestCase):
+	def send(self, **kwargs):
+		sent = []
+		with patch("frappe.sendmail", lambda **email: sent.append(email)), patch("frappe.db.commit"):
+			summary = notifications.send_overdue_digests(**kwargs)
+		return summary, sent
+
+	def test_one_digest_per_member_for_all_their_overdue_loans(self):
+		member = make_member()
+		loans = [make_overdue_loan(member.name).name for _ in range(3)]
+
+		_, sent = self.send()
+		digests = [email for email in sent if email["recipients"] == [member.email]]
+		self.assertEqual(len(digests), 1)
+		self.assertEqual(digests[0]["subject"], "Overdue Notice: 3 books")
+		self.assertEqual(digests[0]["reference_name"], member.name)
+		self.assertTrue(all(frappe.db.get_value("Loan", loan, "overdue_notified_on") for loan in loans))
+
+	def test_a_second_run_does_not_resend(self):
+		member = make_member()
+		make_overdue_loan(member.name)
+		self.send()
+
+		_, sent = self.send()
+		self.assertNotIn([member.email], [email["recipients"] for email in sent])
+
+		# a loan that becomes overdue later is still picked up
+		make_overdue_loan(member.name)
+		_, sent = self.send()
+		self.assertEqual([email["subject"] for email in sent if email["recipients"] == [member.email]], ["Overdue Notice: Test Book"])
+
+	def test_batches_cover_more_members_than_the_batch_size(self):
+		members = [make_member() for _ in range(5)]
+		for member in members:
+			make_overdue_loan(member.name)
+
+		summary, sent = self.send(batch_size=2)
+		recipients = [email["recipients"][0] for email in sent]
+		self.assertEqual(sorted(m.email for m in members if m.email in recipients), sorted(m.email for m in members))
+		self.assertEqual(summary["members_notified"], len(sent))
+		self.assertFalse(frappe.db.exists("Loan", {"member": ["in", [m.name for m in members]], "overdue_notified_on": ["is", "not set"]}))
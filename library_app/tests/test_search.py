@@ -0,0 +1,41 @@
+# Copyright (c) 2026, Tewodros and Contributors
+# See license.txt
+
+from unittest.mock import patch
+
+from frappe.tests import IntegrationTestCase
+
+from library_app import search
+from library_app.library.doctype.book.test_book import make_book
+
+
+class TestSearch(IntegrationTestCase):
+	def test_only_saves_that_change_indexed_fields_reindex(self):
+		book = make_book(title="Indexed")
+		jobs = []
+
+		with patch("frappe.enqueue", lambda method, **kwargs: jobs.append(method)):
+			book.publish_date = "2021-01-01"
+			book.save()
+			self.assertNotIn("library_app.search.index_book", jobs)
+
+			book.title = "Reindexed"
+			book.save()
+			self.assertIn("library_app.search.index_book", jobs)
+
+	def test_highlight_does_not_match_inside_entities(self):
+		self.assertEqual(
+			search.highlight("Tom & Jerry's <Quotes>", ["amp", "quot", "jer"]),
+			"Tom &amp; <mark>Jer</mark>ry&#x27;s &lt;<mark>Quot</mark>es&gt;",
+		)
+		self.assertEqual(search.highlight("A & B", []), "A &amp; B")
+
+	def test_search_skips_words_the_index_drops(self):
+		def words(text):
+			return {term for _, term in search.BookSearch().build_query(text).all_terms()}
+
+		self.assertEqual(words("lord of the rings"), {"lord", "rings"})
+		self.assertEqual(words("the hobbit"), {"hobbit"})
+		self.assertEqual(words("j r r tolkien"), {"tolkien"})
+		# a dropped word that is being typed still narrows the typeahead as a prefix
+		self.assertEqual(words("lord of the"), {"lord", "the"})
@@ -1,32 +1,9 @@
 import frappe
 
-import json
-import re
+# The shell carries no session or user data (the boot payload and CSRF token
+# come from library_app.boot.get_boot_script), so it can be cached.
+no_cache = 0
 
-no_cache = 1
-
-SCRIPT_TAG_PATTERN = re.compile(r"\<script[^<]*\</script\>")
-CLOSING_SCRIPT_TAG_PATTERN = re.compile(r"</script\>")
 
 def get_context(context):
-    # csrf_token = frappe.sessions.get_csrf_token()
-    # frappe.db.commit()
-    #context.csrf_token = csrf_token
-
-    if frappe.session.user == "Guest":
-        boot = frappe.website.utils.get_boot_data()
-    else:
-        try:
-            boot = frappe.sessions.get()
-        except Exception as e:
-            raise frappe.SessionBootFailed from e
-    boot_json = frappe.as_json(boot,indent=None, separators=(",",":"))
-    boot_json = SCRIPT_TAG_PATTERN.sub("",boot_json)
-
-    boot_json = CLOSING_SCRIPT_TAG_PATTERN.sub("",boot_json)
-    boot_json = json.dumps(boot_json)
-
-    context.update({
-        "build_version":frappe.utils.get_build_version(),
-        "boot":boot_json,
-    })
\ No newline at end of file
+    context.build_version = frappe.utils.get_build_version()